@@ -1,48 +1,107 @@
 from fastapi import FastAPI, WebSocket, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 import json
 import asyncio
+import functools
 import logging
+import numpy as np
 from pathlib import Path
 
+from ..speech.frontend import prepare_audio
 from ..speech.processor import SpeechProcessor
+from ..speech.segmentation import SpeechSegmenter
+from ..speech.streaming import StreamingTranscriber
+from ..speech.voice_detection import VoiceDetector
+from .conversations import ConversationStore, SQLiteConversationBackend
+from .pipeline import PipelineMetrics, VoicePipeline
 from ..llm.engine import LLMEngine
+from ..llm.response_cache import ResponseCache
+from ..llm.router import LLMRouter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class VoiceAssistant:
-    def __init__(self, llm_model_path: str, whisper_model: str = "base"):
+    def __init__(
+        self,
+        llm_model_path: str,
+        whisper_model: str = "base",
+        stream_options: Optional[Dict] = None,
+        speech_options: Optional[Dict] = None,
+        llm_options: Optional[Dict] = None,
+        conversation_options: Optional[Dict] = None,
+        voice_detector: Optional[VoiceDetector] = None,
+        streaming: bool = True,
+        pipeline_options: Optional[Dict] = None,
+        response_cache: Optional[ResponseCache] = None,
+        remote_llms: Optional[Dict[str, Any]] = None,
+        router_options: Optional[Dict] = None
+    ):
         """Initialize the voice assistant with speech and LLM processors.
         
         Args:
             llm_model_path: Path to the local LLM model
             whisper_model: Whisper model size
+            stream_options: Options for per-client streaming transcribers
+            speech_options: Extra options for the shared SpeechProcessor
+            llm_options: Extra options for the LLMEngine
+            conversation_options: Options for the ConversationStore; ``db_path``
+                enables the on-disk backend
+            voice_detector: Detector used to split streamed audio into utterances
+            streaming: Whether utterances are transcribed incrementally
+            pipeline_options: Options for VoicePipeline sessions; ``speculative_prefill``
+                toggles prefilling the LLM on stable partial transcripts
+            response_cache: Cache answering repeated queries without the LLM
+            remote_llms: Remote backends by name (e.g. ``{"groq": GroqClient()}``);
+                responses are then routed between them and the local engine
+            router_options: Options for the LLMRouter
         """
         try:
-            self.speech_processor = SpeechProcessor(model_name=whisper_model)
-            self.llm_engine = LLMEngine(model_path=llm_model_path)
+            self.speech_processor = SpeechProcessor(model_name=whisper_model, **(speech_options or {}))
+            self.llm_engine = LLMEngine(model_path=llm_model_path, **(llm_options or {}))
+            # Generation goes through the router when remote backends are configured
+            self.llm = LLMRouter(
+                {"local": self.llm_engine, **remote_llms},
+                **(router_options or {})
+            ) if remote_llms else self.llm_engine
             logger.info("Voice assistant initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize voice assistant: {e}")
             raise
 
-        self.active_conversations: Dict[str, list] = {}
+        options = dict(conversation_options or {})
+        db_path = options.pop("db_path", None)
+        self.conversations = ConversationStore(
+            tokenize=self.llm_engine.tokenize,
+            backend=SQLiteConversationBackend(db_path) if db_path else None,
+            **options
+        )
+        self.transcription_streams: Dict[str, StreamingTranscriber] = {}
+        self.segmenters: Dict[str, SpeechSegmenter] = {}
+        self.voice_detector = voice_detector
+        self.streaming = streaming
+        self.stream_options = stream_options or {}
+        self.response_cache = response_cache
 
-    async def process_voice_input(self, client_id: str, audio_data: bytes) -> Dict:
+        options = dict(pipeline_options or {})
+        self.speculative_prefill = options.pop("speculative_prefill", True)
+        self.pipeline_options = options
+        self.pipeline_metrics = PipelineMetrics()
+
+    async def process_voice_input(self, client_id: str, audio_data) -> Dict:
         """Process voice input and generate response.
         
         Args:
             client_id: Unique identifier for the client
-            audio_data: Raw audio data
+            audio_data: Raw float32 audio bytes or a float32 array
         
         Returns:
             Dictionary containing response and metadata
         """
         try:
             # Process speech to text
-            transcription = await self.speech_processor.process_stream(audio_data)
+            transcription = await self.speech_processor.process_audio(prepare_audio(audio_data))
             
             if not transcription["success"]:
                 yield {
@@ -51,21 +110,9 @@ class VoiceAssistant:
                 }
                 return
 
-            # Get conversation context
-            context = self.active_conversations.get(client_id, [])
-            
-            # Generate LLM response
-            async for response in self.llm_engine.generate_response(
-                transcription["text"],
-                context=context,
-                stream=True
-            ):
+            async for response in self._respond(client_id, transcription["text"]):
                 yield response
 
-                # Update conversation history if response is complete
-                if response.get("finished"):
-                    self._update_conversation(client_id, transcription["text"], response["text"])
-
         except Exception as e:
             logger.error(f"Error processing voice input: {e}")
             yield {
@@ -73,22 +120,213 @@ class VoiceAssistant:
                 "error": str(e)
             }
 
-    def _update_conversation(self, client_id: str, user_input: str, assistant_response: str):
-        """Update conversation history for a client."""
-        if client_id not in self.active_conversations:
-            self.active_conversations[client_id] = []
-            
-        conversation = self.active_conversations[client_id]
-        conversation.extend([
-            {"role": "user", "content": user_input},
-            {"role": "assistant", "content": assistant_response}
-        ])
+    async def stream_voice_input(self, client_id: str, audio_data) -> Dict:
+        """Feed a chunk of streaming audio for a client.
+        
+        With a voice detector, the audio is split into utterances first: only
+        speech reaches Whisper, and the end of an utterance triggers the
+        response without an explicit end message.
+        
+        Args:
+            client_id: Unique identifier for the client
+            audio_data: Raw float32 audio bytes or a float32 array
+        
+        Returns:
+            Utterance and transcript events, followed by the LLM response once
+            an utterance ends
+        """
+        try:
+            async for response in self._answer(client_id, self._transcribe(client_id, audio_data)):
+                yield response
+
+        except Exception as e:
+            logger.error(f"Error streaming voice input: {e}")
+            yield {
+                "success": False,
+                "error": str(e)
+            }
+
+    async def finish_voice_input(self, client_id: str) -> Dict:
+        """Finalize the client's streamed utterance and generate a response.
+        
+        Args:
+            client_id: Unique identifier for the client
+        
+        Returns:
+            Final transcript event followed by the LLM response
+        """
+        try:
+            async for response in self._answer(client_id, self._transcribe(client_id, None)):
+                yield response
+
+        except Exception as e:
+            logger.error(f"Error finishing voice input: {e}")
+            yield {
+                "success": False,
+                "error": str(e)
+            }
+
+    def open_pipeline(self, client_id: str) -> VoicePipeline:
+        """Start a staged ASR -> LLM -> sentence pipeline for a client's session.
         
-        # Keep only last 10 messages for context
-        self.active_conversations[client_id] = conversation[-10:]
+        Unlike ``stream_voice_input``, transcription keeps running while a
+        response is generated, the LLM prefills partial transcripts,
+        and responses are also cut into sentences for speech synthesis.
+        
+        Args:
+            client_id: Unique identifier for the client
+        
+        Returns:
+            Pipeline to feed audio into and read events from; close it when the session ends
+        """
+        return VoicePipeline(
+            transcribe=functools.partial(self._transcribe, client_id),
+            respond=functools.partial(self._respond, client_id),
+            update_prefix=functools.partial(self._update_prefix, client_id) if self.speculative_prefill else None,
+            discard_prefix=functools.partial(self.llm.discard_prefix, client_id),
+            metrics=self.pipeline_metrics,
+            **self.pipeline_options
+        )
+
+    async def _answer(self, client_id: str, events) -> Dict:
+        """Pass transcript events through, responding to each final transcript."""
+        async for event in events:
+            yield event
+            if event.get("type") == "final" and event["transcript"]:
+                async for response in self._respond(client_id, event["transcript"]):
+                    yield response
+
+    async def _transcribe(self, client_id: str, audio_data) -> Dict:
+        """Utterance and transcript events for streamed audio (None ends the utterance)."""
+        if audio_data is None:
+            segmenter = self.segmenters.get(client_id)
+            stream = self.transcription_streams.get(client_id) if self.streaming else None
+            if stream is not None and stream.active:
+                # The stream holds the utterance being ended; the segmenter's open
+                # utterance is the same audio, so it is closed without transcribing it again
+                for event in segmenter.flush() if segmenter is not None else []:
+                    yield {"type": "speech_end", "end": event["end"], "success": True}
+                yield await stream.finish()
+                return
+            # Only an utterance no stream has seen goes through the segmenter's flush
+            events = segmenter.flush() if segmenter is not None else []
+        else:
+            audio = audio_data if isinstance(audio_data, np.ndarray) else np.frombuffer(audio_data, dtype=np.float32)
+            segmenter = self._get_segmenter(client_id)
+            events = segmenter.feed(audio) if segmenter else [{"type": "speech", "audio": audio}]
+
+        for event in events:
+            async for transcript in self._transcribe_speech_event(client_id, event):
+                yield transcript
+
+    async def _transcribe_speech_event(self, client_id: str, event: Dict) -> Dict:
+        """Route one segmenter event to the transcriber."""
+        if event["type"] == "speech_start":
+            yield {"type": "speech_start", "start": event["start"], "success": True}
+
+        if event["type"] in ("speech_start", "speech"):
+            if self.streaming:
+                for transcript in await self._get_stream(client_id).feed(event["audio"]):
+                    yield transcript
+
+        elif event["type"] == "speech_end":
+            yield {"type": "speech_end", "end": event["end"], "success": True}
+            if self.streaming:
+                stream = self.transcription_streams.get(client_id)
+                if stream is not None:
+                    yield await stream.finish()
+                return
+
+            # Only finished utterances reach Whisper
+            transcription = await self.speech_processor.process_audio(event["segment"])
+            if not transcription["success"]:
+                yield {
+                    "success": False,
+                    "error": "Failed to transcribe audio"
+                }
+                return
+
+            yield {
+                "type": "final",
+                "transcript": transcription["text"],
+                "committed": transcription["text"],
+                "pending": "",
+                "success": True
+            }
+
+    def _get_stream(self, client_id: str) -> StreamingTranscriber:
+        stream = self.transcription_streams.get(client_id)
+        if stream is None:
+            stream = self.speech_processor.create_stream(**self.stream_options)
+            self.transcription_streams[client_id] = stream
+        return stream
+
+    def _get_segmenter(self, client_id: str) -> Optional[SpeechSegmenter]:
+        if self.voice_detector is None:
+            return None
+        segmenter = self.segmenters.get(client_id)
+        if segmenter is None:
+            segmenter = self.voice_detector.create_segmenter()
+            self.segmenters[client_id] = segmenter
+        return segmenter
+
+    def end_session(self, client_id: str):
+        """Release per-client streaming state."""
+        self.transcription_streams.pop(client_id, None)
+        self.segmenters.pop(client_id, None)
+        self.llm.discard_prefix(client_id)
+        # The conversation itself is persisted; its KV cache is rebuilt if the client returns
+        self.llm_engine.release_session(client_id)
+
+    async def _respond(self, client_id: str, text: str) -> Dict:
+        """Generate the LLM response for a transcribed user turn."""
+        # Get conversation context
+        context = await self.conversations.get(client_id)
+        
+        # Generate LLM response; chunks carry text deltas
+        generate = functools.partial(
+            self.llm.generate_response,
+            text,
+            context=context,
+            stream=True,
+            client_id=client_id
+        )
+        if self.response_cache is not None:
+            responses = self.response_cache.respond(text, context, generate)
+        else:
+            responses = generate()
+        reply = ""
+        try:
+            async for response in responses:
+                if response.get("cached"):
+                    # Answered without the LLM; drop the prefill speculated for this turn
+                    self.llm.discard_prefix(client_id)
+                reply += response.get("text", "")
+                yield response
+
+                # Update conversation history if response is complete
+                if response.get("finished"):
+                    await self._update_conversation(client_id, text, reply)
+        finally:
+            # Stops decoding early if the client went away mid-response
+            await responses.aclose()
+
+    async def _update_prefix(self, client_id: str, text: str, endpoint: bool):
+        """Speculatively prefill the LLM (or open the remote request) with a partial transcript."""
+        await self.llm.update_prefix(
+            client_id,
+            text,
+            context=await self.conversations.get(client_id),
+            endpoint=endpoint
+        )
+
+    async def _update_conversation(self, client_id: str, user_input: str, assistant_response: str):
+        """Update conversation history for a client."""
+        await self.conversations.add_turn(client_id, user_input, assistant_response)
 
     def cleanup(self):
         """Cleanup resources."""
         self.speech_processor.cleanup()
         self.llm_engine.cleanup()
+        self.conversations.close()
         logger.info("Voice assistant cleaned up")
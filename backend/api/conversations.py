@@ -0,0 +1,263 @@
+import asyncio
+import inspect
+import sqlite3
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class _Message:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: int):
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+    def as_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class _Session:
+    __slots__ = ("messages", "tokens", "last_used")
+
+    def __init__(self):
+        self.messages: List[_Message] = []
+        self.tokens = 0
+        self.last_used = time.monotonic()
+
+
+class SQLiteConversationBackend:
+    def __init__(self, path: str):
+        """On-disk copy of every session so conversations survive restarts.
+
+        All database work runs on one background thread, in submission
+        order: writes are queued and return immediately and loads are
+        awaited, so the event loop never waits on the disk, and a load sees
+        every write queued before it.
+
+        Args:
+            path: SQLite database file
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_messages ("
+                "client_id TEXT NOT NULL, position INTEGER NOT NULL, role TEXT NOT NULL, "
+                "content TEXT NOT NULL, tokens INTEGER NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (client_id, position))"
+            )
+
+    def save(self, client_id: str, messages: List[_Message]):
+        """Queue a replacement of the stored messages of a session."""
+        now = time.time()
+        rows = [
+            (client_id, position, message.role, message.content, message.tokens, now)
+            for position, message in enumerate(messages)
+        ]
+        self._submit(self._save, client_id, rows)
+
+    def _save(self, client_id: str, rows: List[tuple]):
+        with self._conn:
+            self._conn.execute("DELETE FROM conversation_messages WHERE client_id = ?", (client_id,))
+            self._conn.executemany("INSERT INTO conversation_messages VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    async def load(self, client_id: str, max_age: float) -> Optional[List[_Message]]:
+        """Load a session unless it was last updated more than ``max_age`` seconds ago."""
+        return await asyncio.wrap_future(self._executor.submit(self._load, client_id, max_age))
+
+    def _load(self, client_id: str, max_age: float) -> Optional[List[_Message]]:
+        rows = self._conn.execute(
+            "SELECT role, content, tokens FROM conversation_messages "
+            "WHERE client_id = ? AND updated_at >= ? ORDER BY position",
+            (client_id, time.time() - max_age)
+        ).fetchall()
+        if not rows:
+            return None
+        return [_Message(role, content, tokens) for role, content, tokens in rows]
+
+    def delete(self, client_id: str):
+        """Queue the deletion of a session."""
+        self._submit(self._execute, "DELETE FROM conversation_messages WHERE client_id = ?", (client_id,))
+
+    def purge(self, max_age: float):
+        """Queue the deletion of sessions idle for longer than ``max_age`` seconds."""
+        self._submit(
+            self._execute,
+            "DELETE FROM conversation_messages WHERE client_id IN ("
+            "SELECT client_id FROM conversation_messages GROUP BY client_id HAVING MAX(updated_at) < ?)",
+            (time.time() - max_age,)
+        )
+
+    def _execute(self, statement: str, parameters: tuple):
+        with self._conn:
+            self._conn.execute(statement, parameters)
+
+    def _submit(self, fn: Callable, *args):
+        self._executor.submit(fn, *args).add_done_callback(_log_failure)
+
+    def close(self):
+        """Finish queued writes and close the database."""
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def _log_failure(future: Future):
+    if future.exception() is not None:
+        logger.error(f"Conversation database write failed: {future.exception()}")
+
+
+class ConversationStore:
+    def __init__(
+        self,
+        tokenize: Callable[[str], Union[List[int], Awaitable[List[int]]]],
+        max_tokens_per_session: int = 1024,
+        trim_to: float = 0.5,
+        ttl_seconds: float = 3600.0,
+        max_sessions: int = 10000,
+        max_total_tokens: int = 5_000_000,
+        backend: Optional[SQLiteConversationBackend] = None
+    ):
+        """Per-client conversation history bounded by token counts.
+
+        Each message keeps its token count, so trimming and budgeting never
+        re-tokenize; history is trimmed by whole user/assistant exchanges.
+        A trim cuts history well below the budget, so it is not repeated on
+        every following turn: the LLM engine only reuses a conversation's
+        KV cache while the history is unchanged, and rebuilds it once per
+        trim.
+        Sessions idle past ``ttl_seconds`` are dropped; the least recently
+        used sessions are evicted from memory once ``max_sessions`` or
+        ``max_total_tokens`` is exceeded. With a backend, evicted sessions
+        are reloaded from disk on their next access.
+
+        Args:
+            tokenize: Function (or coroutine function) returning the token ids of a message's text
+            max_tokens_per_session: History budget; oldest exchanges are dropped beyond it
+            trim_to: Fraction of the budget a trimmed history is cut back to
+            ttl_seconds: Idle time after which a session is forgotten
+            max_sessions: Maximum number of sessions held in memory
+            max_total_tokens: Maximum tokens held in memory across all sessions
+            backend: Optional on-disk store kept in sync with every update
+        """
+        self.tokenize = tokenize
+        self.max_tokens_per_session = max_tokens_per_session
+        self.trim_to = trim_to
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_total_tokens = max_total_tokens
+        self.backend = backend
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._total_tokens = 0
+        self._evictions = 0
+
+    async def get(self, client_id: str) -> List[Dict[str, str]]:
+        """Return the client's history as role/content dictionaries."""
+        session = await self._lookup(client_id)
+        if session is None:
+            return []
+        return [message.as_dict() for message in session.messages]
+
+    async def add_turn(self, client_id: str, user_input: str, assistant_response: str):
+        """Append a user/assistant exchange and trim the history to its token budget."""
+        messages = []
+        for role, content in (("user", user_input), ("assistant", assistant_response)):
+            token_ids = self.tokenize(content)
+            if inspect.isawaitable(token_ids):
+                token_ids = await token_ids
+            messages.append(_Message(role, content, len(token_ids)))
+
+        session = await self._lookup(client_id)
+        if session is None:
+            session = _Session()
+            self._sessions[client_id] = session
+
+        for message in messages:
+            session.messages.append(message)
+            session.tokens += message.tokens
+            self._total_tokens += message.tokens
+
+        # Drop the oldest exchanges (so history never opens with a reply), always keeping the newest
+        if session.tokens > self.max_tokens_per_session:
+            while session.tokens > self.max_tokens_per_session * self.trim_to and len(session.messages) > 2:
+                dropped = sum(message.tokens for message in session.messages[:2])
+                del session.messages[:2]
+                session.tokens -= dropped
+                self._total_tokens -= dropped
+
+        if self.backend is not None:
+            self.backend.save(client_id, session.messages)
+        self._evict()
+
+    def pop(self, client_id: str):
+        """Forget a client's conversation, including its on-disk copy."""
+        self._remove(client_id)
+        if self.backend is not None:
+            self.backend.delete(client_id)
+
+    async def _lookup(self, client_id: str) -> Optional[_Session]:
+        session = self._sessions.get(client_id)
+        if session is not None and time.monotonic() - session.last_used > self.ttl_seconds:
+            self.pop(client_id)
+            session = None
+
+        if session is None and self.backend is not None:
+            messages = await self.backend.load(client_id, self.ttl_seconds)
+            # Another lookup may have brought the session back while this one waited
+            session = self._sessions.get(client_id)
+            if session is None and messages:
+                session = _Session()
+                session.messages = messages
+                session.tokens = sum(message.tokens for message in messages)
+                self._total_tokens += session.tokens
+                self._sessions[client_id] = session
+                session.last_used = time.monotonic()
+                # The reloaded session counts against the memory caps like any other
+                self._evict()
+
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(client_id)
+        return session
+
+    def _remove(self, client_id: str):
+        session = self._sessions.pop(client_id, None)
+        if session is not None:
+            self._total_tokens -= session.tokens
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [
+            client_id for client_id, session in self._sessions.items()
+            if now - session.last_used > self.ttl_seconds
+        ]
+        for client_id in expired:
+            self.pop(client_id)
+            self._evictions += 1
+        if expired and self.backend is not None:
+            self.backend.purge(self.ttl_seconds)
+
+        # Least recently used sessions leave memory; a backend still has them
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_tokens > self.max_total_tokens
+        ):
+            self._remove(next(iter(self._sessions)))
+            self._evictions += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Report memory occupancy of the store."""
+        return {
+            "sessions": len(self._sessions),
+            "tokens": self._total_tokens,
+            "evictions": self._evictions
+        }
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
@@ -1,12 +1,25 @@
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict
+from typing import Dict, Optional
 import json
 import asyncio
+import functools
 import logging
 from pathlib import Path
 
+import numpy as np
 from .assistant import VoiceAssistant
+from ..speech.advanced_features import VoiceFeatureAnalyzer
+from ..speech.decoding import StreamingAudioDecoder, get_decoder_metrics
+from ..speech.enrollment import SpeakerEnrollmentStore
+from ..speech.features import configure_feature_cache, get_feature_cache
+from ..speech.framing import FrameError, FrameParser, send_message, validate_encoding
+from ..speech.voice_detection import VoiceDetector
+from config.settings import get_settings
+from ..inference.executor import configure_pools, get_pool_metrics, shutdown_pools
+from ..inference.registry import get_registry
+from ..llm.groq_client import GroqClient
+from ..llm.response_cache import ResponseCache, TextEmbedder
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,9 +35,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+settings = get_settings()
+configure_pools(settings)
+configure_feature_cache(settings)
+
+# Repeated queries are answered from the cache, optionally matched by embedding similarity
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL,
+    embed=TextEmbedder(settings.RESPONSE_CACHE_EMBEDDING_MODEL) if settings.RESPONSE_CACHE_EMBEDDING_MODEL else None,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY
+) if settings.RESPONSE_CACHE_ENABLED else None
+
+# With routing on, turns go to the local model or Groq, whichever is faster and healthy
+groq_client = GroqClient() if settings.LLM_ROUTER_ENABLED else None
+
 # Initialize voice assistant
 MODEL_PATH = Path("models/llama-7b")  # Update with your model path
-assistant = VoiceAssistant(llm_model_path=str(MODEL_PATH))
+assistant = VoiceAssistant(
+    llm_model_path=str(MODEL_PATH),
+    whisper_model=settings.WHISPER_MODEL,
+    stream_options={
+        "sample_rate": settings.SAMPLE_RATE,
+        "step_seconds": settings.STREAM_STEP_SECONDS,
+        "max_window_seconds": settings.STREAM_MAX_WINDOW_SECONDS,
+        "buffer_seconds": settings.STREAM_BUFFER_SECONDS
+    },
+    speech_options={
+        "max_batch_size": settings.WHISPER_MAX_BATCH_SIZE,
+        "max_batch_wait_ms": settings.WHISPER_MAX_BATCH_WAIT_MS,
+        "quantization": settings.WHISPER_QUANTIZATION
+    },
+    llm_options={
+        "max_batch_size": settings.LLM_MAX_BATCH_SIZE,
+        "max_new_tokens": settings.LLM_MAX_NEW_TOKENS,
+        "kv_cache_budget_mb": settings.LLM_KV_CACHE_BUDGET_MB,
+        "max_pending": settings.INFERENCE_QUEUE_SIZE,
+        "session_cache_mb": settings.LLM_SESSION_CACHE_MB,
+        "session_cache_ttl": settings.LLM_SESSION_CACHE_TTL,
+        "session_cache_max_sessions": settings.LLM_SESSION_CACHE_MAX_SESSIONS,
+        "quantization": settings.LLM_QUANTIZATION
+    },
+    conversation_options={
+        "max_tokens_per_session": settings.CONVERSATION_MAX_TOKENS,
+        "trim_to": settings.CONVERSATION_TRIM_TO,
+        "ttl_seconds": settings.CONVERSATION_TTL,
+        "max_sessions": settings.CONVERSATION_MAX_SESSIONS,
+        "max_total_tokens": settings.CONVERSATION_MAX_TOTAL_TOKENS,
+        "db_path": settings.CONVERSATION_DB_PATH
+    },
+    voice_detector=VoiceDetector() if settings.VAD_ENABLED else None,
+    streaming=settings.STREAMING_TRANSCRIPTION,
+    pipeline_options={
+        "queue_size": settings.PIPELINE_QUEUE_SIZE,
+        "speculative_prefill": settings.SPECULATIVE_PREFILL,
+        "chunker_options": {
+            "min_chars": settings.SENTENCE_MIN_CHARS,
+            "max_chars": settings.SENTENCE_MAX_CHARS
+        }
+    },
+    response_cache=response_cache,
+    remote_llms={"groq": groq_client} if groq_client is not None else None,
+    router_options={
+        "max_in_flight": {"groq": settings.LLM_ROUTER_REMOTE_MAX_IN_FLIGHT},
+        "window": settings.LLM_ROUTER_WINDOW,
+        "max_error_rate": settings.LLM_ROUTER_MAX_ERROR_RATE,
+        "cooldown_seconds": settings.LLM_ROUTER_COOLDOWN
+    }
+)
+
+# Enrolled speakers live on disk so every worker identifies against the same gallery
+speaker_store: Optional[SpeakerEnrollmentStore] = None
+voice_analyzer: Optional[VoiceFeatureAnalyzer] = None
+if settings.SPEAKER_ENROLLMENT_ENABLED:
+    speaker_store = SpeakerEnrollmentStore(settings.SPEAKER_STORE_PATH, n_probe=settings.SPEAKER_SEARCH_PROBES)
+    voice_analyzer = VoiceFeatureAnalyzer(speaker_index=speaker_store)
+
+if settings.MODEL_PRELOAD:
+    # Runs in the master under `gunicorn --preload`; forked workers then share
+    # the weight pages copy-on-write instead of loading their own copy
+    get_registry().warm_up()
 
 # Store active connections
 active_connections: Dict[str, WebSocket] = {}
@@ -33,27 +123,233 @@ active_connections: Dict[str, WebSocket] = {}
 async def root():
     return {"message": "Voice Assistant API is running"}
 
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready once warm-up has loaded every model (immediately if models load on first use)."""
+    if settings.MODEL_WARMUP and not all(
+        model["loaded"] for model in get_registry().get_metrics().values()
+    ):
+        raise HTTPException(status_code=503, detail="Models are still loading")
+    return {"status": "ready"}
+
+@app.get("/metrics/inference")
+async def inference_metrics():
+    return get_pool_metrics()
+
+@app.get("/metrics/models")
+async def model_metrics():
+    return get_registry().get_metrics()
+
+@app.get("/metrics/whisper")
+async def whisper_metrics():
+    return assistant.speech_processor.get_metrics()
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    return assistant.llm_engine.get_metrics()
+
+@app.get("/metrics/router")
+async def router_metrics():
+    if groq_client is None:
+        return {}
+    return {**assistant.llm.get_metrics(), "groq": groq_client.get_metrics()}
+
+@app.get("/metrics/vad")
+async def vad_metrics():
+    if assistant.voice_detector is None:
+        return {}
+    return assistant.voice_detector.get_gate_metrics()
+
+@app.get("/metrics/pipeline")
+async def pipeline_metrics():
+    return assistant.pipeline_metrics.get_metrics()
+
+@app.get("/metrics/responses")
+async def response_cache_metrics():
+    return response_cache.get_metrics() if response_cache is not None else {}
+
+@app.get("/metrics/ingest")
+async def ingest_metrics():
+    return get_decoder_metrics()
+
+@app.get("/metrics/features")
+async def feature_metrics():
+    return get_feature_cache().get_metrics()
+
+async def read_utterance(request: Request) -> np.ndarray:
+    """Request body as one utterance of raw float32 PCM."""
+    if voice_analyzer is None:
+        raise HTTPException(status_code=503, detail="Speaker enrollment is disabled")
+    body = await request.body()
+    if not body or len(body) % 4:
+        raise HTTPException(status_code=400, detail="Expected a non-empty float32 PCM body")
+    return np.frombuffer(body, dtype=np.float32)
+
+async def enroll_speaker(speaker_id: str, request: Request, sample_rate: int, replace: bool):
+    audio = await read_utterance(request)
+    embeddings = await voice_analyzer.embed_speakers([audio], sample_rate)
+    return await asyncio.to_thread(speaker_store.enroll, speaker_id, embeddings, replace)
+
+@app.post("/speakers/{speaker_id}/enroll")
+async def enroll(speaker_id: str, request: Request, sample_rate: int = 16000):
+    """Add an utterance (raw float32 PCM body) to a speaker's voiceprint."""
+    return await enroll_speaker(speaker_id, request, sample_rate, replace=False)
+
+@app.put("/speakers/{speaker_id}")
+async def replace_speaker(speaker_id: str, request: Request, sample_rate: int = 16000):
+    """Replace a speaker's voiceprint with one utterance (raw float32 PCM body)."""
+    return await enroll_speaker(speaker_id, request, sample_rate, replace=True)
+
+@app.delete("/speakers/{speaker_id}")
+async def delete_speaker(speaker_id: str):
+    if speaker_store is None:
+        raise HTTPException(status_code=503, detail="Speaker enrollment is disabled")
+    if not await asyncio.to_thread(speaker_store.delete, speaker_id):
+        raise HTTPException(status_code=404, detail=f"Unknown speaker {speaker_id}")
+    return {"deleted": speaker_id}
+
+@app.get("/speakers")
+async def list_speakers():
+    if speaker_store is None:
+        raise HTTPException(status_code=503, detail="Speaker enrollment is disabled")
+    return speaker_store.speakers()
+
+@app.post("/speakers/identify")
+async def identify(request: Request, sample_rate: int = 16000, top_k: int = 5):
+    """Identify the speaker of an utterance (raw float32 PCM body) among enrolled speakers."""
+    audio = await read_utterance(request)
+    return await voice_analyzer.identify_speaker(audio, sample_rate=sample_rate, top_k=top_k)
+
+@app.get("/metrics/speakers")
+async def speaker_metrics():
+    return speaker_store.get_metrics() if speaker_store is not None else {}
+
+def stop_pipeline_on_sender_exit(pipeline, sender: asyncio.Task):
+    """A dead sender would let the event queue fill and stall every stage; stop the pipeline instead."""
+    if not sender.cancelled() and sender.exception() is not None:
+        logger.error(f"Sending replies failed: {sender.exception()}")
+    pipeline.cancel()
+
+async def send_responses(websocket: WebSocket, responses, encoding: str):
+    try:
+        async for response in responses:
+            await send_message(websocket, response, encoding)
+    finally:
+        # Cancels in-flight generation when the send fails
+        await responses.aclose()
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
+    """Voice session for one client.
+
+    By default binary messages are raw float32 PCM at SAMPLE_RATE and replies are
+    JSON. ``?protocol=framed`` switches to the framed audio protocol (see
+    backend.speech.framing), ``?codec=opus|ogg|webm`` to compressed audio (see
+    backend.speech.decoding) and ``?encoding=msgpack`` to msgpack replies.
+
+    Streamed sessions run through a VoicePipeline: replies are sent as the
+    stages produce them while audio keeps being received.
+    """
+    codec = websocket.query_params.get("codec")
+    try:
+        encoding = validate_encoding(websocket.query_params.get("encoding", "json"))
+        decoder = StreamingAudioDecoder(codec, settings.SAMPLE_RATE) if codec else None
+    except Exception as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+    parser = FrameParser(settings.SAMPLE_RATE) if websocket.query_params.get("protocol") == "framed" else None
+
     await websocket.accept()
     active_connections[client_id] = websocket
+
+    pipeline = sender = None
+    if settings.PIPELINE_ENABLED and (settings.STREAMING_TRANSCRIPTION or settings.VAD_ENABLED):
+        pipeline = assistant.open_pipeline(client_id)
+        sender = asyncio.create_task(send_responses(websocket, pipeline.events(), encoding))
+        sender.add_done_callback(functools.partial(stop_pipeline_on_sender_exit, pipeline))
     
     try:
         while True:
-            data = await websocket.receive_bytes()
-            
-            # Process voice input and stream response
-            async for response in assistant.process_voice_input(client_id, data):
-                await websocket.send_json(response)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            # A text message marks the end of the current utterance
+            if message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "end":
+                    if pipeline is not None:
+                        await pipeline.end()
+                    else:
+                        await send_responses(websocket, assistant.finish_voice_input(client_id), encoding)
+                continue
+
+            end_of_utterance = False
+            audio_data = message["bytes"]
+            if parser is not None:
+                try:
+                    frame = parser.parse(audio_data)
+                except FrameError as e:
+                    await send_message(websocket, {"success": False, "error": str(e)}, encoding)
+                    continue
+                audio_data, end_of_utterance = frame.samples, frame.end_of_utterance
+            elif decoder is not None:
+                audio_data = decoder.feed(audio_data)
+
+            if len(audio_data):
+                if pipeline is not None:
+                    # Stages run in the background; replies go out through the sender task
+                    await pipeline.feed(audio_data)
+                else:
+                    if settings.STREAMING_TRANSCRIPTION or settings.VAD_ENABLED:
+                        # Send utterance events and partial transcripts while the user is speaking
+                        responses = assistant.stream_voice_input(client_id, audio_data)
+                    else:
+                        # Process voice input and stream response
+                        responses = assistant.process_voice_input(client_id, audio_data)
+                    await send_responses(websocket, responses, encoding)
+
+            if end_of_utterance:
+                if pipeline is not None:
+                    await pipeline.end()
+                else:
+                    await send_responses(websocket, assistant.finish_voice_input(client_id), encoding)
                 
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        if pipeline is not None:
+            await pipeline.close()
+            await asyncio.gather(sender, return_exceptions=True)
+        assistant.end_session(client_id)
         if client_id in active_connections:
             del active_connections[client_id]
 
+async def warm_up_models():
+    try:
+        await asyncio.to_thread(get_registry().warm_up)
+    except Exception as e:
+        logger.error(f"Model warm-up failed: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    """Load the models in the background unless they load on first use.
+
+    The server accepts connections right away; /ready reports when warm-up is done.
+    """
+    if settings.MODEL_WARMUP:
+        app.state.warmup = asyncio.create_task(warm_up_models())
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup resources on shutdown."""
     assistant.cleanup()
+    if groq_client is not None:
+        await groq_client.close()
+    if assistant.voice_detector is not None:
+        assistant.voice_detector.cleanup()
+    shutdown_pools()
     logger.info("Application shutting down")
@@ -0,0 +1,342 @@
+import asyncio
+import re
+import time
+import logging
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sentence-final punctuation (with closing quotes/brackets) followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+
+class SentenceChunker:
+    def __init__(self, min_chars: int = 20, max_chars: int = 200):
+        """Split streamed LLM text into chunks a speech synthesizer can start on.
+
+        A chunk ends at a sentence boundary once it holds at least
+        ``min_chars`` characters (so "Hi." is not synthesized on its own), or
+        at the last clause/word break before ``max_chars`` when a sentence
+        runs on.
+
+        Args:
+            min_chars: Shortest chunk cut at a sentence boundary
+            max_chars: Longest chunk before it is cut at a comma or space
+        """
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a text delta and return the chunks it completed."""
+        self._buffer += text
+        chunks = []
+        while True:
+            boundary = next(
+                (match.end() for match in _SENTENCE_END.finditer(self._buffer) if match.end() >= self.min_chars),
+                None
+            )
+            if boundary is None and len(self._buffer) > self.max_chars:
+                window = self._buffer[:self.max_chars]
+                cut = max(window.rfind(", "), window.rfind("; "))
+                boundary = cut + 2 if cut > 0 else window.rfind(" ") + 1 or self.max_chars
+            if boundary is None:
+                return chunks
+
+            chunk, self._buffer = self._buffer[:boundary].strip(), self._buffer[boundary:]
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self) -> str:
+        """Return the remaining text at the end of a response."""
+        chunk, self._buffer = self._buffer.strip(), ""
+        return chunk
+
+
+class StageLatency:
+    def __init__(self, window: int = 1000):
+        """Rolling latency distribution of one pipeline stage."""
+        self._samples = deque(maxlen=window)
+        self._count = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self._count += 1
+
+    def get_metrics(self) -> Dict[str, float]:
+        if not self._samples:
+            return {"count": 0}
+        samples = np.asarray(self._samples) * 1000
+        return {
+            "count": self._count,
+            "mean_ms": round(float(samples.mean()), 3),
+            "p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p95_ms": round(float(np.percentile(samples, 95)), 3)
+        }
+
+
+class PipelineMetrics:
+    # asr: user stopped talking -> final transcript
+    # llm_first_token: final transcript -> first response text
+    # first_sentence: user stopped talking -> first chunk ready for synthesis
+    # response: user stopped talking -> response finished
+    STAGES = ("asr", "llm_first_token", "first_sentence", "response")
+
+    def __init__(self):
+        """Per-stage latency shared by every session's pipeline."""
+        self.stages = {stage: StageLatency() for stage in self.STAGES}
+        self.prefix_updates = 0
+        self.endpoint_updates = 0
+        self.abandoned_prefixes = 0
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage].record(seconds)
+
+    def get_metrics(self) -> Dict:
+        return {
+            **{stage: latency.get_metrics() for stage, latency in self.stages.items()},
+            "prefix_updates": self.prefix_updates,
+            "endpoint_updates": self.endpoint_updates,
+            "abandoned_prefixes": self.abandoned_prefixes
+        }
+
+
+class _Turn:
+    __slots__ = ("text", "ended_at", "speculated", "first_sentence")
+
+    def __init__(self, text: str, ended_at: Optional[float], speculated: bool):
+        self.text = text
+        self.ended_at = ended_at
+        self.speculated = speculated
+        self.first_sentence = True
+
+
+_END = object()
+_CLOSED = object()
+
+class VoicePipeline:
+    def __init__(
+        self,
+        transcribe: Callable[[Optional[np.ndarray]], AsyncIterator[Dict]],
+        respond: Callable[[str], AsyncIterator[Dict]],
+        update_prefix: Optional[Callable[[str, bool], Awaitable]] = None,
+        discard_prefix: Optional[Callable[[], None]] = None,
+        queue_size: int = 8,
+        metrics: Optional[PipelineMetrics] = None,
+        chunker_options: Optional[Dict] = None
+    ):
+        """ASR, LLM and sentence-chunking stages of one voice session, run concurrently.
+
+        Stages are tasks connected by bounded queues, so transcription of new
+        audio, LLM generation for the previous utterance and chunking of its
+        output overlap, and a slow consumer applies backpressure down to
+        ``feed``. While the user is still speaking, the stable (committed)
+        part of the transcript is handed to ``update_prefix`` so the LLM can
+        start on the prompt before the final transcript arrives; when the
+        user stops speaking, the whole latest hypothesis is sent as an
+        endpoint update while the final decode is still running. Prefixes
+        are not queued: each one replaces the previous in a single slot, so
+        transcription never waits for the LLM stage.
+
+        Events come out of ``events()``: transcript events as produced, the
+        LLM's text deltas, and ``{"type": "sentence"}`` chunks ready for
+        speech synthesis.
+
+        Args:
+            transcribe: Yields transcript events for an audio chunk, or for
+                None at the end of an utterance; a ``final`` event carries the
+                transcript to answer
+            respond: Yields LLM response chunks for a transcript
+            update_prefix: Speculatively processes a transcript prefix; the
+                flag marks endpoint updates
+            discard_prefix: Drops speculative work for an utterance that
+                produced no transcript
+            queue_size: Capacity of each queue between stages
+            metrics: Latency metrics to record into
+            chunker_options: Options for the SentenceChunker
+        """
+        self.transcribe = transcribe
+        self.respond = respond
+        self.update_prefix = update_prefix
+        self.discard_prefix = discard_prefix
+        self.metrics = metrics or PipelineMetrics()
+        self.chunker = SentenceChunker(**(chunker_options or {}))
+
+        self._audio: asyncio.Queue = asyncio.Queue(queue_size)
+        self._transcripts: asyncio.Queue = asyncio.Queue(queue_size)
+        self._text: asyncio.Queue = asyncio.Queue(queue_size)
+        self._events: asyncio.Queue = asyncio.Queue(queue_size)
+
+        # Latest (prefix, endpoint) to speculate on; newer prefixes overwrite it
+        self._speculated: Optional[Tuple[str, bool]] = None
+        self._speculation: Optional[asyncio.Task] = None
+        self._closed = False
+        self._tasks = [
+            asyncio.create_task(self._asr_stage()),
+            asyncio.create_task(self._llm_stage()),
+            asyncio.create_task(self._chunk_stage())
+        ]
+
+    async def feed(self, audio: np.ndarray):
+        """Queue audio for transcription (waits while the pipeline is backed up)."""
+        self._check_open()
+        await self._audio.put(audio)
+
+    async def end(self):
+        """Mark the end of the current utterance."""
+        self._check_open()
+        await self._audio.put((_END, time.perf_counter()))
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("Voice pipeline is closed")
+
+    async def events(self) -> AsyncIterator[Dict]:
+        """Events produced by every stage, until the pipeline is closed."""
+        while True:
+            event = await self._events.get()
+            if event is _CLOSED:
+                return
+            yield event
+
+    def cancel(self):
+        """Stop every stage without waiting for them (e.g. from a callback when the consumer died)."""
+        if self._closed:
+            return
+        self._closed = True
+        for task in self._tasks + [self._speculation]:
+            if task is not None:
+                task.cancel()
+        # Unblock a feed() waiting for room and a consumer waiting in events()
+        for queue in (self._audio, self._events):
+            while not queue.empty():
+                queue.get_nowait()
+        self._events.put_nowait(_CLOSED)
+
+    async def close(self):
+        """Stop every stage, abandoning queued work."""
+        self.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _asr_stage(self):
+        ended_at = None
+        hypothesis = ""
+        speculated = False
+        while True:
+            item = await self._audio.get()
+            audio = item
+            if isinstance(item, tuple) and item[0] is _END:
+                audio, ended_at = None, item[1]
+                speculated |= self._endpoint(hypothesis)
+
+            try:
+                async for event in self.transcribe(audio):
+                    event_type = event.get("type")
+                    if event_type == "speech_end" and ended_at is None:
+                        ended_at = time.perf_counter()
+                        speculated |= self._endpoint(hypothesis)
+
+                    await self._events.put(event)
+                    if event_type == "partial":
+                        hypothesis = event.get("transcript", "")
+                        speculated |= self._speculate(event.get("committed", ""))
+                    elif event_type == "final":
+                        if ended_at is not None:
+                            self.metrics.record("asr", time.perf_counter() - ended_at)
+                        # Updates still waiting in the slot are for this turn; drop them
+                        self._speculated = None
+                        await self._transcripts.put(_Turn(event.get("transcript", ""), ended_at, speculated))
+                        ended_at = None
+                        hypothesis = ""
+                        speculated = False
+            except Exception as e:
+                logger.error(f"Transcription stage failed: {e}")
+                await self._events.put({"success": False, "error": str(e)})
+
+    def _endpoint(self, hypothesis: str) -> bool:
+        """The user stopped speaking: speculate on everything heard so far."""
+        return self._speculate(hypothesis, endpoint=True)
+
+    async def _llm_stage(self):
+        while True:
+            item = await self._transcripts.get()
+
+            # A running speculative update is the head start for this turn
+            if self._speculation is not None:
+                await asyncio.gather(self._speculation, return_exceptions=True)
+
+            if not item.text:
+                if item.speculated and self.discard_prefix is not None:
+                    self.discard_prefix()
+                    self.metrics.abandoned_prefixes += 1
+                continue
+
+            final_at = time.perf_counter()
+            first = True
+            try:
+                async for chunk in self.respond(item.text):
+                    if first and chunk.get("text"):
+                        self.metrics.record("llm_first_token", time.perf_counter() - final_at)
+                        first = False
+                    await self._text.put((item, chunk))
+            except Exception as e:
+                logger.error(f"LLM stage failed: {e}")
+                await self._text.put((item, {"success": False, "error": str(e)}))
+
+    def _speculate(self, prefix: str, endpoint: bool = False) -> bool:
+        """Send the latest prefix to the LLM; at most one update runs at a time.
+
+        Returns:
+            Whether the LLM holds or will receive speculative work for the utterance
+        """
+        if self.update_prefix is None or not prefix:
+            return False
+        if (prefix, endpoint) != self._speculated:
+            self._speculated = (prefix, endpoint)
+            if self._speculation is None or self._speculation.done():
+                self._speculation = asyncio.create_task(self._run_speculation())
+        return True
+
+    async def _run_speculation(self):
+        done = None
+        # Catch up with prefixes that arrived while an update was running
+        while self._speculated is not None and self._speculated != done:
+            done = self._speculated
+            try:
+                await self.update_prefix(*done)
+            except Exception as e:
+                logger.warning(f"Speculative prefix update failed: {e}")
+                return
+            if done[1]:
+                self.metrics.endpoint_updates += 1
+            else:
+                self.metrics.prefix_updates += 1
+
+    async def _chunk_stage(self):
+        while True:
+            turn, chunk = await self._text.get()
+            last = chunk.get("finished") or not chunk.get("success", True)
+            if not last:
+                await self._events.put(chunk)
+
+            sentences = self.chunker.feed(chunk.get("text", ""))
+            if last:
+                sentences.append(self.chunker.flush())
+            for sentence in sentences:
+                if sentence:
+                    await self._emit_sentence(turn, sentence)
+
+            # The closing chunk follows the response's last sentence
+            if last:
+                await self._events.put(chunk)
+
+            if chunk.get("finished") and turn.ended_at is not None:
+                self.metrics.record("response", time.perf_counter() - turn.ended_at)
+
+    async def _emit_sentence(self, turn: _Turn, sentence: str):
+        if turn.first_sentence and turn.ended_at is not None:
+            self.metrics.record("first_sentence", time.perf_counter() - turn.ended_at)
+        turn.first_sentence = False
+        await self._events.put({"type": "sentence", "text": sentence, "success": True})
@@ -2,30 +2,47 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-import whisper
 from typing import Dict
 
 from .utils.logger import logger
 from .utils.error_handler import handle_error, AppError, ErrorCodes
+from config.settings import get_settings
+from ..inference.executor import (
+    ExecutorSaturatedError,
+    configure_pools,
+    get_pool,
+    get_pool_metrics,
+    shutdown_pools
+)
+from ..inference.registry import get_registry
+from ..speech.processor import acquire_whisper_model
 
-# Global model instance
-model = None
+# Reference to the shared Whisper model
+model_ref = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up Voice Assistant backend...")
     try:
-        global model
-        logger.info("Loading Whisper model...")
-        model = whisper.load_model("base")
-        logger.info("Whisper model loaded successfully")
+        global model_ref
+        settings = get_settings()
+        configure_pools(settings)
+        # Shared with any SpeechProcessor using the same model variant
+        model_ref = acquire_whisper_model(settings.WHISPER_MODEL, quantization=settings.WHISPER_QUANTIZATION)
+        if settings.MODEL_WARMUP:
+            logger.info("Loading Whisper model...")
+            await get_pool("whisper").run(get_registry().warm_up, [model_ref.key])
+            logger.info("Whisper model loaded successfully")
         yield
     except Exception as e:
         logger.error("Failed to initialize application", exc_info=e)
         raise
     finally:
         # Cleanup
+        if model_ref is not None:
+            model_ref.release()
+        shutdown_pools()
         logger.info("Shutting down Voice Assistant backend...")
 
 app = FastAPI(lifespan=lifespan)
@@ -74,12 +91,20 @@ async def health_check() -> Dict[str, str]:
     logger.debug("Health check endpoint called")
     return {"status": "healthy"}
 
+@app.get("/metrics/inference")
+async def inference_metrics() -> Dict[str, Dict]:
+    return get_pool_metrics()
+
+@app.get("/metrics/models")
+async def model_metrics() -> Dict[str, Dict]:
+    return get_registry().get_metrics()
+
 @app.post("/transcribe")
 async def transcribe_audio(audio_data: bytes):
     try:
         logger.info("Received transcription request")
         
-        if not model:
+        if not model_ref:
             raise AppError(
                 "Whisper model not initialized",
                 ErrorCodes.WHISPER_ERROR,
@@ -93,15 +118,23 @@ async def transcribe_audio(audio_data: bytes):
                 status_code=400
             )
 
-        # Process audio with Whisper
+        # Process audio with Whisper off the event loop
         logger.debug("Processing audio with Whisper model")
-        result = model.transcribe(audio_data)
+        # The first call loads the model on the pool when warm-up is disabled
+        result = await get_pool("whisper").run(lambda: model_ref.get().transcribe(audio_data))
         
         logger.info("Audio transcription completed successfully")
         return {"text": result["text"]}
 
     except AppError as e:
         raise e
+    except ExecutorSaturatedError as e:
+        raise AppError(
+            "Transcription capacity exhausted, retry later",
+            ErrorCodes.SERVICE_OVERLOADED,
+            status_code=503,
+            details={"pool": e.pool_name}
+        )
     except Exception as e:
         logger.exception("Error during transcription", extra={
             "error": str(e)
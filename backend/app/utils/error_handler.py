@@ -27,6 +27,7 @@ class ErrorCodes:
     VALIDATION_ERROR = "VALIDATION_ERROR"
     NOT_FOUND = "NOT_FOUND"
     INTERNAL_ERROR = "INTERNAL_ERROR"
+    SERVICE_OVERLOADED = "SERVICE_OVERLOADED"
 
 def handle_error(error: Exception, context: str = "") -> HTTPException:
     """
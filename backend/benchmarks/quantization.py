@@ -0,0 +1,147 @@
+"""Accuracy/latency comparison of float and int8 model backends on CPU.
+
+Run from the repository root, for example::
+
+    python -m backend.benchmarks.quantization whisper --model base --audio a.wav b.wav
+    python -m backend.benchmarks.quantization whisper --model base --references refs.tsv
+    python -m backend.benchmarks.quantization llm --model-path models/llama-7b --prompts prompts.txt
+
+``refs.tsv`` holds ``<audio path>\\t<reference transcript>`` lines; without
+references the float model's transcripts are the reference. For the LLM the
+float model's greedy continuation is the reference and agreement is the share
+of generated tokens that match it.
+"""
+import argparse
+import functools
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+from ..inference.quantization import QUANTIZATION_MODES, serialized_size
+from ..inference.registry import ModelRegistry
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance divided by the reference length."""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+def _load(registry: ModelRegistry, key: str, loader) -> Dict:
+    model = registry.acquire(key, loader).get()
+    metrics = registry.get_metrics()[key]
+    return {"model": model, "load_seconds": metrics["load_seconds"], "rss_delta_bytes": metrics["rss_delta_bytes"]}
+
+def compare_whisper(model_name: str, audio_paths: Sequence[str], references: Optional[List[str]], modes: Sequence[str]) -> Dict:
+    import whisper
+    from ..speech.processor import load_whisper_model
+
+    audio = [whisper.load_audio(path) for path in audio_paths]
+    registry = ModelRegistry()
+    results: Dict[str, Dict] = {}
+    for mode in modes:
+        loaded = _load(registry, f"whisper:{model_name}:{mode}", functools.partial(load_whisper_model, model_name, "cpu", mode))
+        model = loaded.pop("model")
+        # Warm-up run so one-time kernel initialisation is not timed
+        model.transcribe(audio[0][:16000], fp16=False)
+
+        transcripts, latencies = [], []
+        for samples in audio:
+            started = time.perf_counter()
+            transcripts.append(model.transcribe(samples, fp16=False)["text"].strip())
+            latencies.append(time.perf_counter() - started)
+
+        total_audio = sum(len(samples) for samples in audio) / 16000
+        results[mode] = {
+            **loaded,
+            "weights_bytes": serialized_size(model),
+            "latency_seconds": round(sum(latencies), 3),
+            "real_time_factor": round(sum(latencies) / total_audio, 3),
+            "transcripts": transcripts
+        }
+
+    reference = references or results[modes[0]]["transcripts"]
+    for result in results.values():
+        result["wer"] = round(
+            sum(word_error_rate(ref, hyp) for ref, hyp in zip(reference, result["transcripts"])) / len(reference), 4
+        )
+    return results
+
+def compare_llm(model_path: str, prompts: Sequence[str], max_new_tokens: int, modes: Sequence[str]) -> Dict:
+    import torch
+    from ..llm.engine import load_causal_lm
+
+    registry = ModelRegistry()
+    results: Dict[str, Dict] = {}
+    reference: Optional[List[List[int]]] = None
+    for mode in modes:
+        loaded = _load(registry, f"llm:{model_path}:{mode}", functools.partial(load_causal_lm, model_path, "cpu", mode))
+        tokenizer, model = loaded.pop("model")
+
+        outputs, elapsed, generated = [], 0.0, 0
+        for prompt in prompts:
+            input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+            started = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(
+                    input_ids,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+            elapsed += time.perf_counter() - started
+            new_tokens = output[0, input_ids.shape[1]:].tolist()
+            generated += len(new_tokens)
+            outputs.append(new_tokens)
+
+        if reference is None:
+            reference = outputs
+        matched = sum(
+            sum(1 for a, b in zip(ref, out) if a == b) for ref, out in zip(reference, outputs)
+        )
+        results[mode] = {
+            **loaded,
+            "weights_bytes": serialized_size(model),
+            "tokens_per_second": round(generated / elapsed, 2) if elapsed else None,
+            "token_agreement": round(matched / max(sum(len(ref) for ref in reference), 1), 4),
+            "samples": [tokenizer.decode(tokens) for tokens in outputs[:3]]
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZATION_MODES), choices=QUANTIZATION_MODES)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    whisper_parser = commands.add_parser("whisper")
+    whisper_parser.add_argument("--model", default="base")
+    whisper_parser.add_argument("--audio", nargs="*", default=[])
+    whisper_parser.add_argument("--references", help="TSV of audio path and reference transcript")
+
+    llm_parser = commands.add_parser("llm")
+    llm_parser.add_argument("--model-path", required=True)
+    llm_parser.add_argument("--prompts", required=True, help="Text file with one prompt per line")
+    llm_parser.add_argument("--max-new-tokens", type=int, default=64)
+
+    args = parser.parse_args()
+    if args.command == "whisper":
+        audio, references = list(args.audio), None
+        if args.references:
+            with open(args.references) as tsv:
+                rows = [line.rstrip("\n").split("\t", 1) for line in tsv if line.strip()]
+            audio, references = [row[0] for row in rows], [row[1] for row in rows]
+        if not audio:
+            parser.error("whisper needs --audio or --references")
+        results = compare_whisper(args.model, audio, references, args.modes)
+    else:
+        with open(args.prompts) as prompts:
+            results = compare_llm(args.model_path, [line.strip() for line in prompts if line.strip()],
+                                  args.max_new_tokens, args.modes)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
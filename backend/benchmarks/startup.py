@@ -0,0 +1,140 @@
+"""Startup benchmark: import time, time to readiness and memory per worker.
+
+Run from the repository root, for example::
+
+    python -m backend.benchmarks.startup --import-only
+    python -m backend.benchmarks.startup --server uvicorn
+    python -m backend.benchmarks.startup --server gunicorn --workers 4
+    python -m backend.benchmarks.startup --server gunicorn --workers 4 --no-preload
+
+Memory is read from /proc (Linux). PSS divides shared pages between the
+processes mapping them, so with preloaded weights the summed PSS of N workers
+stays close to one copy of the model while the summed RSS counts it N times.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+APP = "backend.api.main:app"
+
+def measure_import(module: str, env: Dict[str, str]) -> Dict[str, float]:
+    """Import a module in a fresh interpreter and report how long it took."""
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - started\n"
+        "heavy = [name for name in ('torch', 'transformers', 'whisper', 'librosa') if name in sys.modules]\n"
+        "print(elapsed)\n"
+        "print(','.join(heavy))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+    ).stdout.split("\n")
+    return {"import_seconds": round(float(output[0]), 3), "heavy_modules_imported": output[1]}
+
+def server_command(server: str, workers: int, port: int) -> List[str]:
+    if server == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", APP, "--port", str(port), "--workers", str(workers)]
+    return [sys.executable, "-m", "gunicorn", "-c", "backend/gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers)]
+
+def wait_for(url: str, deadline: float) -> Optional[float]:
+    """Poll a URL until it answers 200; return the time it took or None on timeout."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+def process_tree(pid: int) -> List[int]:
+    """The process and its descendants."""
+    pids = [pid]
+    for child in _children(pid):
+        pids.extend(process_tree(child))
+    return pids
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+def memory_of(pid: int) -> Dict[str, int]:
+    """RSS and PSS of one process in bytes."""
+    usage = {"rss": 0, "pss": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                field, _, value = line.partition(":")
+                if field in ("Rss", "Pss"):
+                    usage[field.lower()] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return usage
+
+def measure_server(server: str, workers: int, port: int, env: Dict[str, str], timeout: float) -> Dict:
+    """Start a server, time /health and /ready, then report memory of every process."""
+    process = subprocess.Popen(
+        server_command(server, workers, port), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        started = time.perf_counter()
+        health = wait_for(f"http://127.0.0.1:{port}/health", timeout)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", timeout)
+        total = time.perf_counter() - started
+
+        processes = {pid: memory_of(pid) for pid in process_tree(process.pid)}
+        return {
+            "server": server,
+            "workers": workers,
+            "preload": env.get("MODEL_PRELOAD"),
+            "health_seconds": round(health, 3) if health is not None else None,
+            "ready_seconds": round(total, 3) if ready is not None else None,
+            "processes": len(processes),
+            "rss_total_mb": round(sum(usage["rss"] for usage in processes.values()) / 2 ** 20, 1),
+            "pss_total_mb": round(sum(usage["pss"] for usage in processes.values()) / 2 ** 20, 1)
+        }
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for readiness")
+    parser.add_argument("--no-preload", action="store_true", help="Load models in every worker")
+    parser.add_argument("--no-warmup", action="store_true", help="Load models on first request")
+    parser.add_argument("--import-only", action="store_true", help="Only time importing the app module")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["MODEL_WARMUP"] = "false" if args.no_warmup else "true"
+    if args.no_preload:
+        env["MODEL_PRELOAD"] = "false"
+    elif args.server == "gunicorn":
+        env["MODEL_PRELOAD"] = "true"
+
+    results = {"import": measure_import(APP.split(":")[0], env)}
+    if not args.import_only:
+        results["server"] = measure_server(args.server, args.workers, args.port, env, args.timeout)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# Pre-forking server config: models load once in the master and forked
+# workers share the weight pages copy-on-write.
+#
+#   gunicorn -c backend/gunicorn.conf.py
+import gc
+import os
+import sys
+
+wsgi_app = "backend.api.main:app"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = 120
+
+# Import the app (and with it the model weights) in the master before forking
+preload_app = True
+os.environ.setdefault("MODEL_PRELOAD", "true")
+
+def when_ready(server):
+    # Move every object loaded so far out of the collector's reach, so garbage
+    # collection in the workers does not touch (and copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Keep N workers from oversubscribing the CPUs with intra-op threads
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(int(os.getenv("WORKER_TORCH_THREADS", "1")))
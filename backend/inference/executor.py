@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSaturatedError(Exception):
+    def __init__(self, pool_name: str, capacity: int):
+        """Raised when an inference pool cannot accept more work.
+
+        Args:
+            pool_name: Name of the saturated pool
+            capacity: Number of running plus queued calls the pool allows
+        """
+        self.pool_name = pool_name
+        self.capacity = capacity
+        super().__init__(f"Inference pool '{pool_name}' is saturated ({capacity} calls in flight)")
+
+
+class InferencePool:
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        max_queue: int = 32,
+        queue_timeout: float = 0.5
+    ):
+        """Bounded thread pool running blocking model calls off the event loop.
+
+        At most ``max_workers`` calls run at once and ``max_queue`` more may wait.
+        When the pool is full a caller waits up to ``queue_timeout`` seconds for a
+        slot (backpressure) before ExecutorSaturatedError is raised.
+
+        Args:
+            name: Pool name used in logs, thread names and metrics
+            max_workers: Number of worker threads
+            max_queue: Number of calls allowed to wait for a worker
+            queue_timeout: Seconds to wait for a slot before rejecting (0 rejects immediately)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.queue_timeout = queue_timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-inference"
+        )
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function on the pool and await its result.
+
+        Args:
+            fn: Blocking callable, typically a model forward pass
+            *args: Positional arguments for ``fn``
+            **kwargs: Keyword arguments for ``fn``
+
+        Returns:
+            Whatever ``fn`` returns
+        """
+        await self._acquire()
+        self._in_flight += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(started)
+            raise
+        # The slot is freed when the call ends, not when the caller stops waiting:
+        # a cancelled caller's call may still be running on a worker thread
+        future.add_done_callback(lambda _: self._release_from_worker(loop, started))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _release_from_worker(self, loop: asyncio.AbstractEventLoop, started: float):
+        try:
+            loop.call_soon_threadsafe(self._release, started)
+        except RuntimeError:
+            # The event loop is closed; nobody is left waiting for a slot
+            pass
+
+    def _release(self, started: float):
+        self._busy_seconds += time.perf_counter() - started
+        self._in_flight -= 1
+        self._completed += 1
+        self._slots.release()
+
+    async def _acquire(self):
+        if self._slots is None:
+            # Created lazily so the semaphore belongs to the serving event loop
+            self._slots = asyncio.Semaphore(self.capacity)
+
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+
+        try:
+            if self.queue_timeout <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            logger.warning(f"Rejecting call to saturated inference pool '{self.name}'")
+            raise ExecutorSaturatedError(self.name, self.capacity)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report load and rejection counters for the pool."""
+        return {
+            "workers": self.max_workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "busy_seconds": round(self._busy_seconds, 3)
+        }
+
+    def shutdown(self):
+        """Stop the worker threads once queued calls finish."""
+        self._executor.shutdown(wait=False)
+
+
+# One pool per model type; sized by configure_pools()
+_pool_config: Dict[str, Dict] = {}
+_pools: Dict[str, InferencePool] = {}
+
+def configure_pools(settings):
+    """Size the per-model pools from application settings.
+
+    Must run before the first call to get_pool() for the new sizes to apply.
+    """
+    common = {
+        "max_queue": settings.INFERENCE_QUEUE_SIZE,
+        "queue_timeout": settings.INFERENCE_QUEUE_TIMEOUT
+    }
+    _pool_config.update({
+        "whisper": {"max_workers": settings.WHISPER_WORKERS, **common},
+        "voice_features": {"max_workers": settings.VOICE_FEATURE_WORKERS, **common},
+        "text_embedding": {"max_workers": 1, **common}
+    })
+
+def get_pool(name: str) -> InferencePool:
+    """Return the shared pool for a model type, creating it on first use."""
+    if name not in _pools:
+        _pools[name] = InferencePool(name, **_pool_config.get(name, {}))
+    return _pools[name]
+
+def get_pool_metrics() -> Dict[str, Dict]:
+    """Report metrics for every pool created so far."""
+    return {name: pool.get_metrics() for name, pool in _pools.items()}
+
+def shutdown_pools():
+    """Shut down all pools."""
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
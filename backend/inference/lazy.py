@@ -0,0 +1,44 @@
+import importlib
+import sys
+from functools import lru_cache
+from types import ModuleType
+from typing import Optional
+
+class LazyModule:
+    def __init__(self, name: str):
+        """Stand-in for a module that is imported on first attribute access.
+
+        Lets modules keep ``torch.``/``whisper.``-style call sites while the
+        import cost moves from process start to the first model call.
+
+        Args:
+            name: Fully qualified module name
+        """
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a lazily imported module."""
+    return LazyModule(name)
+
+
+@lru_cache(maxsize=1)
+def default_device() -> str:
+    """Pick ``cuda`` when available; imports torch on first call."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
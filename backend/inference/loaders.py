@@ -0,0 +1,7 @@
+from .lazy import lazy_import
+
+transformers = lazy_import("transformers")
+
+def load_audio_classifier(model_name: str):
+    """Build a transformers audio-classification pipeline."""
+    return transformers.pipeline("audio-classification", model=model_name)
@@ -0,0 +1,72 @@
+import io
+import logging
+import warnings
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "int8")
+
+def validate_quantization(mode: Optional[str]) -> str:
+    """Normalize a quantization setting, rejecting unknown modes."""
+    mode = (mode or "none").lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization '{mode}'; expected one of {QUANTIZATION_MODES}")
+    return mode
+
+def quantize_model(model, mode: Optional[str], device: str):
+    """Apply the requested weight quantization to a loaded model.
+
+    ``int8`` is dynamic quantization: Linear weights are stored as int8 and
+    activations are quantized on the fly, which shrinks the weights about 4x
+    and speeds up the matmuls that dominate CPU decoding. Dynamic quantization
+    only runs on CPU, so on other devices the model is returned unchanged.
+
+    Args:
+        model: Float model (torch.nn.Module)
+        mode: ``none`` or ``int8``
+        device: Device the model runs on
+
+    Returns:
+        The quantized model, or ``model`` itself when nothing was done
+    """
+    mode = validate_quantization(mode)
+    if mode == "none":
+        return model
+    if device != "cpu":
+        logger.warning(f"{mode} quantization is CPU-only; keeping the float model on {device}")
+        return model
+
+    import torch
+    from torch import nn
+
+    _replace_linear_subclasses(model)
+    with warnings.catch_warnings():
+        # torch.ao.quantization is deprecated in recent releases in favour of torchao
+        warnings.filterwarnings("ignore", message=".*deprecated.*")
+        quantized = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return quantized.eval()
+
+def _replace_linear_subclasses(model):
+    """Swap Linear subclasses (e.g. Whisper's dtype-casting Linear) for plain Linear.
+
+    Dynamic quantization only converts modules whose type is exactly nn.Linear.
+    The replacement shares the original weight and bias tensors.
+    """
+    from torch import nn
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+                plain = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None, device="meta")
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(parent, name, plain)
+
+def serialized_size(model) -> int:
+    """Bytes of a model's state dict, counting packed quantized weights."""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    __slots__ = ("loader", "model", "refs", "lock", "load_seconds", "model_bytes", "rss_delta_bytes")
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.model = None
+        self.refs = 0
+        self.lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.model_bytes: Optional[int] = None
+        self.rss_delta_bytes: Optional[int] = None
+
+
+class ModelRef:
+    def __init__(self, registry: "ModelRegistry", key: str):
+        """A consumer's reference to a shared model.
+
+        Holding a reference keeps the model registered; ``get()`` loads it on
+        first use and ``release()`` gives the reference back.
+        """
+        self._registry = registry
+        self.key = key
+        self._released = False
+
+    def get(self) -> Any:
+        """Return the shared model instance, loading it if needed."""
+        if self._released:
+            raise RuntimeError(f"Model reference '{self.key}' was released")
+        return self._registry._load(self.key)
+
+    @property
+    def loaded(self) -> bool:
+        return self._registry._is_loaded(self.key)
+
+    async def get_async(self) -> Any:
+        """Like ``get()``, but a first load runs in a worker thread instead of blocking the event loop."""
+        if self.loaded:
+            return self.get()
+        return await asyncio.to_thread(self.get)
+
+    def release(self):
+        """Return the reference; the model is unloaded once no consumer holds it."""
+        if not self._released:
+            self._released = True
+            self._registry._release(self.key)
+
+
+class ModelRegistry:
+    def __init__(self):
+        """Process-wide registry that loads each model at most once.
+
+        Consumers acquire a reference under a key describing the model (name,
+        variant and device) together with a loader. The loader runs on the first
+        ``get()`` of any reference, or during ``warm_up()``; later consumers of
+        the same key share the instance. When the last reference is released
+        the model is dropped.
+        """
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, loader: Callable[[], Any]) -> ModelRef:
+        """Take a reference to the model stored under ``key``.
+
+        Args:
+            key: Identifier of the model, e.g. ``whisper:base:cuda``
+            loader: Function building the model; only the first loader for a key is used
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(loader)
+            entry.refs += 1
+        return ModelRef(self, key)
+
+    def warm_up(self, keys: Optional[Iterable[str]] = None):
+        """Load the referenced models now instead of on first use.
+
+        Args:
+            keys: Models to load; defaults to every model with a reference
+        """
+        for key in list(keys if keys is not None else self._entries):
+            self._load(key)
+
+    def _is_loaded(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry.model is not None
+
+    def _load(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            raise KeyError(f"Model '{key}' has no references")
+        if entry.model is not None:
+            return entry.model
+
+        with entry.lock:
+            # Another thread may have finished loading while this one waited
+            if entry.model is None:
+                logger.info(f"Loading model '{key}'")
+                rss_before = _resident_bytes()
+                started = time.perf_counter()
+                model = entry.loader()
+                entry.load_seconds = time.perf_counter() - started
+                rss_after = _resident_bytes()
+                entry.rss_delta_bytes = rss_after - rss_before if rss_before is not None else None
+                entry.model_bytes = _model_bytes(model)
+                entry.model = model
+                logger.info(f"Loaded model '{key}' in {entry.load_seconds:.2f}s")
+        return entry.model
+
+    def _release(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs <= 0:
+                del self._entries[key]
+                logger.info(f"Unloaded model '{key}'")
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Report references, load time and memory of every registered model."""
+        return {
+            key: {
+                "loaded": entry.model is not None,
+                "refs": entry.refs,
+                "load_seconds": round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                "model_bytes": entry.model_bytes,
+                "rss_delta_bytes": entry.rss_delta_bytes
+            }
+            for key, entry in list(self._entries.items())
+        }
+
+
+def _model_bytes(model: Any) -> Optional[int]:
+    """Bytes held by the parameters and buffers of torch modules inside ``model``."""
+    if isinstance(model, (tuple, list)):
+        sizes = [_model_bytes(item) for item in model]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+
+    # Pipelines wrap the module they run
+    module = getattr(model, "model", model)
+    if not hasattr(module, "parameters") or not hasattr(module, "buffers"):
+        return None
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def _resident_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_registry = ModelRegistry()
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    return _registry
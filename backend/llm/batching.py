@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..inference.executor import ExecutorSaturatedError
+from ..inference.lazy import lazy_import
+
+torch = lazy_import("torch")
+
+logger = logging.getLogger(__name__)
+
+class SamplingParams:
+    def __init__(
+        self,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        max_new_tokens: int = 256
+    ):
+        """Per-request sampling configuration.
+
+        Args:
+            temperature: Softmax temperature (0 selects greedy decoding)
+            top_p: Nucleus sampling probability mass
+            max_new_tokens: Maximum tokens generated for the request
+        """
+        self.temperature = temperature
+        self.top_p = top_p
+        self.max_new_tokens = max_new_tokens
+
+
+class _Sequence:
+    def __init__(
+        self,
+        prompt_ids: List[int],
+        params: SamplingParams,
+        emit: Callable,
+        cancelled: threading.Event,
+        prefix_past: Optional[Tuple] = None,
+        keep_cache: bool = False
+    ):
+        self.prompt_ids = prompt_ids
+        self.params = params
+        self.emit = emit
+        self.cancelled = cancelled
+        self.prefix_past = prefix_past
+        self.keep_cache = keep_cache
+        self.generated = 0
+        self.next_token: Optional[int] = None
+
+        # Set before the final emit when keep_cache is requested
+        self.final_past: Optional[Tuple] = None
+
+    @property
+    def reserved_tokens(self) -> int:
+        return len(self.prompt_ids) + self.params.max_new_tokens
+
+
+class ContinuousBatcher:
+    def __init__(
+        self,
+        model,
+        eos_token_id: int,
+        device: str,
+        max_batch_size: int = 8,
+        kv_cache_budget_mb: Optional[float] = None,
+        max_pending: int = 32,
+        sequence_tokens: int = 2048
+    ):
+        """Continuous-batching decode loop shared by all requests to one model.
+
+        Every step runs one forward pass over all active sequences. New requests
+        are prefilled and join the batch between steps; finished or cancelled
+        sequences leave it. Requests are only admitted while the KV cache they
+        could grow to (prompt plus ``max_new_tokens``) fits in
+        ``kv_cache_budget_mb``; without a budget, it is sized so that a full
+        batch of ``sequence_tokens``-long sequences fits.
+
+        Args:
+            model: Causal LM returning logits and past_key_values
+            eos_token_id: Token id that ends a sequence
+            device: Device the model runs on
+            max_batch_size: Maximum number of sequences decoded together
+            kv_cache_budget_mb: Memory cap for the KV cache of admitted sequences
+            max_pending: Requests allowed to wait for admission before rejecting
+            sequence_tokens: Typical prompt plus new tokens, used when no budget is given
+        """
+        self.model = model
+        self.eos_token_id = eos_token_id
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.bytes_per_token = self._kv_bytes_per_token(model)
+        if kv_cache_budget_mb is None:
+            self.kv_cache_budget = max_batch_size * sequence_tokens * self.bytes_per_token
+        else:
+            self.kv_cache_budget = kv_cache_budget_mb * 1024 * 1024
+
+        self._pending = deque()
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # Batched decode state; rows are left-padded to a common length
+        self._active: List[_Sequence] = []
+        self._past = None
+        self._attention_mask: Optional[torch.Tensor] = None
+
+        self._steps = 0
+        self._tokens = 0
+        self._busy_seconds = 0.0
+
+    @staticmethod
+    def _kv_bytes_per_token(model) -> int:
+        config = model.config
+        head_dim = config.hidden_size // config.num_attention_heads
+        kv_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+        element_size = next(model.parameters()).element_size()
+        return 2 * config.num_hidden_layers * kv_heads * head_dim * element_size
+
+    def submit(
+        self,
+        prompt_ids: List[int],
+        params: SamplingParams,
+        emit: Callable,
+        cancelled: threading.Event,
+        prefix_past: Optional[Tuple] = None,
+        keep_cache: bool = False
+    ) -> _Sequence:
+        """Queue a request for the decode loop.
+
+        ``emit`` is called from the decode thread with each token id, then with
+        None when the sequence ends, or with an exception if it fails.
+
+        Args:
+            prompt_ids: Prompt token ids
+            params: Sampling parameters for this request
+            emit: Callback receiving tokens, None or an exception
+            cancelled: Event set by the caller to stop generation
+            prefix_past: Cached (key, value) tensors for a prefix of ``prompt_ids``;
+                only the remaining tokens are prefilled
+            keep_cache: Store the sequence's KV cache in ``final_past`` when it finishes
+
+        Returns:
+            Handle for the queued sequence
+
+        Raises:
+            ExecutorSaturatedError: If too many requests are already waiting
+        """
+        sequence = _Sequence(prompt_ids, params, emit, cancelled, prefix_past, keep_cache)
+        with self._wakeup:
+            if len(self._pending) >= self.max_pending:
+                raise ExecutorSaturatedError("llm", self.max_pending)
+            self._pending.append(sequence)
+            self._ensure_started()
+            self._wakeup.notify()
+        return sequence
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="llm-batcher", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while self._running:
+            with self._wakeup:
+                while self._running and not self._pending and not self._active:
+                    self._wakeup.wait()
+                admitted = self._admit()
+
+            started = time.perf_counter()
+            with torch.no_grad():
+                for sequence in admitted:
+                    try:
+                        self._prefill(sequence)
+                    except Exception as e:
+                        logger.error(f"LLM prefill failed: {e}")
+                        sequence.emit(e)
+
+                if self._active:
+                    try:
+                        self._step()
+                    except Exception as e:
+                        logger.error(f"LLM decode step failed: {e}")
+                        self._fail_all(e)
+            self._busy_seconds += time.perf_counter() - started
+
+    def _admit(self) -> List[_Sequence]:
+        """Take pending requests that fit in the batch and the KV budget."""
+        reserved = sum(sequence.reserved_tokens for sequence in self._active)
+        admitted = []
+        while self._pending and len(self._active) + len(admitted) < self.max_batch_size:
+            sequence = self._pending[0]
+            if sequence.cancelled.is_set():
+                self._pending.popleft()
+                self._finish(sequence)
+                continue
+
+            needed = (reserved + sequence.reserved_tokens) * self.bytes_per_token
+            if needed > self.kv_cache_budget:
+                if self._active or admitted:
+                    break
+                # Would never fit, even alone
+                self._pending.popleft()
+                sequence.emit(MemoryError("Request exceeds the KV cache budget"))
+                continue
+
+            self._pending.popleft()
+            reserved += sequence.reserved_tokens
+            admitted.append(sequence)
+        return admitted
+
+    def _prefill(self, sequence: _Sequence):
+        """Run the uncached part of the prompt through the model and add the sequence to the batch."""
+        prefix_past, sequence.prefix_past = sequence.prefix_past, None
+        start = 0
+        if prefix_past is not None:
+            # At least one prompt token must be fed to get next-token logits
+            start = min(prefix_past[0][0].shape[2], len(sequence.prompt_ids) - 1)
+            prefix_past = tuple((key[:, :, :start], value[:, :, :start]) for key, value in prefix_past)
+
+        input_ids = torch.tensor([sequence.prompt_ids[start:]], device=self.device)
+        mask = torch.ones((1, len(sequence.prompt_ids)), dtype=torch.long, device=self.device)
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=torch.arange(start, len(sequence.prompt_ids), device=self.device)[None],
+            past_key_values=_to_model_cache(prefix_past) if start else None,
+            use_cache=True
+        )
+        past = _to_legacy_cache(outputs.past_key_values)
+
+        if not self._accept(sequence, outputs.logits[0, -1]):
+            self._finish(sequence, past)
+            return
+
+        if not self._active:
+            self._past, self._attention_mask = past, mask
+        else:
+            self._past, self._attention_mask = _concat_left_padded(
+                self._past, self._attention_mask, past, mask
+            )
+        self._active.append(sequence)
+
+    def _step(self):
+        """Decode one token for every active sequence."""
+        input_ids = torch.tensor(
+            [[sequence.next_token] for sequence in self._active], device=self.device
+        )
+        position_ids = self._attention_mask.sum(dim=-1, keepdim=True)
+        self._attention_mask = torch.cat(
+            [self._attention_mask, self._attention_mask.new_ones((len(self._active), 1))], dim=-1
+        )
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=self._attention_mask,
+            position_ids=position_ids,
+            past_key_values=_to_model_cache(self._past),
+            use_cache=True
+        )
+        self._past = _to_legacy_cache(outputs.past_key_values)
+        self._steps += 1
+
+        keep = [
+            row for row, sequence in enumerate(self._active)
+            if self._accept(sequence, outputs.logits[row, -1])
+        ]
+        if len(keep) < len(self._active):
+            self._evict(keep)
+
+    def _accept(self, sequence: _Sequence, logits: torch.Tensor) -> bool:
+        """Sample the sequence's next token; returns False once it is finished."""
+        # max_new_tokens=0 only fills the KV cache (speculative prefill)
+        if sequence.cancelled.is_set() or sequence.generated >= sequence.params.max_new_tokens:
+            return False
+
+        token_id = _sample(logits, sequence.params)
+        if token_id == self.eos_token_id:
+            return False
+
+        sequence.emit(token_id)
+        sequence.next_token = token_id
+        sequence.generated += 1
+        self._tokens += 1
+
+        if sequence.generated >= sequence.params.max_new_tokens:
+            return False
+        return True
+
+    def _finish(self, sequence: _Sequence, past: Optional[Tuple] = None):
+        """Hand back the sequence's cache if requested and signal completion."""
+        if sequence.keep_cache and past is not None and not sequence.cancelled.is_set():
+            sequence.final_past = past
+        sequence.emit(None)
+
+    def _evict(self, keep: List[int]):
+        """Drop finished rows and the padding columns no remaining row needs."""
+        for row, sequence in enumerate(self._active):
+            if row in keep:
+                continue
+            past = None
+            if sequence.keep_cache:
+                valid = self._attention_mask[row].nonzero().squeeze(-1)
+                past = tuple(
+                    (key[row:row + 1, :, valid], value[row:row + 1, :, valid])
+                    for key, value in self._past
+                )
+            self._finish(sequence, past)
+
+        self._active = [self._active[row] for row in keep]
+        if not self._active:
+            self._past, self._attention_mask = None, None
+            return
+
+        index = torch.tensor(keep, device=self.device)
+        mask = self._attention_mask.index_select(0, index)
+        first = int(mask.any(dim=0).nonzero()[0])
+        self._attention_mask = mask[:, first:]
+        self._past = tuple(
+            (key.index_select(0, index)[:, :, first:], value.index_select(0, index)[:, :, first:])
+            for key, value in self._past
+        )
+
+    def _fail_all(self, error: Exception):
+        for sequence in self._active:
+            sequence.emit(error)
+        self._active = []
+        self._past, self._attention_mask = None, None
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report throughput and occupancy of the decode loop."""
+        return {
+            "active": len(self._active),
+            "pending": len(self._pending),
+            "steps": self._steps,
+            "tokens": self._tokens,
+            "mean_batch_size": self._tokens / self._steps if self._steps else 0.0,
+            "tokens_per_second": self._tokens / self._busy_seconds if self._busy_seconds else 0.0,
+            "kv_cache_bytes_reserved": self.bytes_per_token * sum(
+                sequence.reserved_tokens for sequence in self._active
+            )
+        }
+
+    def shutdown(self):
+        """Stop the decode loop and fail any waiting requests."""
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+        cancelled = RuntimeError("LLM engine shut down")
+        while self._pending:
+            self._pending.popleft().emit(cancelled)
+        self._fail_all(cancelled)
+
+
+def _sample(logits: torch.Tensor, params: SamplingParams) -> int:
+    """Pick the next token from one row of final-position logits."""
+    if params.temperature <= 0:
+        return int(logits.argmax(dim=-1))
+
+    probs = torch.softmax(logits.float() / params.temperature, dim=-1)
+    if params.top_p < 1.0:
+        sorted_probs, sorted_ids = torch.sort(probs, descending=True)
+        # Keep the smallest prefix whose mass reaches top_p
+        outside = sorted_probs.cumsum(dim=-1) - sorted_probs > params.top_p
+        sorted_probs[outside] = 0.0
+        return int(sorted_ids[torch.multinomial(sorted_probs, num_samples=1)])
+    return int(torch.multinomial(probs, num_samples=1))
+
+def _concat_left_padded(past_a, mask_a, past_b, mask_b):
+    """Stack two batched caches along the batch axis, left-padding the shorter one."""
+    length = max(mask_a.shape[1], mask_b.shape[1])
+
+    def pad(tensor, dim):
+        missing = length - tensor.shape[dim]
+        if missing == 0:
+            return tensor
+        shape = list(tensor.shape)
+        shape[dim] = missing
+        return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+    past = tuple(
+        (torch.cat([pad(key_a, 2), pad(key_b, 2)]), torch.cat([pad(value_a, 2), pad(value_b, 2)]))
+        for (key_a, value_a), (key_b, value_b) in zip(past_a, past_b)
+    )
+    mask = torch.cat([pad(mask_a, 1), pad(mask_b, 1)])
+    return past, mask
+
+def _to_legacy_cache(past):
+    """Normalize model caches to tuples of (key, value) per layer."""
+    if hasattr(past, "to_legacy_cache"):
+        return past.to_legacy_cache()
+    if hasattr(past, "layers"):
+        return tuple((layer.keys, layer.values) for layer in past.layers)
+    return past
+
+def _to_model_cache(past):
+    """Wrap legacy caches for transformers versions that expect Cache objects."""
+    try:
+        from transformers.cache_utils import DynamicCache
+    except ImportError:
+        return past
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(past)
+    return DynamicCache(past)
@@ -0,0 +1,55 @@
+from typing import List
+
+class IncrementalDetokenizer:
+    def __init__(self, tokenizer, skip_special_tokens: bool = True):
+        """Turn a growing sequence of token ids into text deltas.
+
+        Only a short window of recent tokens is re-decoded per step, so the total
+        work stays linear in the response length. Text ending in an incomplete
+        UTF-8 sequence (decoded as U+FFFD) is held back until the remaining byte
+        tokens arrive.
+
+        Args:
+            tokenizer: Hugging Face tokenizer used by the model
+            skip_special_tokens: Whether special tokens are dropped from the text
+        """
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.token_ids: List[int] = []
+        self.text = ""
+        self._prefix_offset = 0
+        self._read_offset = 0
+
+    def add(self, token_id: int) -> str:
+        """Append a token and return the newly completed text, if any."""
+        self.token_ids.append(token_id)
+
+        prefix_text = self._decode(self._prefix_offset, self._read_offset)
+        new_text = self._decode(self._prefix_offset, len(self.token_ids))
+
+        if len(new_text) <= len(prefix_text) or new_text.endswith("�"):
+            return ""
+
+        delta = new_text[len(prefix_text):]
+        self._prefix_offset = self._read_offset
+        self._read_offset = len(self.token_ids)
+        self.text += delta
+        return delta
+
+    def flush(self) -> str:
+        """Return any text still held back at the end of generation."""
+        prefix_text = self._decode(self._prefix_offset, self._read_offset)
+        new_text = self._decode(self._prefix_offset, len(self.token_ids))
+        delta = new_text[len(prefix_text):] if len(new_text) > len(prefix_text) else ""
+
+        self._prefix_offset = self._read_offset = len(self.token_ids)
+        self.text += delta
+        return delta
+
+    def _decode(self, start: int, end: int) -> str:
+        if end <= start:
+            return ""
+        return self.tokenizer.decode(
+            self.token_ids[start:end],
+            skip_special_tokens=self.skip_special_tokens
+        )
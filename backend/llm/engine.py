@@ -1,10 +1,22 @@
-from typing import Dict, Optional, List
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional, List, Tuple
+import functools
 import logging
 from pathlib import Path
 import json
 import asyncio
+import threading
+
+from ..inference.lazy import default_device, lazy_import
+from ..inference.quantization import quantize_model, validate_quantization
+from ..inference.registry import get_registry
+from .batching import ContinuousBatcher, SamplingParams
+from .detokenizer import IncrementalDetokenizer
+from .session_cache import SessionCacheEntry, SessionKVCache
+
+torch = lazy_import("torch")
+transformers = lazy_import("transformers")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,71 +27,188 @@ class LLMEngine:
         model_path: str,
         device: Optional[str] = None,
         max_length: int = 2048,
-        temperature: float = 0.7
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        max_batch_size: int = 8,
+        kv_cache_budget_mb: Optional[float] = None,
+        max_pending: int = 32,
+        session_cache_mb: float = 1024,
+        session_cache_ttl: float = 600.0,
+        session_cache_max_sessions: int = 256,
+        quantization: str = "none"
     ):
         """Initialize the LLM engine.
         
         Args:
             model_path: Path to the local LLM model
-            device: Device to run the model on ("cuda" or "cpu")
-            max_length: Maximum length for generated responses
+            device: Device to run the model on ("cuda" or "cpu"); picked on first use if omitted
+            max_length: Maximum length of prompt plus response
+            max_new_tokens: Default cap on a response's tokens; admission
+                reserves KV space for this many
             temperature: Temperature for response generation
+            max_batch_size: Maximum number of sequences decoded together
+            kv_cache_budget_mb: Memory cap for the KV cache of admitted requests
+                (default: a full batch of half-context prompts plus ``max_new_tokens``)
+            max_pending: Requests allowed to wait for a batch slot before rejecting
+            session_cache_mb: Memory budget for KV caches kept between turns
+            session_cache_ttl: Idle seconds before a conversation's KV cache is dropped
+            session_cache_max_sessions: Maximum number of cached conversations
+            quantization: Weight quantization ("none" or "int8", CPU only)
         """
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self._device = device
         self.max_length = max_length
+        self.max_new_tokens = max_new_tokens
         self.temperature = temperature
         
-        logger.info(f"Loading LLM model from {model_path} on {self.device}")
-        
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_path,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                low_cpu_mem_usage=True
-            ).to(self.device)
-            
-            logger.info("LLM model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load LLM model: {e}")
-            raise
+        # Tokenizer and weights load on first use (or at warm-up) via the registry
+        quantization = validate_quantization(quantization)
+        key = f"llm:{model_path}:{device or 'auto'}"
+        if quantization != "none":
+            key += f":{quantization}"
+        self._model_ref = get_registry().acquire(
+            key,
+            functools.partial(load_causal_lm, model_path, device, quantization)
+        )
+        self._batcher: Optional[ContinuousBatcher] = None
+        self._batcher_options = {
+            "max_batch_size": max_batch_size,
+            "kv_cache_budget_mb": kv_cache_budget_mb,
+            "max_pending": max_pending,
+            # Conversation history is budgeted to about half the context (CONVERSATION_MAX_TOKENS)
+            "sequence_tokens": max_length // 2 + max_new_tokens
+        }
+        self.session_cache = SessionKVCache(
+            max_bytes=int(session_cache_mb * 1024 * 1024),
+            ttl_seconds=session_cache_ttl,
+            max_sessions=session_cache_max_sessions
+        )
+
+        # Per client: (token ids, KV cache) prefilled from partial transcripts (see update_prefix)
+        self._speculations: Dict[str, Tuple[List[int], Tuple]] = {}
+        self._speculation_hits = 0
+        self._speculation_misses = 0
+        self._speculated_tokens = 0
+        self._prefix_updates = 0
+        self._prefilled_tokens = 0
+        self._rolled_back_tokens = 0
+
+    @property
+    def device(self) -> str:
+        return self._device or default_device()
+
+    async def _ensure_loaded(self):
+        """Load the weights off the event loop; ``tokenizer`` and ``model`` must not load lazily on it."""
+        await self._model_ref.get_async()
+
+    async def tokenize(self, text: str) -> List[int]:
+        """Token ids of a text (no special tokens), tokenized off the event loop."""
+        await self._ensure_loaded()
+        encoded = await asyncio.to_thread(self.tokenizer, text, add_special_tokens=False)
+        return encoded["input_ids"]
+
+    @property
+    def tokenizer(self):
+        return self._model_ref.get()[0]
+
+    @property
+    def model(self):
+        return self._model_ref.get()[1]
+
+    @property
+    def batcher(self) -> ContinuousBatcher:
+        if self._batcher is None:
+            self._batcher = ContinuousBatcher(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                device=self.device,
+                **self._batcher_options
+            )
+        return self._batcher
 
     async def generate_response(
         self,
         prompt: str,
         context: Optional[List[Dict]] = None,
-        stream: bool = True
+        stream: bool = True,
+        params: Optional[SamplingParams] = None,
+        client_id: Optional[str] = None
     ) -> Dict:
         """Generate response from the LLM.
         
+        When streaming, each chunk carries only the text produced since the
+        previous chunk, as soon as the model emits it. Closing the generator
+        (e.g. because the client disconnected) stops decoding. Concurrent
+        requests share one continuously batched decode loop. A prompt that
+        leaves no room for a reply within ``max_length`` fails with an
+        error chunk, and replies are cut off at ``max_length``.
+        
+        With a ``client_id``, the KV cache of the conversation is kept between
+        turns, so a follow-up turn whose ``context`` is exactly the history
+        cached so far only prefills the new user utterance, and a
+        speculative prefill of this turn (``update_prefix``) is reused for the
+        tokens it shares with the prompt.
+        
         Args:
             prompt: User input prompt
             context: Previous conversation context
             stream: Whether to stream the response
+            params: Sampling parameters for this request (engine defaults if omitted)
+            client_id: Conversation whose KV cache is reused and updated
         
         Returns:
             Dictionary containing response and metadata
         """
         try:
-            # Prepare conversation history
-            conversation = self._prepare_conversation(prompt, context)
+            await self._ensure_loaded()
+            # Tokenize the conversation, reusing the client's cached prefix if possible
+            prompt_ids, prefix_past, messages = self._prepare_input_ids(prompt, context, client_id)
+            if client_id:
+                prefix_past = self._use_speculation(client_id, prompt_ids, prefix_past)
+
+            # With no room left the reply would silently come back empty
+            room = self.max_length - len(prompt_ids)
+            if room <= 0:
+                raise ValueError(
+                    f"Context too long: the prompt takes {len(prompt_ids)} of {self.max_length} tokens"
+                )
+            
+            if params is None:
+                params = SamplingParams(
+                    temperature=self.temperature,
+                    max_new_tokens=min(self.max_new_tokens, room)
+                )
+            elif params.max_new_tokens > room:
+                params = SamplingParams(params.temperature, params.top_p, room)
             
-            # Tokenize input
-            inputs = self.tokenizer(conversation, return_tensors="pt").to(self.device)
+            final_past = []
+            detokenizer = IncrementalDetokenizer(self.tokenizer)
+            async for token_id in self._generate_tokens(
+                prompt_ids,
+                params,
+                prefix_past=prefix_past,
+                on_cache=final_past.append if client_id else None
+            ):
+                delta = detokenizer.add(token_id)
+                if stream and delta:
+                    yield {
+                        "text": delta,
+                        "finished": False,
+                        "success": True
+                    }
             
-            # Generate response
-            response_ids = await self._generate_response_ids(inputs)
+            tail = detokenizer.flush()
+            if final_past:
+                self.session_cache.put(client_id, SessionCacheEntry(
+                    prompt_ids + detokenizer.token_ids,
+                    final_past[0],
+                    messages + [("user", prompt), ("assistant", detokenizer.text)]
+                ))
             
-            if stream:
-                async for response in self._stream_response(response_ids):
-                    yield response
-            else:
-                response = self._decode_response(response_ids)
-                yield {
-                    "text": response,
-                    "finished": True,
-                    "success": True
-                }
+            yield {
+                "text": tail if stream else detokenizer.text,
+                "finished": True,
+                "success": True
+            }
 
         except Exception as e:
             logger.error(f"Error generating response: {e}")
@@ -88,6 +217,89 @@ class LLMEngine:
                 "error": str(e)
             }
 
+    async def update_prefix(
+        self,
+        client_id: str,
+        prefix: str,
+        context: Optional[List[Dict]] = None,
+        endpoint: bool = False
+    ) -> Dict:
+        """Speculatively prefill a partial user turn.
+        
+        Call with each new partial transcript. Only the tokens after the part
+        shared with the previous update are prefilled; when the transcript
+        was revised, the cached KV is cut back to the shared tokens (a slice,
+        nothing is recomputed). The client's next ``generate_response``
+        starts from this cache, so a final transcript matching the prefix
+        only prefills the remaining suffix.
+        
+        Args:
+            client_id: Conversation the prefill is kept for
+            prefix: Partial transcript of the user's turn
+            context: Previous conversation context
+            endpoint: Whether the user just stopped speaking (every update prefills locally)
+        
+        Returns:
+            Number of prompt tokens reused from earlier updates and newly prefilled
+        """
+        await self._ensure_loaded()
+        prompt_ids, prefix_past, _ = self._prepare_input_ids(prefix, context, client_id)
+        previous = self._speculations.get(client_id)
+        if previous is not None and previous[0] == prompt_ids:
+            return {"reused": len(prompt_ids), "prefilled": 0}
+
+        prefix_past = self._use_speculation(client_id, prompt_ids, prefix_past, count=False)
+        reused = prefix_past[0][0].shape[2] if prefix_past is not None else 0
+
+        final_past = []
+        params = SamplingParams(max_new_tokens=0)
+        async for _ in self._generate_tokens(prompt_ids, params, prefix_past=prefix_past, on_cache=final_past.append):
+            pass
+        if final_past:
+            self._speculations[client_id] = (prompt_ids, final_past[0])
+        self._prefix_updates += 1
+        self._prefilled_tokens += len(prompt_ids) - reused
+        return {"reused": reused, "prefilled": len(prompt_ids) - reused}
+
+    def discard_prefix(self, client_id: str):
+        """Drop a client's speculative prefill (e.g. the utterance was abandoned)."""
+        speculation = self._speculations.pop(client_id, None)
+        if speculation is not None:
+            self._rolled_back_tokens += len(speculation[0])
+
+    def _use_speculation(
+        self,
+        client_id: str,
+        prompt_ids: List[int],
+        prefix_past: Optional[Tuple],
+        count: bool = True
+    ) -> Optional[Tuple]:
+        """Take the client's speculative KV cache if it covers more of the prompt than ``prefix_past``."""
+        speculation = self._speculations.pop(client_id, None)
+        if speculation is None:
+            return prefix_past
+
+        token_ids, past = speculation
+        shared = 0
+        for speculated, actual in zip(token_ids, prompt_ids):
+            if speculated != actual:
+                break
+            shared += 1
+        shared = min(shared, past[0][0].shape[2])
+        self._rolled_back_tokens += len(token_ids) - shared
+
+        cached = prefix_past[0][0].shape[2] if prefix_past is not None else 0
+        if shared <= cached:
+            if count:
+                self._speculation_misses += 1
+            return prefix_past
+
+        if count:
+            self._speculation_hits += 1
+            self._speculated_tokens += shared - cached
+        # Rolling back a revised tail is a view of the shared tokens
+        return tuple((key[:, :, :shared], value[:, :, :shared]) for key, value in past)
+
     def _prepare_conversation(self, prompt: str, context: Optional[List[Dict]] = None) -> str:
         """Prepare conversation history for the model."""
         if not context:
@@ -102,45 +314,126 @@ class LLMEngine:
         conversation += f"User: {prompt}\nAssistant:"
         return conversation
 
-    async def _generate_response_ids(self, inputs: Dict) -> torch.Tensor:
-        """Generate response token IDs."""
-        with torch.no_grad():
-            output_ids = self.model.generate(
-                inputs.input_ids,
-                max_length=self.max_length,
-                temperature=self.temperature,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-                attention_mask=inputs.attention_mask
-            )
-        return output_ids[0][inputs.input_ids.shape[1]:]
-
-    async def _stream_response(self, response_ids: torch.Tensor):
-        """Stream response tokens."""
-        response = ""
-        for i in range(len(response_ids)):
-            new_token = self.tokenizer.decode(response_ids[i:i+1], skip_special_tokens=True)
-            response += new_token
-            
-            yield {
-                "text": response,
-                "finished": i == len(response_ids) - 1,
-                "success": True
-            }
-            await asyncio.sleep(0.01)  # Prevent blocking
+    def _prepare_input_ids(
+        self,
+        prompt: str,
+        context: Optional[List[Dict]],
+        client_id: Optional[str]
+    ) -> Tuple[List[int], Optional[Tuple], List[Tuple[str, str]]]:
+        """Build prompt token ids, reusing the client's cached conversation when it still applies.
+
+        Returns:
+            Prompt token ids, cached KV tensors for a prefix of them (or None),
+            and the (role, content) history the prompt represents
+        """
+        messages = [
+            (message.get("role", "user"), message.get("content", ""))
+            for message in context or []
+        ]
 
-    def _decode_response(self, response_ids: torch.Tensor) -> str:
-        """Decode response tokens to text."""
-        return self.tokenizer.decode(response_ids, skip_special_tokens=True)
+        entry = self.session_cache.get(client_id) if client_id else None
+        # The cache applies only to exactly the caller's history; once the
+        # conversation store trims it, the prompt is rebuilt, so the cache
+        # never carries turns the store's token budget dropped. The store
+        # trims with slack, so the rebuilt conversation is cached and served
+        # again on the following turns, until the next trim
+        if entry is not None and messages and entry.messages == messages:
+            suffix = self.tokenizer(
+                f"\nUser: {prompt}\nAssistant:", add_special_tokens=False
+            )["input_ids"]
+            return entry.token_ids + suffix, entry.past_key_values, entry.messages
+
+        conversation = self._prepare_conversation(prompt, context)
+        return self.tokenizer(conversation)["input_ids"], None, messages
+
+    async def _generate_tokens(
+        self,
+        prompt_ids: List[int],
+        params: SamplingParams,
+        prefix_past: Optional[Tuple] = None,
+        on_cache: Optional[Callable] = None
+    ):
+        """Yield generated token ids as the shared decode loop produces them.
+
+        ``on_cache`` receives the sequence's KV cache once generation ends normally.
+        """
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(item):
+            loop.call_soon_threadsafe(tokens.put_nowait, item)
+
+        sequence = self.batcher.submit(
+            prompt_ids,
+            params,
+            emit,
+            cancelled,
+            prefix_past=prefix_past,
+            keep_cache=on_cache is not None
+        )
+        try:
+            while True:
+                item = await tokens.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+            if on_cache is not None and sequence.final_past is not None:
+                on_cache(sequence.final_past)
+        finally:
+            # Lets the decode loop drop the sequence at the next step
+            cancelled.set()
+
+    def release_session(self, client_id: str):
+        """Drop the cached KV state of a client's conversation."""
+        self.session_cache.pop(client_id)
+        self.discard_prefix(client_id)
+
+    def get_metrics(self) -> Dict:
+        """Report continuous-batching and session cache metrics."""
+        return {
+            **(self._batcher.get_metrics() if self._batcher is not None else {}),
+            "session_cache": self.session_cache.get_metrics(),
+            "speculation": {
+                "prefix_updates": self._prefix_updates,
+                "prefilled_tokens": self._prefilled_tokens,
+                "hits": self._speculation_hits,
+                "misses": self._speculation_misses,
+                "reused_tokens": self._speculated_tokens,
+                "rolled_back_tokens": self._rolled_back_tokens
+            }
+        }
 
     def cleanup(self):
         """Cleanup resources."""
-        if hasattr(self, 'model'):
-            # Clear CUDA cache if using GPU
-            if self.device == "cuda":
-                torch.cuda.empty_cache()
-            
-            # Delete model and tokenizer
-            del self.model
-            del self.tokenizer
-            logger.info("LLM engine cleaned up")
+        if self._batcher is not None:
+            self._batcher.shutdown()
+            self._batcher = None
+
+        # Drop this engine's reference to the shared model and tokenizer
+        self._model_ref.release()
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        logger.info("LLM engine cleaned up")
+
+
+def load_causal_lm(model_path: str, device: Optional[str] = None, quantization: str = "none") -> Tuple:
+    """Load a causal LM and its tokenizer onto a device (the default device if omitted)."""
+    device = device or default_device()
+    logger.info(f"Loading LLM model from {model_path} on {device}")
+    try:
+        tokenizer = transformers.AutoTokenizer.from_pretrained(model_path)
+        model = transformers.AutoModelForCausalLM.from_pretrained(
+            model_path,
+            torch_dtype=torch.float16 if device == "cuda" else torch.float32,
+            low_cpu_mem_usage=True
+        ).to(device)
+        model = quantize_model(model, quantization, device)
+        logger.info(f"LLM model loaded successfully (quantization: {quantization})")
+        return tokenizer, model
+    except Exception as e:
+        logger.error(f"Failed to load LLM model: {e}")
+        raise
@@ -2,39 +2,93 @@ import groq
 from typing import AsyncGenerator, Dict, List, Optional
 import logging
 import json
+import re
+import time
 import asyncio
-from ..config.settings import get_settings
+import functools
+from .upstream import UpstreamPolicy, make_http_client
+from config.settings import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between two connection warm-ups triggered by partial transcripts
+WARM_UP_INTERVAL = 30.0
+
+class _SpeculativeRequest:
+    def __init__(self, key: str, task: asyncio.Task, chunks: asyncio.Queue):
+        """Completion request opened before the user's turn was final."""
+        self.key = key
+        self.task = task
+        self.chunks = chunks
+
+
 class GroqClient:
     def __init__(self):
-        """Initialize Groq client with API key."""
-        self.client = groq.AsyncGroq(api_key=settings.GROQ_API_KEY)
+        """Initialize Groq client with API key.
+        
+        Requests share a keep-alive connection pool and run under an
+        UpstreamPolicy (concurrency limit, deadline-aware retries, optional
+        hedging) instead of the SDK's own retries.
+        """
+        self.client = groq.AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL,
+            max_retries=0,
+            http_client=make_http_client(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+                timeout=settings.GROQ_TIMEOUT,
+                connect_timeout=settings.GROQ_CONNECT_TIMEOUT
+            )
+        )
+        self.policy = UpstreamPolicy(
+            max_concurrency=settings.GROQ_MAX_CONCURRENCY,
+            timeout=settings.GROQ_TIMEOUT,
+            max_retries=settings.GROQ_MAX_RETRIES,
+            hedge=settings.GROQ_HEDGE,
+            hedge_quantile=settings.GROQ_HEDGE_QUANTILE,
+            hedge_min_delay=settings.GROQ_HEDGE_MIN_DELAY
+        )
         self.model = settings.GROQ_MODEL
         logger.info(f"Initialized Groq client with model: {self.model}")
 
+        self._speculations: Dict[str, _SpeculativeRequest] = {}
+        self._last_warm_up = 0.0
+        self._warm_ups = 0
+        self._speculative_requests = 0
+        self._speculation_hits = 0
+        self._speculation_misses = 0
+
     async def generate_response(
         self,
         prompt: str,
         context: Optional[List[Dict]] = None,
         stream: bool = True,
         temperature: float = 0.7,
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        client_id: Optional[str] = None
     ) -> AsyncGenerator[Dict, None]:
         """Generate response from Groq.
         
+        With a ``client_id``, a request opened early by ``update_prefix`` for
+        the same turn is adopted, so its already received chunks come back
+        immediately.
+        
         Args:
             prompt: User input prompt
             context: Previous conversation context
             stream: Whether to stream the response
             temperature: Temperature for response generation
             max_tokens: Maximum tokens to generate
+            client_id: Conversation whose speculative request may be adopted
         
         Yields:
             Dictionary containing response chunks and metadata
         """
+        speculation = self._take_speculation(client_id, prompt, context, temperature, max_tokens)
+        texts = None
         try:
             messages = self._prepare_messages(prompt, context)
             
@@ -46,14 +100,19 @@ class GroqClient:
                 "stream": stream
             }
 
+            if speculation is not None:
+                # Opened early with stream=True; chunks received so far are buffered
+                texts = self._read_speculation(speculation)
+            elif stream:
+                texts = self._stream_text(chat_params)
+
             if stream:
-                async for chunk in await self.client.chat.completions.create(**chat_params):
-                    if hasattr(chunk.choices[0], 'delta') and chunk.choices[0].delta.content:
-                        yield {
-                            "text": chunk.choices[0].delta.content,
-                            "finished": False,
-                            "success": True
-                        }
+                async for text in texts:
+                    yield {
+                        "text": text,
+                        "finished": False,
+                        "success": True
+                    }
                 
                 # Send final chunk
                 yield {
@@ -61,8 +120,16 @@ class GroqClient:
                     "finished": True,
                     "success": True
                 }
+            elif texts is not None:
+                yield {
+                    "text": "".join([text async for text in texts]),
+                    "finished": True,
+                    "success": True
+                }
             else:
-                response = await self.client.chat.completions.create(**chat_params)
+                response = await self.policy.call(
+                    functools.partial(self.client.chat.completions.create, **chat_params)
+                )
                 yield {
                     "text": response.choices[0].message.content,
                     "finished": True,
@@ -75,6 +142,146 @@ class GroqClient:
                 "success": False,
                 "error": str(e)
             }
+        finally:
+            # Stops the upstream stream when the caller goes away mid-response
+            if texts is not None:
+                await texts.aclose()
+            if speculation is not None:
+                speculation.task.cancel()
+
+    async def update_prefix(
+        self,
+        client_id: str,
+        prefix: str,
+        context: Optional[List[Dict]] = None,
+        endpoint: bool = False,
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> Dict:
+        """Prepare for a user turn that is still being transcribed.
+        
+        A remote API cannot prefill a partial prompt, so partial transcripts
+        only keep the HTTPS connection warm. At an endpoint (the user stopped
+        speaking) the completion request is opened with the transcript so
+        far and its chunks are buffered. ``generate_response`` adopts it when
+        the final transcript matches (ignoring case and punctuation);
+        otherwise it is cancelled, wasting at most the tokens already sent.
+        
+        Args:
+            client_id: Conversation the request is opened for
+            prefix: Partial transcript of the user's turn
+            context: Previous conversation context
+            endpoint: Whether the user just stopped speaking
+            temperature: Temperature the final request will use
+            max_tokens: Maximum tokens the final request will use
+        
+        Returns:
+            Whether a speculative request is open for the client
+        """
+        if not endpoint:
+            await self._warm_up()
+            return {"speculative_request": client_id in self._speculations}
+
+        key = self._speculation_key(prefix, context, temperature, max_tokens)
+        current = self._speculations.get(client_id)
+        if current is not None and current.key == key:
+            return {"speculative_request": True}
+        self.discard_prefix(client_id)
+
+        chat_params = {
+            "messages": self._prepare_messages(prefix, context),
+            "model": self.model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        chunks: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._prefetch(chat_params, chunks))
+        self._speculations[client_id] = _SpeculativeRequest(key, task, chunks)
+        self._speculative_requests += 1
+        return {"speculative_request": True}
+
+    def discard_prefix(self, client_id: str):
+        """Cancel a client's speculative request (e.g. the utterance was abandoned)."""
+        speculation = self._speculations.pop(client_id, None)
+        if speculation is not None:
+            speculation.task.cancel()
+
+    def _take_speculation(
+        self,
+        client_id: Optional[str],
+        prompt: str,
+        context: Optional[List[Dict]],
+        temperature: float,
+        max_tokens: int
+    ) -> Optional[_SpeculativeRequest]:
+        """The client's speculative request if it was opened for this exact turn."""
+        speculation = self._speculations.pop(client_id, None) if client_id else None
+        if speculation is None:
+            return None
+        if speculation.key != self._speculation_key(prompt, context, temperature, max_tokens):
+            speculation.task.cancel()
+            self._speculation_misses += 1
+            return None
+        self._speculation_hits += 1
+        return speculation
+
+    @staticmethod
+    def _speculation_key(prompt: str, context: Optional[List[Dict]], temperature: float, max_tokens: int) -> str:
+        normalized = " ".join(re.sub(r"[^\w\s']", " ", prompt.lower()).split())
+        return json.dumps([normalized, context or [], temperature, max_tokens], sort_keys=True)
+
+    async def _stream_text(self, chat_params: Dict):
+        """Text deltas of a streamed completion."""
+        chunks = self.policy.stream(functools.partial(self.client.chat.completions.create, **chat_params))
+        try:
+            async for chunk in chunks:
+                if chunk.choices and getattr(chunk.choices[0], "delta", None) and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Releases the connection when the consumer stops early
+            await chunks.aclose()
+
+    async def _prefetch(self, chat_params: Dict, chunks: asyncio.Queue):
+        """Buffer a speculative request's text until it is adopted or cancelled."""
+        try:
+            async for text in self._stream_text(chat_params):
+                chunks.put_nowait(text)
+            chunks.put_nowait(None)
+        except Exception as e:
+            chunks.put_nowait(e)
+
+    async def _read_speculation(self, speculation: _SpeculativeRequest):
+        while True:
+            item = await speculation.chunks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def _warm_up(self):
+        """Open (or keep alive) the pooled connection to the API."""
+        now = time.monotonic()
+        if now - self._last_warm_up < WARM_UP_INTERVAL:
+            return
+        self._last_warm_up = now
+        try:
+            await self.client.models.list()
+            self._warm_ups += 1
+        except Exception as e:
+            logger.debug(f"Groq connection warm-up failed: {e}")
+
+    def get_metrics(self) -> Dict:
+        """Report speculative request outcomes and upstream request health."""
+        return {
+            "upstream": self.policy.get_metrics(),
+            "warm_ups": self._warm_ups,
+            "speculative_requests": self._speculative_requests,
+            "speculation_hits": self._speculation_hits,
+            "speculation_misses": self._speculation_misses,
+            "open_speculations": len(self._speculations)
+        }
 
     def _prepare_messages(self, prompt: str, context: Optional[List[Dict]] = None) -> List[Dict]:
         """Prepare messages for Groq chat completion.
@@ -108,6 +315,8 @@ class GroqClient:
 
     async def close(self):
         """Close the Groq client session."""
+        for client_id in list(self._speculations):
+            self.discard_prefix(client_id)
         if hasattr(self, 'client'):
             await self.client.close()
             logger.info("Groq client session closed")
@@ -0,0 +1,276 @@
+import functools
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..inference.executor import ExecutorSaturatedError, get_pool
+from ..inference.lazy import default_device, lazy_import
+from ..inference.registry import get_registry
+
+torch = lazy_import("torch")
+transformers = lazy_import("transformers")
+
+logger = logging.getLogger(__name__)
+
+# Words that make a turn's meaning depend on earlier turns ("tell me more about that")
+_REFERENCES = {
+    "that", "this", "these", "those", "they", "them", "their", "he", "him", "his", "she", "her",
+    "i", "me", "my", "mine", "we", "us", "our", "again", "more", "else", "another", "other",
+    "previous", "earlier", "above", "before", "last", "same", "instead", "also", "too"
+}
+
+def normalize_query(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a transcript."""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+def depends_on_context(prompt: str, context: Optional[List[Dict]]) -> bool:
+    """Whether a turn may mean something different later in another conversation.
+
+    Turns without history never do. With history, turns that refer back to
+    it (pronouns, "again", "more", ...) or are too short to stand alone
+    ("why?", "and then?") do.
+    """
+    if not context:
+        return False
+    words = normalize_query(prompt).split()
+    return len(words) <= 2 or any(word in _REFERENCES for word in words)
+
+
+class _CachedResponse:
+    __slots__ = ("text", "created", "latency", "vector")
+
+    def __init__(self, text: str, latency: float, vector: Optional[np.ndarray]):
+        self.text = text
+        self.created = time.monotonic()
+        self.latency = latency
+        self.vector = vector
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        embed: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        similarity_threshold: float = 0.92,
+        bypass: Callable[[str, Optional[List[Dict]]], bool] = depends_on_context
+    ):
+        """LRU cache of complete LLM responses keyed by the user's transcript.
+
+        The cache is shared by every client, so only responses generated
+        without conversation history are stored: an answer produced with a
+        client's context may use it ("Bob, it's Paris") even when the
+        question does not refer to it. Those context-free answers are served
+        to any turn that stands on its own.
+
+        Lookups first match the normalized transcript exactly. With an
+        ``embed`` function, a miss is retried against the embeddings of
+        cached transcripts and the closest one is served if its cosine
+        similarity reaches ``similarity_threshold``. Turns for which
+        ``bypass`` returns True are neither served nor stored.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            ttl_seconds: Age after which a response is no longer served
+            embed: Blocking function mapping texts to a (n, dim) embedding matrix
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            bypass: Rule marking context-dependent turns
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.bypass = bypass
+
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked embeddings of the entries, rebuilt after the entries change
+        self._index: Optional[tuple] = None
+
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def respond(
+        self,
+        prompt: str,
+        context: Optional[List[Dict]],
+        generate: Callable[[], AsyncIterator[Dict]]
+    ) -> AsyncIterator[Dict]:
+        """Serve a cached response, or stream ``generate()`` and cache what it produced.
+
+        A hit is one final chunk marked ``"cached": True``. Responses that
+        fail, are abandoned before they finish or were generated with
+        context are not cached.
+
+        Args:
+            prompt: Transcript of the user's turn
+            context: Previous conversation context
+            generate: Starts the backend's response stream (called on a miss)
+
+        Yields:
+            Response chunks in the backends' format
+        """
+        started = time.perf_counter()
+        key = vector = None
+        if self.bypass(prompt, context):
+            self._bypassed += 1
+        else:
+            key = normalize_query(prompt)
+            entry = self._get(key)
+            if entry is None and self.embed is not None:
+                try:
+                    vector = await get_pool("text_embedding").run(self._embed, key)
+                    entry = self._nearest(vector)
+                except ExecutorSaturatedError:
+                    # Under load the semantic lookup is skipped, not waited for
+                    pass
+                except Exception as e:
+                    # A broken embedder degrades to exact lookups, never to a failed turn
+                    logger.warning(f"Semantic cache lookup failed: {e}")
+                    vector = None
+
+            if entry is not None:
+                self._saved_seconds += max(entry.latency - (time.perf_counter() - started), 0.0)
+                yield {"text": entry.text, "finished": True, "success": True, "cached": True}
+                return
+            self._misses += 1
+
+        # Answers generated with a client's history are never shared
+        if context:
+            key = None
+        text = ""
+        responses = generate()
+        try:
+            async for chunk in responses:
+                yield chunk
+                if key is None or not chunk.get("success", True):
+                    continue
+                text += chunk.get("text", "")
+                if chunk.get("finished") and text.strip():
+                    self._put(key, _CachedResponse(text, time.perf_counter() - started, vector))
+        finally:
+            # Stops the backend when the caller goes away mid-response
+            await responses.aclose()
+
+    def _get(self, key: str) -> Optional[_CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.created > self.ttl_seconds:
+                self._remove(key)
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._exact_hits += 1
+            return entry
+
+    def _nearest(self, vector: np.ndarray) -> Optional[_CachedResponse]:
+        with self._lock:
+            if self._index is None:
+                keys = [key for key, entry in self._entries.items() if entry.vector is not None]
+                matrix = np.stack([self._entries[key].vector for key in keys]) if keys else None
+                self._index = (keys, matrix)
+            keys, matrix = self._index
+            if matrix is None:
+                return None
+
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            key = keys[best]
+            entry = self._entries[key]
+            if time.monotonic() - entry.created > self.ttl_seconds:
+                self._remove(key)
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._semantic_hits += 1
+            return entry
+
+    def _put(self, key: str, entry: _CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._index = None
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._index = None
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed([text]), dtype=np.float32)[0]
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._index = None
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report hit rate and the generation time hits saved."""
+        hits = self._exact_hits + self._semantic_hits
+        lookups = hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self._exact_hits,
+            "semantic_hits": self._semantic_hits,
+            "misses": self._misses,
+            "bypassed": self._bypassed,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "saved_seconds": round(self._saved_seconds, 3)
+        }
+
+
+class TextEmbedder:
+    def __init__(self, model_name: str, device: Optional[str] = None):
+        """Sentence embeddings (mean-pooled encoder states) for semantic cache lookups.
+
+        Args:
+            model_name: Hugging Face encoder, e.g. a sentence-transformers checkpoint
+            device: Device to run on (the default device if omitted)
+        """
+        self._model_ref = get_registry().acquire(
+            f"text-embedding:{model_name}:{device or 'auto'}",
+            functools.partial(load_text_encoder, model_name, device)
+        )
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        tokenizer, model = self._model_ref.get()
+        inputs = tokenizer(list(texts), padding=True, truncation=True, return_tensors="pt").to(model.device)
+        with torch.no_grad():
+            states = model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(states.dtype)
+        return ((states * mask).sum(dim=1) / mask.sum(dim=1)).cpu().numpy()
+
+    def release(self):
+        self._model_ref.release()
+
+
+def load_text_encoder(model_name: str, device: Optional[str] = None):
+    """Load a text encoder and its tokenizer onto a device (the default device if omitted)."""
+    device = device or default_device()
+    logger.info(f"Loading text embedding model {model_name} on {device}")
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    model = transformers.AutoModel.from_pretrained(model_name).to(device).eval()
+    return tokenizer, model
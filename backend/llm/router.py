@@ -0,0 +1,235 @@
+import inspect
+import time
+import logging
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class BackendStats:
+    def __init__(self, window: int = 100):
+        """Rolling health signals of one LLM backend."""
+        self.first_token = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+    def latency(self) -> Optional[float]:
+        """Median time to first token in seconds (None before the first response)."""
+        return float(np.median(self.first_token)) if self.first_token else None
+
+    def error_rate(self) -> float:
+        return 1.0 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def get_metrics(self) -> Dict[str, float]:
+        first_token = np.asarray(self.first_token) * 1000
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "error_rate": round(self.error_rate(), 3),
+            "healthy": time.monotonic() >= self.unhealthy_until,
+            "first_token_p50_ms": round(float(np.percentile(first_token, 50)), 3) if len(first_token) else None,
+            "first_token_p95_ms": round(float(np.percentile(first_token, 95)), 3) if len(first_token) else None
+        }
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        backends: Dict[str, Any],
+        max_in_flight: Optional[Dict[str, int]] = None,
+        window: int = 100,
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        cooldown_seconds: float = 30.0
+    ):
+        """Send each LLM request to the fastest healthy backend, failing over to the others.
+
+        Backends are ranked by their median time to first token over the
+        last ``window`` requests; one not measured yet ranks as fastest, so
+        it gets measured, and ties keep the order of ``backends``. A backend
+        whose error rate reaches ``max_error_rate`` sits out for
+        ``cooldown_seconds`` and is then tried again; one with
+        ``max_in_flight`` requests already outstanding (its queue is backing
+        up) ranks after every backend that is not, so excess load is shed
+        to the others, e.g. from a remote API to the local model.
+
+        A request that fails before producing any text is retried on the
+        next backend. Every backend receives the same conversation context,
+        so a conversation can move between backends from one turn to the
+        next without losing history; the local engine rebuilds its KV cache
+        from the context when a turn was answered elsewhere.
+
+        Args:
+            backends: Backends by name (in order of preference), each with
+                LLMEngine/GroqClient-style ``generate_response``,
+                ``update_prefix`` and ``discard_prefix``
+            max_in_flight: Outstanding requests per backend before it sheds load
+            window: Requests kept for latency and error rates
+            max_error_rate: Error rate at which a backend is taken out of rotation
+            min_samples: Requests needed before the error rate counts
+            cooldown_seconds: Time an unhealthy backend is left out
+        """
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = dict(backends)
+        self.max_in_flight = max_in_flight or {}
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown_seconds
+
+        self.stats = {name: BackendStats(window) for name in self.backends}
+        # Backend holding each client's speculative prefix
+        self._speculations: Dict[str, str] = {}
+        self._failovers = 0
+        self._shed = 0
+
+    def route(self) -> List[str]:
+        """Backend names in the order the next request will try them."""
+        now = time.monotonic()
+
+        def rank(name: str):
+            stats = self.stats[name]
+            latency = stats.latency()
+            return (stats.unhealthy_until > now, self._overloaded(name), latency if latency is not None else 0.0)
+
+        return sorted(self.backends, key=rank)
+
+    def _overloaded(self, name: str) -> bool:
+        limit = self.max_in_flight.get(name)
+        return limit is not None and self.stats[name].in_flight >= limit
+
+    async def generate_response(
+        self,
+        prompt: str,
+        context: Optional[List[Dict]] = None,
+        stream: bool = True,
+        client_id: Optional[str] = None
+    ) -> AsyncGenerator[Dict, None]:
+        """Generate a response on the best available backend.
+
+        Args:
+            prompt: User input prompt
+            context: Previous conversation context
+            stream: Whether to stream the response
+            client_id: Conversation the request belongs to
+
+        Yields:
+            The serving backend's response chunks, tagged with its name
+        """
+        order = self.route()
+        if self._sheds(order):
+            self._shed += 1
+        # The serving backend consumes its speculation; another backend's is dropped
+        held = self._speculations.pop(client_id, None) if client_id else None
+        if held is not None and held != order[0]:
+            self._discard(held, client_id)
+
+        errors = []
+        for name in order:
+            error, started_text = None, False
+            stats = self.stats[name]
+            stats.requests += 1
+            stats.in_flight += 1
+            started = time.perf_counter()
+            responses = self.backends[name].generate_response(
+                prompt, context=context, stream=stream, client_id=client_id
+            )
+            try:
+                async for chunk in responses:
+                    if not chunk.get("success", True):
+                        error = chunk.get("error", "unknown error")
+                        break
+                    if not started_text and (chunk.get("text") or chunk.get("finished")):
+                        stats.first_token.append(time.perf_counter() - started)
+                        started_text = True
+                    yield {**chunk, "backend": name}
+            except Exception as e:
+                error = str(e)
+            finally:
+                stats.in_flight -= 1
+                # Stops generation when the caller goes away mid-response
+                await responses.aclose()
+
+            self._record(name, error is None)
+            if error is None:
+                return
+            if started_text:
+                # Text already went out; a different backend could not continue it seamlessly
+                yield {"success": False, "error": error, "backend": name}
+                return
+            logger.warning(f"LLM backend {name} failed, failing over: {error}")
+            errors.append(f"{name}: {error}")
+            self._failovers += 1
+            self._discard(name, client_id)
+
+        yield {"success": False, "error": "; ".join(errors)}
+
+    def _sheds(self, order: List[str]) -> bool:
+        """Whether a backend faster than the chosen one was skipped for being overloaded."""
+        chosen = self.stats[order[0]].latency()
+        return chosen is not None and any(
+            self._overloaded(name) and (self.stats[name].latency() or 0.0) < chosen
+            for name in order[1:]
+        )
+
+    async def update_prefix(
+        self,
+        client_id: str,
+        prefix: str,
+        context: Optional[List[Dict]] = None,
+        endpoint: bool = False
+    ) -> Dict:
+        """Speculate on a partial user turn on the backend expected to answer it."""
+        name = self.route()[0]
+        if self._speculations.get(client_id, name) != name:
+            self.discard_prefix(client_id)
+        self._speculations[client_id] = name
+        result = await self.backends[name].update_prefix(client_id, prefix, context=context, endpoint=endpoint)
+        return {"backend": name, **(result or {})}
+
+    def discard_prefix(self, client_id: str):
+        """Drop a client's speculative work on whichever backend holds it."""
+        name = self._speculations.pop(client_id, None)
+        if name is not None:
+            self._discard(name, client_id)
+
+    def _discard(self, name: str, client_id: Optional[str]):
+        if client_id:
+            self.backends[name].discard_prefix(client_id)
+
+    def _record(self, name: str, success: bool):
+        stats = self.stats[name]
+        stats.outcomes.append(success)
+        if success:
+            return
+        stats.failures += 1
+        if len(stats.outcomes) >= self.min_samples and stats.error_rate() >= self.max_error_rate:
+            stats.unhealthy_until = time.monotonic() + self.cooldown_seconds
+            logger.warning(
+                f"LLM backend {name} taken out of rotation for {self.cooldown_seconds}s "
+                f"(error rate {stats.error_rate():.0%})"
+            )
+
+    def get_metrics(self) -> Dict:
+        """Report per-backend latency and health, failovers and shed requests."""
+        return {
+            "route": self.route(),
+            "failovers": self._failovers,
+            "shed": self._shed,
+            "backends": {name: stats.get_metrics() for name, stats in self.stats.items()}
+        }
+
+    async def close(self):
+        """Close backends that hold connections (e.g. GroqClient); local engines are cleaned up by their owner."""
+        for client_id in list(self._speculations):
+            self.discard_prefix(client_id)
+        for backend in self.backends.values():
+            close = getattr(backend, "close", None)
+            if close is not None and inspect.iscoroutinefunction(close):
+                await close()
@@ -0,0 +1,124 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SessionCacheEntry:
+    def __init__(
+        self,
+        token_ids: List[int],
+        past_key_values: Tuple,
+        messages: List[Tuple[str, str]]
+    ):
+        """Cached model state for one client's conversation.
+
+        Args:
+            token_ids: Every token of the conversation so far
+            past_key_values: Per-layer (key, value) tensors for a prefix of ``token_ids``
+            messages: (role, content) pairs the tokens represent
+        """
+        self.token_ids = token_ids
+        self.past_key_values = past_key_values
+        self.messages = messages
+        self.cached_len = past_key_values[0][0].shape[2]
+        self.nbytes = sum(
+            key.numel() * key.element_size() + value.numel() * value.element_size()
+            for key, value in past_key_values
+        )
+        self.last_used = time.monotonic()
+
+
+class SessionKVCache:
+    def __init__(
+        self,
+        max_bytes: int = 1024 * 1024 * 1024,
+        ttl_seconds: float = 600.0,
+        max_sessions: int = 256
+    ):
+        """LRU cache of per-client past-key-values with TTL and a memory budget.
+
+        Args:
+            max_bytes: Total KV tensor memory kept across all sessions
+            ttl_seconds: Idle time after which a session's cache is dropped
+            max_sessions: Maximum number of cached sessions
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+
+        self._entries: "OrderedDict[str, SessionCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, client_id: str) -> Optional[SessionCacheEntry]:
+        """Return the client's cache entry if present and not expired."""
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None and time.monotonic() - entry.last_used > self.ttl_seconds:
+                self._remove(client_id)
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(client_id)
+            return entry
+
+    def put(self, client_id: str, entry: SessionCacheEntry):
+        """Store a client's cache entry, evicting least recently used sessions."""
+        if entry.nbytes > self.max_bytes:
+            logger.debug(f"Session cache entry for {client_id} exceeds the budget; not cached")
+            self.pop(client_id)
+            return
+
+        with self._lock:
+            self._remove(client_id)
+            self._entries[client_id] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+
+    def pop(self, client_id: str):
+        """Drop a client's cache entry."""
+        with self._lock:
+            self._remove(client_id)
+
+    def _remove(self, client_id: str):
+        entry = self._entries.pop(client_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [
+            client_id for client_id, entry in self._entries.items()
+            if now - entry.last_used > self.ttl_seconds
+        ]
+        for client_id in expired:
+            self._remove(client_id)
+            self._evictions += 1
+
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_sessions):
+            client_id = next(iter(self._entries))
+            self._remove(client_id)
+            self._evictions += 1
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report occupancy and hit rate of the cache."""
+        lookups = self._hits + self._misses
+        return {
+            "sessions": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions
+        }
@@ -0,0 +1,308 @@
+import asyncio
+import inspect
+import random
+import time
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def make_http_client(
+    max_connections: int = 32,
+    max_keepalive_connections: int = 16,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 10.0,
+    connect_timeout: float = 2.0
+) -> httpx.AsyncClient:
+    """HTTP client whose idle connections stay open between completion requests.
+
+    Args:
+        max_connections: Open connections allowed at once
+        max_keepalive_connections: Idle connections kept for reuse
+        keepalive_expiry: Seconds an idle connection is kept
+        timeout: Read/write/pool timeout in seconds
+        connect_timeout: Seconds allowed to establish a connection
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        follow_redirects=True
+    )
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts, rate limits and server errors are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    # SDK connection errors (and their timeout subclass) carry no status code
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+def _retry_after(error: BaseException) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+async def _close(stream: Any):
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is not None:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+async def _single(value: Any) -> AsyncIterator[Any]:
+    yield value
+
+
+class UpstreamTimeoutError(asyncio.TimeoutError):
+    def __init__(self, deadline: float, attempts: int):
+        """Raised when no attempt produced a first chunk before the request's deadline."""
+        self.deadline = deadline
+        self.attempts = attempts
+        super().__init__(f"No response within {deadline:.2f}s ({attempts} attempts)")
+
+
+_EMPTY = object()
+
+class UpstreamPolicy:
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 20,
+        latency_window: int = 500,
+        retryable: Callable[[BaseException], bool] = is_retryable
+    ):
+        """Concurrency limit, deadline-aware retries and hedging for calls to a remote API.
+
+        Every request has one deadline, ``timeout`` seconds from its start,
+        covering the wait for a concurrency slot, every attempt and the
+        backoff between them; it bounds the time to the first chunk, after
+        which the stream is committed to and no longer retried (text already
+        passed on cannot be taken back). Failed attempts are retried with
+        full-jitter exponential backoff (at least the server's Retry-After)
+        while the next attempt could still start before the deadline.
+
+        With ``hedge``, an attempt that has not produced its first chunk
+        after the ``hedge_quantile`` of recent time-to-first-chunk starts a
+        second, identical attempt; whichever answers first is used and the
+        other is cancelled. Hedges are only sent while a concurrency slot is
+        free, so they never queue behind regular requests.
+
+        Args:
+            max_concurrency: Requests in flight at once in this process
+            timeout: Seconds from the start of a request to its first chunk
+            max_retries: Attempts after the first one
+            backoff_base: Backoff ceiling before the first retry, doubling per retry
+            backoff_max: Largest backoff ceiling
+            hedge: Send a hedged attempt when the first one is slow
+            hedge_quantile: Quantile of time-to-first-chunk after which to hedge
+            hedge_min_delay: Shortest hedging delay in seconds
+            hedge_min_samples: Latency samples needed before hedging starts
+            latency_window: Recent time-to-first-chunk samples kept
+            retryable: Whether an attempt's error is worth retrying
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+
+        # Created on first use, inside the running event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._latencies = deque(maxlen=latency_window)
+        self._in_flight = 0
+        self._requests = 0
+        self._attempts = 0
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._timeouts = 0
+        self._failures = 0
+
+    async def stream(self, start: Callable[[], Awaitable[Any]]) -> AsyncIterator[Any]:
+        """Run a streaming request under the policy.
+
+        Args:
+            start: Opens one attempt and returns its async iterable of chunks
+                (called again for every retry and hedge)
+
+        Yields:
+            Chunks of the attempt that answered first
+        """
+        self._requests += 1
+        stream, iterator, first = await self._open(start)
+        try:
+            if first is not _EMPTY:
+                yield first
+            async for item in iterator:
+                yield item
+        finally:
+            # Releases the connection and the slot when the consumer stops early
+            try:
+                await _close(stream)
+            finally:
+                self._release()
+
+    async def call(self, start: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a non-streaming request under the policy and return its result."""
+        async def attempt():
+            return _single(await start())
+
+        results = self.stream(attempt)
+        try:
+            async for result in results:
+                return result
+        finally:
+            await results.aclose()
+
+    async def _open(self, start: Callable[[], Awaitable[Any]]) -> Tuple[Any, Any, Any]:
+        """First chunk of the first successful attempt, retrying until the deadline."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        retry = 0
+        while True:
+            try:
+                return await self._race(start, deadline)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+                delay = max(delay, _retry_after(e))
+                if (
+                    retry >= self.max_retries
+                    or not self.retryable(e)
+                    or loop.time() + delay >= deadline
+                ):
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._timeouts += 1
+                    self._failures += 1
+                    raise
+                logger.debug(f"Retrying upstream request in {delay:.3f}s after: {e!r}")
+                retry += 1
+                self._retries += 1
+                await asyncio.sleep(delay)
+
+    async def _race(self, start: Callable[[], Awaitable[Any]], deadline: float) -> Tuple[Any, Any, Any]:
+        """One attempt, plus a hedge if it is slower than usual; the first to answer wins."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        primary = asyncio.create_task(self._attempt(start))
+        pending = {primary}
+        hedge_delay = self._hedge_delay()
+        attempts = 1
+        error: Optional[BaseException] = None
+        extra = []
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    raise UpstreamTimeoutError(deadline - started, attempts)
+                wait = deadline - now
+                if hedge_delay is not None:
+                    wait = min(wait, max(started + hedge_delay - now, 0.0))
+
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in done if task.exception() is None]
+                if answered:
+                    winner, *extra = answered
+                    if winner is not primary:
+                        self._hedge_wins += 1
+                    return winner.result()
+                error = next(iter(done)).exception() if done else error
+
+                if hedge_delay is not None and loop.time() >= started + hedge_delay:
+                    # Hedge only with a free slot; a failed primary is left to the retry loop
+                    if primary in pending and self._slots is not None and not self._slots.locked():
+                        pending.add(asyncio.create_task(self._attempt(start)))
+                        attempts += 1
+                        self._hedges += 1
+                    hedge_delay = None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            results = await asyncio.gather(*pending, return_exceptions=True)
+            for result in results + [task.result() for task in extra]:
+                # An attempt that answered while being cancelled still holds a slot
+                if isinstance(result, tuple):
+                    await _close(result[0])
+                    self._release()
+
+    async def _attempt(self, start: Callable[[], Awaitable[Any]]) -> Tuple[Any, Any, Any]:
+        """Take a slot and wait for an attempt's first chunk; the slot is kept on success."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        await self._slots.acquire()
+        self._in_flight += 1
+        self._attempts += 1
+        stream = None
+        started = time.perf_counter()
+        try:
+            stream = await start()
+            iterator = stream.__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = _EMPTY
+            self._latencies.append(time.perf_counter() - started)
+            return stream, iterator, first
+        except BaseException:
+            try:
+                if stream is not None:
+                    await _close(stream)
+            finally:
+                self._release()
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, float(np.quantile(self._latencies, self.hedge_quantile)))
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report attempts, retries, hedges and time-to-first-chunk."""
+        latencies = np.asarray(self._latencies) * 1000
+        hedge_delay = self._hedge_delay()
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests": self._requests,
+            "attempts": self._attempts,
+            "retries": self._retries,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "timeouts": self._timeouts,
+            "failures": self._failures,
+            "first_chunk_p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else 0.0,
+            "first_chunk_p95_ms": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else 0.0,
+            "hedge_delay_ms": round(hedge_delay * 1000, 3) if hedge_delay is not None else None
+        }
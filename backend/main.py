@@ -1,14 +1,28 @@
 from fastapi import FastAPI, WebSocket
+import asyncio
+import json
 from fastapi.middleware.cors import CORSMiddleware
+from speech.features import configure_feature_cache, get_feature_cache
+from speech.framing import FrameError, FrameParser, send_message, validate_encoding
+from speech.decoding import StreamingAudioDecoder, get_decoder_metrics
 from speech.processor import SpeechProcessor
 from speech.voice_detection import VoiceDetector
 import logging
 import numpy as np
 from config.settings import get_settings
+from inference.executor import configure_pools, get_pool_metrics
+from inference.registry import get_registry
 
 app = FastAPI()
 settings = get_settings()
-speech_processor = SpeechProcessor()
+configure_pools(settings)
+configure_feature_cache(settings)
+speech_processor = SpeechProcessor(
+    model_name=settings.WHISPER_MODEL,
+    max_batch_size=settings.WHISPER_MAX_BATCH_SIZE,
+    max_batch_wait_ms=settings.WHISPER_MAX_BATCH_WAIT_MS,
+    quantization=settings.WHISPER_QUANTIZATION
+)
 voice_detector = VoiceDetector()
 
 # Configure CORS
@@ -20,19 +34,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def warm_up_models():
+    if settings.MODEL_WARMUP:
+        await asyncio.to_thread(get_registry().warm_up)
+
+@app.get("/metrics/models")
+async def model_metrics():
+    return get_registry().get_metrics()
+
+@app.get("/metrics/whisper")
+async def whisper_metrics():
+    return speech_processor.get_metrics()
+
+@app.get("/metrics/inference")
+async def inference_metrics():
+    return get_pool_metrics()
+
+async def send_transcripts(websocket: WebSocket, stream, events: list, encoding: str = "json"):
+    """Forward utterance events to Whisper and send the resulting transcripts."""
+    for event in events:
+        if event["type"] == "speech_start":
+            await send_message(websocket, {"type": "speech_start", "start": event["start"]}, encoding)
+
+        if event["type"] in ("speech_start", "speech") and settings.STREAMING_TRANSCRIPTION:
+            for transcript in await stream.feed(event["audio"]):
+                await send_message(websocket, transcript, encoding)
+
+        elif event["type"] == "speech_end":
+            await send_message(websocket, {"type": "speech_end", "end": event["end"]}, encoding)
+            if settings.STREAMING_TRANSCRIPTION:
+                await send_message(websocket, await stream.finish(), encoding)
+            else:
+                # Only finished utterances reach Whisper
+                result = await speech_processor.process_audio(event["segment"])
+                await send_message(websocket, {"transcript": result["text"]}, encoding)
+
+async def transcribe_chunk(websocket: WebSocket, stream, segmenter, audio_data: np.ndarray, encoding: str):
+    """Handle one chunk of float32 audio."""
+    if segmenter is not None:
+        # Split the stream into utterances; silence never reaches Whisper
+        await send_transcripts(websocket, stream, segmenter.feed(audio_data), encoding)
+    elif settings.STREAMING_TRANSCRIPTION:
+        for event in await stream.feed(audio_data):
+            await send_message(websocket, event, encoding)
+    else:
+        # Process audio with Whisper
+        result = await speech_processor.process_audio(audio_data)
+        await send_message(websocket, {"transcript": result["text"]}, encoding)
+
+async def finish_utterance(websocket: WebSocket, stream, segmenter, encoding: str):
+    """Close the current utterance on an explicit end signal."""
+    if settings.STREAMING_TRANSCRIPTION and stream.active:
+        # The stream holds the utterance being ended; close the segmenter's copy without re-transcribing it
+        for event in segmenter.flush() if segmenter is not None else []:
+            await send_message(websocket, {"type": "speech_end", "end": event["end"]}, encoding)
+        await send_message(websocket, await stream.finish(), encoding)
+    elif segmenter is not None:
+        await send_transcripts(websocket, stream, segmenter.flush(), encoding)
+
+@app.get("/metrics/vad")
+async def vad_metrics():
+    return voice_detector.get_gate_metrics()
+
+@app.get("/metrics/ingest")
+async def ingest_metrics():
+    return get_decoder_metrics()
+
+@app.get("/metrics/features")
+async def feature_metrics():
+    return get_feature_cache().get_metrics()
+
 @app.websocket("/ws/audio")
 async def websocket_endpoint(websocket: WebSocket):
+    """Transcription session.
+
+    ``?protocol=framed`` selects the framed audio protocol (see speech.framing)
+    instead of raw float32 PCM; ``?codec=opus|ogg|webm`` sends compressed
+    audio instead (see speech.decoding); ``?encoding=msgpack`` selects msgpack
+    replies.
+    """
+    codec = websocket.query_params.get("codec")
+    try:
+        encoding = validate_encoding(websocket.query_params.get("encoding", "json"))
+        decoder = StreamingAudioDecoder(codec, settings.SAMPLE_RATE) if codec else None
+    except Exception as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+    parser = FrameParser(settings.SAMPLE_RATE) if websocket.query_params.get("protocol") == "framed" else None
+
     await websocket.accept()
+    stream = speech_processor.create_stream(
+        sample_rate=settings.SAMPLE_RATE,
+        step_seconds=settings.STREAM_STEP_SECONDS,
+        max_window_seconds=settings.STREAM_MAX_WINDOW_SECONDS,
+        buffer_seconds=settings.STREAM_BUFFER_SECONDS
+    )
+    segmenter = voice_detector.create_segmenter() if settings.VAD_ENABLED else None
     try:
         while True:
-            data = await websocket.receive_bytes()
-            audio_data = np.frombuffer(data, dtype=np.float32)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            # A text message marks the end of the current utterance
+            if message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "end":
+                    await finish_utterance(websocket, stream, segmenter, encoding)
+                continue
+
+            end_of_utterance = False
+            if parser is not None:
+                try:
+                    frame = parser.parse(message["bytes"])
+                except FrameError as e:
+                    await send_message(websocket, {"success": False, "error": str(e)}, encoding)
+                    continue
+                audio_data, end_of_utterance = frame.samples, frame.end_of_utterance
+            elif decoder is not None:
+                audio_data = decoder.feed(message["bytes"])
+            else:
+                audio_data = np.frombuffer(message["bytes"], dtype=np.float32)
             
-            # Check for voice activity
-            if voice_detector.detect_voice_activity(audio_data):
-                # Process audio with Whisper
-                result = await speech_processor.process_audio(audio_data)
-                await websocket.send_json({"transcript": result["text"]})
+            if len(audio_data):
+                await transcribe_chunk(websocket, stream, segmenter, audio_data, encoding)
+            if end_of_utterance:
+                await finish_utterance(websocket, stream, segmenter, encoding)
             
     except Exception as e:
         logging.error(f"WebSocket error: {e}")
@@ -1,56 +1,96 @@
-import torch
-from transformers import pipeline
-import librosa
+import functools
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import logging
-from ..config.settings import get_settings
+from config.settings import get_settings
+from ..inference.executor import get_pool
+from ..inference.lazy import lazy_import
+from ..inference.loaders import load_audio_classifier
+from ..inference.registry import get_registry
+from . import encoder
+from .frontend import AudioChunk, prepare_audio
+from .speaker_index import SpeakerIndex
+
+torch = lazy_import("torch")
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# One encoder serves every head: emotion logits come from its classification
+# head, speaker embeddings from its pooled hidden states
+VOICE_MODEL = "ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
+
 class VoiceFeatureAnalyzer:
-    def __init__(self):
-        """Initialize voice feature analyzers."""
+    def __init__(self, max_batch_size: int = 8, speaker_index: Optional[SpeakerIndex] = None):
+        """Initialize voice feature analyzers.
+        
+        Args:
+            max_batch_size: Utterances encoded together in one forward pass
+            speaker_index: Gallery of enrolled speakers searched by identify_speaker
+                (a SpeakerIndex or a SpeakerEnrollmentStore)
+        """
         try:
-            # Initialize emotion detection
-            self.emotion_detector = pipeline(
-                "audio-classification",
-                model="ehcalabres/wav2vec2-lg-xlsr-en-speech-emotion-recognition"
-            )
-            
-            # Initialize speaker identification
-            self.speaker_identifier = pipeline(
-                "audio-classification",
-                model="microsoft/wav2vec2-base-960h"
+            self.voice_model = get_registry().acquire(
+                f"audio-classification:{VOICE_MODEL}",
+                functools.partial(load_audio_classifier, VOICE_MODEL)
             )
+            self.max_batch_size = max_batch_size
+            self.speaker_index = speaker_index
             
             logger.info("Voice feature analyzers initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize voice feature analyzers: {e}")
             raise
 
-    async def analyze_emotion(self, audio_data: np.ndarray) -> Dict[str, float]:
+    async def analyze(self, utterances: Sequence, sample_rate: int = 16000) -> Dict:
+        """Run every analysis head on one or more utterances.
+        
+        Each utterance goes through the encoder once (utterances already seen
+        are served from the feature cache); emotion probabilities and the
+        speaker embedding are both computed from those hidden states.
+        
+        Args:
+            utterances: AudioChunks from the shared front-end or numpy arrays
+            sample_rate: Sample rate of numpy arrays (resampled to 16 kHz)
+        
+        Returns:
+            Dictionary with one result (``emotions`` and ``embedding``) per utterance
+        """
+        try:
+            chunks = [self._preprocess_audio(audio_data, sample_rate) for audio_data in utterances]
+            analyses = await get_pool("voice_features").run(self._analyze_batch, chunks)
+            
+            return {
+                "success": True,
+                "results": [
+                    {"emotions": emotions, "embedding": embedding.tolist()}
+                    for emotions, embedding in analyses
+                ]
+            }
+            
+        except Exception as e:
+            logger.error(f"Error analyzing voice: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    async def analyze_emotion(self, audio_data, sample_rate: int = 16000) -> Dict[str, float]:
         """Analyze emotion in speech.
         
         Args:
-            audio_data: Audio data as numpy array
+            audio_data: AudioChunk from the shared front-end, or audio as numpy array
+            sample_rate: Sample rate of a numpy array (resampled to 16 kHz)
         
         Returns:
             Dictionary of emotion probabilities
         """
         try:
             # Ensure proper audio format
-            audio_data = self._preprocess_audio(audio_data)
-            
-            # Get emotion predictions
-            predictions = self.emotion_detector(audio_data)
+            audio = self._preprocess_audio(audio_data, sample_rate)
             
-            # Convert to dictionary of emotion probabilities
-            emotions = {
-                pred["label"]: pred["score"]
-                for pred in predictions
-            }
+            # Score the emotion head on the (cached) encoder hidden states
+            [(emotions, _)] = await get_pool("voice_features").run(self._analyze_batch, [audio])
             
             return {
                 "success": True,
@@ -64,42 +104,58 @@ class VoiceFeatureAnalyzer:
                 "error": str(e)
             }
 
+    async def embed_speakers(self, utterances: Sequence, sample_rate: int = 16000) -> np.ndarray:
+        """Speaker embeddings for enrollment.
+        
+        Args:
+            utterances: AudioChunks from the shared front-end or numpy arrays
+            sample_rate: Sample rate of numpy arrays (resampled to 16 kHz)
+        
+        Returns:
+            (n_utterances, dim) array of embeddings
+        """
+        chunks = [self._preprocess_audio(audio_data, sample_rate) for audio_data in utterances]
+        analyses = await get_pool("voice_features").run(self._analyze_batch, chunks)
+        return np.stack([embedding for _, embedding in analyses])
+
     async def identify_speaker(
         self,
-        audio_data: np.ndarray,
-        reference_embeddings: Dict[str, np.ndarray] = None
+        audio_data,
+        reference_embeddings: Dict[str, np.ndarray] = None,
+        sample_rate: int = 16000,
+        top_k: int = 5,
+        n_probe: Optional[int] = None
     ) -> Dict:
         """Identify speaker from voice.
         
         Args:
-            audio_data: Audio data as numpy array
+            audio_data: AudioChunk from the shared front-end, or audio as numpy array
             reference_embeddings: Dictionary of speaker embeddings for comparison
+                (defaults to the analyzer's speaker index)
+            sample_rate: Sample rate of a numpy array (resampled to 16 kHz)
+            top_k: Number of closest speakers reported in ``similarities``
+            n_probe: IVF clusters searched in the speaker index (None: exact search)
         
         Returns:
             Dictionary with speaker identification results
         """
         try:
             # Ensure proper audio format
-            audio_data = self._preprocess_audio(audio_data)
+            audio = self._preprocess_audio(audio_data, sample_rate)
             
             # Extract speaker embedding
-            embedding = await self._extract_speaker_embedding(audio_data)
+            embedding = await self._extract_speaker_embedding(audio)
             
-            if reference_embeddings:
-                # Compare with reference embeddings
-                similarities = {
-                    speaker: self._compute_similarity(embedding, ref_embedding)
-                    for speaker, ref_embedding in reference_embeddings.items()
-                }
-                
-                # Find best match
-                best_match = max(similarities.items(), key=lambda x: x[1])
+            index = SpeakerIndex.from_embeddings(reference_embeddings) if reference_embeddings else self.speaker_index
+            if index is not None and len(index):
+                # One product against the normalized gallery
+                matches = index.search(embedding, k=top_k, n_probe=n_probe)
                 
                 return {
                     "success": True,
-                    "speaker": best_match[0],
-                    "confidence": best_match[1],
-                    "similarities": similarities
+                    "speaker": matches[0][0],
+                    "confidence": matches[0][1],
+                    "similarities": dict(matches)
                 }
             else:
                 # Return just the embedding for reference
@@ -115,38 +171,42 @@ class VoiceFeatureAnalyzer:
                 "error": str(e)
             }
 
-    async def _extract_speaker_embedding(self, audio_data: np.ndarray) -> np.ndarray:
+    async def _extract_speaker_embedding(self, audio: AudioChunk) -> np.ndarray:
         """Extract speaker embedding from audio."""
-        # Get model predictions
-        predictions = self.speaker_identifier(audio_data, output_hidden_states=True)
-        
-        # Use the last hidden state as speaker embedding
-        embedding = predictions.hidden_states[-1].mean(dim=1).squeeze().numpy()
+        [(_, embedding)] = await get_pool("voice_features").run(self._analyze_batch, [audio])
         return embedding
 
-    def _compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        """Compute cosine similarity between speaker embeddings."""
-        return np.dot(embedding1, embedding2) / (
-            np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
-        )
+    def _analyze_batch(self, chunks: List[AudioChunk]) -> List[Tuple[Dict[str, float], np.ndarray]]:
+        """Emotion probabilities and speaker embedding per utterance from shared hidden states."""
+        hidden_states = self._hidden_states(chunks)
+        model = self.voice_model.get().model
+        with torch.no_grad():
+            # Classification head: projection, mean over time, classifier
+            pooled = torch.stack([
+                model.projector(torch.tensor(states, device=model.device)).mean(dim=0)
+                for states in hidden_states
+            ])
+            probabilities = model.classifier(pooled).softmax(dim=-1).cpu().tolist()
 
-    def _preprocess_audio(self, audio_data: np.ndarray) -> np.ndarray:
-        """Preprocess audio for feature extraction."""
-        # Ensure float32 format
-        if audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
-        
-        # Normalize if needed
-        if np.abs(audio_data).max() > 1.0:
-            audio_data = audio_data / np.abs(audio_data).max()
-        
-        return audio_data
+        labels = model.config.id2label
+        # Mean of the last hidden state over time as speaker embedding
+        return [
+            ({labels[i]: score for i, score in enumerate(scores)}, states.mean(axis=0))
+            for scores, states in zip(probabilities, hidden_states)
+        ]
+
+    def _hidden_states(self, chunks: List[AudioChunk]) -> List[np.ndarray]:
+        """Last encoder hidden states per utterance, served from the feature cache when seen before."""
+        return encoder.hidden_states(self.voice_model.get(), chunks, f"hidden:{VOICE_MODEL}", self.max_batch_size)
+
+    def _preprocess_audio(self, audio_data, sample_rate: int = 16000) -> AudioChunk:
+        """Preprocess audio for feature extraction (shared front-end)."""
+        return prepare_audio(audio_data, sample_rate)
 
     def cleanup(self):
         """Cleanup resources."""
-        if hasattr(self, 'emotion_detector'):
-            del self.emotion_detector
-        if hasattr(self, 'speaker_identifier'):
-            del self.speaker_identifier
+        if hasattr(self, 'voice_model'):
+            self.voice_model.release()
         torch.cuda.empty_cache()  # Clear CUDA cache if using GPU
         logger.info("Voice feature analyzer cleaned up")
+
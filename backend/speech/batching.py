@@ -0,0 +1,143 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class MicroBatchScheduler:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        metrics_window: int = 1000,
+        runner: Optional[Callable[..., Awaitable[Any]]] = None
+    ):
+        """Collect requests from many sessions and run them through one batched call.
+
+        The first pending request opens a batch; the batch is dispatched once it
+        holds ``max_batch_size`` items or ``max_wait_ms`` has passed, whichever
+        comes first. Each caller awaits only its own result.
+
+        Args:
+            batch_fn: Blocking function mapping a list of inputs to a list of results
+            max_batch_size: Maximum number of requests per batch
+            max_wait_ms: Longest time the first request waits for others to join
+            metrics_window: Number of recent requests kept for queue-wait statistics
+            runner: Async callable running ``batch_fn`` off the event loop
+                (defaults to the loop's default executor)
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.runner = runner or self._run_in_default_executor
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self._batches = 0
+        self._items = 0
+        self._queue_waits = deque(maxlen=metrics_window)
+        self._batch_sizes = deque(maxlen=metrics_window)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its result.
+
+        Args:
+            item: Input passed to ``batch_fn`` as part of a batch
+
+        Returns:
+            The result ``batch_fn`` produced for this input
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            # Requests still queued are served by the new worker; only an empty
+            # queue is replaced (it may be bound to a previous event loop)
+            if self._queue is None or self._queue.empty():
+                self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._dispatch(batch)
+            except BaseException:
+                # The worker is stopping; nobody else would resolve this batch
+                _fail(batch, RuntimeError("Batch scheduler stopped"))
+                raise
+
+    async def _dispatch(self, batch: List):
+        dispatched = time.perf_counter()
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes.append(len(batch))
+        self._queue_waits.extend(dispatched - queued for _, _, queued in batch)
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = await self.runner(self.batch_fn, items)
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} failed: {e}")
+            _fail(batch, e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # The caller may have given up waiting
+            if not future.done():
+                future.set_result(result)
+        if len(results) < len(batch):
+            error = RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} inputs")
+            logger.error(str(error))
+            _fail(batch[len(results):], error)
+
+    @staticmethod
+    async def _run_in_default_executor(fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report batch occupancy and queue-wait statistics."""
+        waits = sorted(self._queue_waits)
+        sizes = list(self._batch_sizes)
+        return {
+            "batches": self._batches,
+            "requests": self._items,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "batch_occupancy": sum(sizes) / (len(sizes) * self.max_batch_size) if sizes else 0.0,
+            "queue_wait_ms_mean": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "queue_wait_ms_p95": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        }
+
+    async def close(self):
+        """Stop the dispatch loop, failing requests that are still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _fail([self._queue.get_nowait()], RuntimeError("Batch scheduler closed"))
+
+
+def _fail(batch: List, error: BaseException):
+    for _, future, _ in batch:
+        if not future.done():
+            future.set_exception(error)
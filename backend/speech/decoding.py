@@ -0,0 +1,296 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .streaming import AudioRingBuffer
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("opus", "ogg", "webm")
+
+# Longest Opus packet is 120 ms
+_OPUS_MAX_FRAME_SECONDS = 0.12
+
+# Totals across every decoder in the process, reported by get_decoder_metrics()
+_totals = {
+    "sessions": 0, "packets": 0, "bytes_in": 0, "bytes_out": 0,
+    "audio_seconds": 0.0, "decode_seconds": 0.0, "errors": 0
+}
+
+class OggOpusDemuxer:
+    def __init__(self):
+        """Incremental Ogg parser yielding the Opus packets of a growing byte stream."""
+        self._buffer = bytearray()
+        self._packet = bytearray()
+        self.channels = 1
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Consume bytes and return the Opus audio packets completed by them."""
+        self._buffer += data
+        packets = []
+        while True:
+            if len(self._buffer) < 27:
+                break
+            if self._buffer[:4] != b"OggS":
+                # Resynchronise on the next page
+                start = self._buffer.find(b"OggS", 1)
+                del self._buffer[:start if start > 0 else len(self._buffer) - 3]
+                continue
+
+            header_size = 27 + self._buffer[26]
+            if len(self._buffer) < header_size:
+                break
+            lacing = self._buffer[27:header_size]
+            page_size = header_size + sum(lacing)
+            if len(self._buffer) < page_size:
+                break
+
+            position = header_size
+            for lace in lacing:
+                self._packet += self._buffer[position:position + lace]
+                position += lace
+                # A lacing value below 255 ends the packet; 255 continues it
+                if lace < 255:
+                    self._complete_packet(packets)
+            del self._buffer[:page_size]
+        return packets
+
+    def _complete_packet(self, packets: List[bytes]):
+        packet = bytes(self._packet)
+        self._packet.clear()
+        if packet.startswith(b"OpusHead"):
+            self.channels = packet[9]
+        elif not packet.startswith(b"OpusTags"):
+            packets.append(packet)
+
+
+class WebMOpusDemuxer:
+    # Master elements whose children are parsed
+    _MASTERS = {
+        0x18538067,  # Segment
+        0x1F43B675,  # Cluster
+        0xA0,        # BlockGroup
+        0x1654AE6B,  # Tracks
+        0xAE,        # TrackEntry
+        0xE1         # Audio
+    }
+    _SIMPLE_BLOCK = 0xA3
+    _BLOCK = 0xA1
+    _TRACK_NUMBER = 0xD7
+    _CODEC_ID = 0x86
+    _CHANNELS = 0x9F
+
+    def __init__(self):
+        """Incremental Matroska/WebM parser yielding the Opus frames of a growing byte stream.
+
+        Only the element headers needed to reach SimpleBlock/Block payloads
+        are parsed; other elements are skipped without being buffered.
+        """
+        self._buffer = bytearray()
+        self._skip = 0
+        self._track_number: Optional[int] = None
+        self._opus_track: Optional[int] = None
+        self.channels = 1
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Consume bytes and return the Opus frames completed by them."""
+        self._buffer += data
+        frames = []
+        while True:
+            if self._skip:
+                dropped = min(self._skip, len(self._buffer))
+                del self._buffer[:dropped]
+                self._skip -= dropped
+                if self._skip:
+                    break
+
+            header = self._read_header()
+            if header is None:
+                break
+            element_id, size, header_size = header
+
+            if element_id in self._MASTERS:
+                # Descend: the children follow the header directly
+                del self._buffer[:header_size]
+                continue
+            if size is None:
+                # Unknown size is only valid for masters we do not track
+                del self._buffer[:header_size]
+                continue
+
+            if element_id in (self._SIMPLE_BLOCK, self._BLOCK, self._TRACK_NUMBER, self._CODEC_ID, self._CHANNELS):
+                if len(self._buffer) < header_size + size:
+                    break
+                body = bytes(self._buffer[header_size:header_size + size])
+                del self._buffer[:header_size + size]
+                self._handle(element_id, body, frames)
+            else:
+                del self._buffer[:header_size]
+                self._skip = size
+        return frames
+
+    def _handle(self, element_id: int, body: bytes, frames: List[bytes]):
+        if element_id == self._TRACK_NUMBER:
+            self._track_number = int.from_bytes(body, "big")
+        elif element_id == self._CODEC_ID:
+            if body.rstrip(b"\0") == b"A_OPUS":
+                self._opus_track = self._track_number
+        elif element_id == self._CHANNELS:
+            self.channels = int.from_bytes(body, "big")
+        else:
+            track, track_size = _read_vint(body, 0, strip_marker=True)
+            if track is None or (self._opus_track is not None and track != self._opus_track):
+                return
+            flags = body[track_size + 2]
+            if flags & 0x06:
+                logger.warning("Laced WebM blocks are not supported; dropping block")
+                return
+            frames.append(body[track_size + 3:])
+
+    def _read_header(self):
+        element_id, id_size = _read_vint(self._buffer, 0, strip_marker=False)
+        if element_id is None:
+            return None
+        size, size_size = _read_vint(self._buffer, id_size, strip_marker=True)
+        if size is None:
+            return None
+        if size == (1 << (7 * size_size)) - 1:
+            size = None  # Unknown size (live streams)
+        return element_id, size, id_size + size_size
+
+
+def _read_vint(data, offset: int, strip_marker: bool):
+    """Read an EBML variable-length integer; returns (value, length) or (None, 0) if incomplete."""
+    if offset >= len(data):
+        return None, 0
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or offset + length > len(data):
+        return None, 0
+    value = first & ((0x80 >> (length - 1)) - 1) if strip_marker else first
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+class StreamingAudioDecoder:
+    def __init__(
+        self,
+        codec: str = "opus",
+        sample_rate: int = 16000,
+        channels: int = 1,
+        buffer_seconds: float = 5.0
+    ):
+        """Per-session decoder from compressed audio to mono float32 PCM.
+
+        ``opus`` expects one Opus packet per ``feed``; ``ogg`` and ``webm``
+        accept arbitrary slices of an Ogg or WebM stream (e.g. MediaRecorder
+        chunks). Decoded audio is written into a preallocated ring buffer, which
+        grows when a single chunk decodes to more than it holds, and each
+        ``feed`` returns its own copy of the newly decoded region.
+
+        Args:
+            codec: ``opus``, ``ogg`` or ``webm``
+            sample_rate: Output sample rate (Opus decodes to 8, 12, 16, 24 or 48 kHz)
+            channels: Channel count of raw Opus packets (containers carry their own)
+            buffer_seconds: Initial capacity of the PCM ring buffer
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unsupported codec '{codec}'; expected one of {CODECS}")
+        try:
+            import opuslib
+        except Exception as e:
+            raise ValueError(f"Opus decoding needs the opuslib package and libopus: {e}")
+
+        self._opuslib = opuslib
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.ring = AudioRingBuffer(buffer_seconds, sample_rate)
+        self._demuxer = {"ogg": OggOpusDemuxer, "webm": WebMOpusDemuxer}.get(codec, lambda: None)()
+        self._channels = channels
+        self._decoder = None
+        self._max_frame = int(sample_rate * _OPUS_MAX_FRAME_SECONDS)
+
+        self.packets = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.decode_seconds = 0.0
+        _totals["sessions"] += 1
+
+    def feed(self, data) -> np.ndarray:
+        """Decode a chunk of compressed audio.
+
+        Returns:
+            The newly decoded mono float32 samples (safe to keep across feeds,
+            e.g. on a pipeline queue)
+        """
+        data = bytes(data)
+        started = time.perf_counter()
+        packets = self._demuxer.feed(data) if self._demuxer is not None else [data]
+        if self._demuxer is not None:
+            self._channels = self._demuxer.channels
+
+        decoded_packets = []
+        for packet in packets:
+            if not packet:
+                continue
+            try:
+                pcm = self._get_decoder().decode_float(packet, self._max_frame)
+            except Exception as e:
+                _totals["errors"] += 1
+                logger.warning(f"Dropping undecodable Opus packet: {e}")
+                continue
+            samples = np.frombuffer(pcm, dtype=np.float32)
+            if self._channels > 1:
+                samples = samples.reshape(-1, self._channels).mean(axis=1)
+            decoded_packets.append(samples)
+
+        decoded = sum(len(samples) for samples in decoded_packets)
+        if decoded > self.ring.capacity:
+            # Keep every sample of an oversized chunk rather than only the newest
+            self.ring = AudioRingBuffer(max(2 * self.ring.capacity, decoded) / self.sample_rate, self.sample_rate)
+        start = self.ring.end
+        for samples in decoded_packets:
+            self.ring.write(samples)
+        elapsed = time.perf_counter() - started
+        self.packets += len(packets)
+        self.bytes_in += len(data)
+        self.bytes_out += decoded * 4
+        self.decode_seconds += elapsed
+        _totals["packets"] += len(packets)
+        _totals["bytes_in"] += len(data)
+        _totals["bytes_out"] += decoded * 4
+        _totals["audio_seconds"] += decoded / self.sample_rate
+        _totals["decode_seconds"] += elapsed
+
+        # A copy: the ring is overwritten by later feeds while callers may still queue this audio
+        return self.ring.read(start, self.ring.end)
+
+    def _get_decoder(self):
+        if self._decoder is None:
+            self._decoder = self._opuslib.Decoder(self.sample_rate, self._channels)
+        return self._decoder
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {
+            "packets": self.packets,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "decode_seconds": round(self.decode_seconds, 4)
+        }
+
+
+def get_decoder_metrics() -> Dict[str, float]:
+    """Report decode volume and cost across all sessions."""
+    audio_seconds = _totals["audio_seconds"]
+    return {
+        **_totals,
+        "audio_seconds": round(audio_seconds, 3),
+        "decode_seconds": round(_totals["decode_seconds"], 4),
+        "compression_ratio": round(_totals["bytes_out"] / _totals["bytes_in"], 2) if _totals["bytes_in"] else 0.0,
+        "decode_ms_per_audio_second": round(1000 * _totals["decode_seconds"] / audio_seconds, 3) if audio_seconds else 0.0
+    }
@@ -0,0 +1,49 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from ..inference.lazy import lazy_import
+from .features import get_feature_cache
+from .frontend import AudioChunk
+
+torch = lazy_import("torch")
+
+def hidden_states(classifier, chunks: Sequence[AudioChunk], name: str, max_batch_size: int = 8) -> List[np.ndarray]:
+    """Last encoder hidden states (frames x dim) per utterance, encoding cache misses in batches.
+
+    Args:
+        classifier: transformers audio-classification pipeline
+        chunks: Utterances from the shared front-end
+        name: Feature cache name of the hidden states
+        max_batch_size: Utterances encoded together in one forward pass
+    """
+    def encode_missing(missing: List[int]) -> List[np.ndarray]:
+        # Similar lengths share a batch, so little compute goes to padding
+        order = sorted(missing, key=lambda i: len(chunks[i]))
+        encoded = {}
+        for start in range(0, len(order), max_batch_size):
+            batch = order[start:start + max_batch_size]
+            encoded.update(zip(batch, encode(classifier, [chunks[i].samples for i in batch])))
+        return [encoded[i] for i in missing]
+
+    return get_feature_cache().get_or_compute_many([chunk.key for chunk in chunks], name, encode_missing)
+
+def encode(classifier, batch: List[np.ndarray]) -> List[np.ndarray]:
+    """Run a classification pipeline's encoder (without its head) over a padded batch.
+
+    Returns:
+        Each utterance's last hidden states with the padded frames removed
+    """
+    inputs = classifier.feature_extractor(batch, sampling_rate=16000, padding=True, return_tensors="pt")
+    encoder = classifier.model.base_model
+    with torch.no_grad():
+        outputs = encoder(**inputs.to(classifier.model.device))
+        lengths = encoder._get_feat_extract_output_lengths(torch.tensor([len(samples) for samples in batch]))
+
+    states_per_utterance = []
+    for states, length in zip(outputs.last_hidden_state, lengths.tolist()):
+        # Copy, so the cached array does not keep the whole batch alive
+        states = states[:length].cpu().numpy().copy()
+        states.flags.writeable = False
+        states_per_utterance.append(states)
+    return states_per_utterance
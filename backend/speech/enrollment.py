@@ -0,0 +1,191 @@
+import fcntl
+import json
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .speaker_index import MANIFEST, SpeakerIndex
+
+logger = logging.getLogger(__name__)
+
+# Journal entries kept before they are folded into a new snapshot, at least
+MIN_JOURNAL_ENTRIES = 64
+
+class SpeakerEnrollmentStore:
+    def __init__(self, directory: str, n_probe: Optional[int] = None):
+        """On-disk gallery of enrolled speakers shared by every worker.
+
+        Each speaker is the running mean of their normalized utterance
+        embeddings. The index keeps the mean's direction; its norm and the
+        utterance count are saved alongside, so new utterances update the
+        centroid without re-embedding earlier ones.
+
+        Changes are written under an exclusive file lock. Each one is
+        appended to a journal next to the saved matrix, so an update costs
+        one embedding rather than a rewrite of the gallery; once the journal
+        holds a quarter of the gallery (at least ``MIN_JOURNAL_ENTRIES``) it
+        is folded into a new snapshot. Other processes pick changes up on
+        their next search by replaying the journal, or by re-mapping the
+        matrix after a snapshot.
+
+        With ``n_probe``, an IVF index is built with the first snapshot and
+        rebuilt whenever the gallery has doubled since; speakers enrolled in
+        between join their nearest cluster.
+
+        Args:
+            directory: Gallery directory (created on first enrollment)
+            n_probe: IVF clusters searched per query (None: exact search)
+        """
+        self.directory = directory
+        self.n_probe = n_probe
+        self._lock = threading.RLock()
+        self._index: Optional[SpeakerIndex] = None
+        self._stats: Dict[str, Dict] = {}
+        # Bytes and entries of the current snapshot's journal applied so far
+        self._journal_offset = 0
+        self._journal_entries = 0
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            self._reload()
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._index) if self._index is not None else 0
+
+    def speakers(self) -> Dict[str, Dict]:
+        """Enrolled speakers with their utterance counts."""
+        self._refresh()
+        return {speaker: {"utterances": stats["count"]} for speaker, stats in self._stats.items()}
+
+    def enroll(self, speaker_id: str, embeddings: np.ndarray, replace: bool = False) -> Dict:
+        """Add utterance embeddings to a speaker's centroid (creating the speaker if needed).
+
+        Args:
+            speaker_id: Speaker to enroll or update
+            embeddings: (n_utterances, dim) or (dim,) embeddings
+            replace: Discard the speaker's previous utterances first
+
+        Returns:
+            The speaker's utterance count after the update
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        with self._write() as index:
+            if index is None:
+                index = self._index = SpeakerIndex(unit.shape[1])
+            stats = self._stats.get(speaker_id)
+            total = unit.sum(axis=0)
+            count = len(unit)
+            if stats is not None and not replace:
+                # Sum of earlier unit embeddings = stored direction * stored norm
+                total += index.get(speaker_id) * stats["norm"]
+                count += stats["count"]
+
+            stats = {"count": count, "norm": float(np.linalg.norm(total))}
+            self._apply({"op": "add", "speaker": speaker_id, "embedding": total.tolist(), "stats": stats})
+        return {"speaker": speaker_id, "utterances": count}
+
+    def delete(self, speaker_id: str) -> bool:
+        """Remove an enrolled speaker."""
+        with self._write() as index:
+            if index is None or speaker_id not in index:
+                return False
+            self._apply({"op": "remove", "speaker": speaker_id})
+            return True
+
+    def search(self, embedding: np.ndarray, k: int = 1, n_probe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Closest enrolled speakers to an embedding (see SpeakerIndex.search)."""
+        self._refresh()
+        if self._index is None:
+            return []
+        return self._index.search(embedding, k, n_probe if n_probe is not None else self.n_probe)
+
+    def get_metrics(self) -> Dict:
+        self._refresh()
+        return self._index.get_metrics() if self._index is not None else {"speakers": 0}
+
+    @contextmanager
+    def _write(self):
+        """Serialize read-modify-write of the gallery across threads and processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield self._index
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _apply(self, change: Dict):
+        """Apply one change to the index and persist it (called inside ``_write``)."""
+        self._replay_change(change)
+        index = self._index
+        rebuild_ivf = self.n_probe is not None and len(index) > 2 * index.ivf_size
+        if index.version is None or rebuild_ivf or self._journal_entries >= max(MIN_JOURNAL_ENTRIES, len(index) // 4):
+            self._snapshot(rebuild_ivf)
+            return
+
+        line = (json.dumps(change) + "\n").encode()
+        with open(self._journal_path(), "ab") as f:
+            f.write(line)
+        self._journal_offset += len(line)
+        self._journal_entries += 1
+
+    def _snapshot(self, rebuild_ivf: bool):
+        if rebuild_ivf:
+            self._index.build_ivf()
+        self._index.save(self.directory, metadata=self._stats)
+        self._journal_offset = self._journal_entries = 0
+        # The new snapshot contains every journaled change
+        current = os.path.basename(self._journal_path())
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name != current:
+                os.remove(os.path.join(self.directory, name))
+
+    def _replay_change(self, change: Dict):
+        speaker_id = change["speaker"]
+        if change["op"] == "add":
+            self._index.add(speaker_id, np.asarray(change["embedding"], dtype=np.float32))
+            self._stats[speaker_id] = change["stats"]
+        else:
+            self._index.remove(speaker_id)
+            self._stats.pop(speaker_id, None)
+
+    def _journal_path(self) -> str:
+        return os.path.join(self.directory, f"journal-{self._index.version}.jsonl")
+
+    def _refresh(self):
+        with self._lock:
+            if self._index is None:
+                if os.path.exists(os.path.join(self.directory, MANIFEST)):
+                    self._reload()
+            elif self._index.is_stale(self.directory):
+                self._reload()
+            elif self._index.version is not None:
+                self._replay()
+
+    def _reload(self):
+        self._index, self._stats = SpeakerIndex.load(self.directory)
+        self._journal_offset = self._journal_entries = 0
+        self._replay()
+        logger.info(f"Loaded {len(self._index)} enrolled speakers from {self.directory}")
+
+    def _replay(self):
+        """Apply journal entries other processes appended since the last look."""
+        try:
+            with open(self._journal_path(), "rb") as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            # No changes since the snapshot, or a newer snapshot replaced it
+            return
+        # A line still being written is picked up next time
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            self._replay_change(json.loads(line))
+            self._journal_entries += 1
+        self._journal_offset += len(complete)
@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def audio_key(samples: np.ndarray) -> str:
+    """Content hash identifying an utterance's audio."""
+    samples = np.ascontiguousarray(samples)
+    digest = hashlib.blake2b(samples.view(np.uint8), digest_size=16)
+    digest.update(f"{samples.dtype.str}:{len(samples)}".encode())
+    return digest.hexdigest()
+
+
+class _UtteranceFeatures:
+    __slots__ = ("features", "nbytes")
+
+    def __init__(self):
+        self.features: Dict[str, Any] = {}
+        self.nbytes = 0
+
+
+class FeatureCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_utterances: int = 1024):
+        """LRU cache of per-utterance features shared by every speech model.
+
+        Entries are keyed by the content hash of the audio (``audio_key``) and
+        hold named features such as ``log_mel:80``, ``mfcc:13`` or
+        ``hidden:<model>``. Concurrent requests for a feature that is still
+        being computed wait for that computation instead of repeating it.
+        Whole utterances are evicted, least recently used first.
+
+        Args:
+            max_bytes: Total feature memory kept across all utterances
+            max_utterances: Maximum number of cached utterances
+        """
+        self.max_bytes = max_bytes
+        self.max_utterances = max_utterances
+
+        self._entries: "OrderedDict[str, _UtteranceFeatures]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key: str, name: str, compute: Callable[[], Any]) -> Any:
+        """Return a cached feature, computing it at most once.
+
+        Args:
+            key: Utterance key from ``audio_key``
+            name: Feature name
+            compute: Blocking function producing the feature on a miss
+
+        Returns:
+            The feature value (treat it as read-only; it is shared)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and name in entry.features:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return entry.features[name]
+
+            pending = self._pending.get((key, name))
+            if pending is None:
+                self._misses += 1
+                future = self._pending[(key, name)] = Future()
+            else:
+                self._hits += 1
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[(key, name)]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, name, value)
+            del self._pending[(key, name)]
+        future.set_result(value)
+        return value
+
+    def get_or_compute_many(
+        self,
+        keys: Sequence[str],
+        name: str,
+        compute: Callable[[List[int]], List[Any]]
+    ) -> List[Any]:
+        """Batch form of ``get_or_compute``: compute the missing features in one call.
+
+        Features another caller is already computing are waited for rather
+        than computed again, so each is computed at most once even when
+        overlapping batches arrive together.
+
+        Args:
+            keys: Utterance keys from ``audio_key``
+            name: Feature name
+            compute: Blocking function producing the features of the keys at
+                the given positions, in that order
+
+        Returns:
+            The feature value per key
+        """
+        values: List[Any] = [None] * len(keys)
+        owned: Dict[int, Future] = {}
+        waiting: Dict[int, Future] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and name in entry.features:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    values[i] = entry.features[name]
+                    continue
+                pending = self._pending.get((key, name))
+                if pending is None:
+                    self._misses += 1
+                    pending = owned[i] = self._pending[(key, name)] = Future()
+                else:
+                    self._hits += 1
+                waiting[i] = pending
+
+        if owned:
+            missing = list(owned)
+            try:
+                computed = compute(missing)
+            except BaseException as e:
+                computed = []
+                error = e
+            else:
+                error = RuntimeError(f"{name}: {len(computed)} features computed for {len(missing)} utterances")
+
+            with self._lock:
+                for i, value in zip(missing, computed):
+                    self._store(keys[i], name, value)
+                for i in missing:
+                    del self._pending[(keys[i], name)]
+            for i, value in zip(missing, computed):
+                owned.pop(i).set_result(value)
+            # Whatever compute did not produce fails, so nobody waits on it forever
+            for future in owned.values():
+                future.set_exception(error)
+
+        for i, pending in waiting.items():
+            values[i] = pending.result()
+        return values
+
+    def _store(self, key: str, name: str, value: Any):
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            logger.debug(f"Feature {name} exceeds the cache budget; not cached")
+            return
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _UtteranceFeatures()
+        if name in entry.features:
+            replaced = _nbytes(entry.features[name])
+            entry.nbytes -= replaced
+            self._bytes -= replaced
+        entry.features[name] = value
+        entry.nbytes += nbytes
+        self._bytes += nbytes
+        self._entries.move_to_end(key)
+
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_utterances):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def clear(self):
+        """Drop every cached feature."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report occupancy and hit rate of the cache."""
+        lookups = self._hits + self._misses
+        return {
+            "utterances": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions
+        }
+
+
+def _nbytes(value: Any) -> int:
+    """Memory held by a feature: arrays, tensors and containers of them."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    return 0
+
+
+_cache = FeatureCache()
+
+def configure_feature_cache(settings):
+    """Apply the application's feature cache budget."""
+    _cache.max_bytes = int(settings.FEATURE_CACHE_MB * 1024 * 1024)
+
+def get_feature_cache() -> FeatureCache:
+    """Return the process-wide feature cache."""
+    return _cache
@@ -0,0 +1,223 @@
+"""Binary framing for audio sent over the WebSocket endpoints.
+
+Every binary message is one frame: a 16-byte little-endian header followed by
+the payload::
+
+    offset  size  field
+    0       2     magic b"VA"
+    2       1     protocol version (1)
+    3       1     sample format (0 float32, 1 int16, 2 opus, 3 ogg opus, 4 webm opus)
+    4       1     flags (bit 0: end of utterance)
+    5       1     channel count
+    6       2     reserved (0)
+    8       4     sample rate in Hz
+    12      4     sequence number
+
+PCM payloads are interleaved samples. An Opus payload is one Opus packet;
+Ogg and WebM payloads are consecutive slices of one container stream.
+A frame with the end-of-utterance flag may have an empty payload.
+"""
+import json
+import logging
+import struct
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .frontend import resample
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VA"
+VERSION = 1
+HEADER = struct.Struct("<2sBBBBHII")
+HEADER_SIZE = HEADER.size
+
+FORMAT_FLOAT32 = 0
+FORMAT_INT16 = 1
+FORMAT_OPUS = 2
+FORMAT_OGG = 3
+FORMAT_WEBM = 4
+
+FLAG_END_OF_UTTERANCE = 0x01
+
+_PCM_DTYPES = {FORMAT_FLOAT32: np.dtype("<f4"), FORMAT_INT16: np.dtype("<i2")}
+_CODECS = {FORMAT_OPUS: "opus", FORMAT_OGG: "ogg", FORMAT_WEBM: "webm"}
+
+class FrameError(ValueError):
+    """Raised for binary messages that are not valid audio frames."""
+
+
+class AudioFrame:
+    __slots__ = ("sample_format", "sample_rate", "channels", "sequence", "end_of_utterance", "samples")
+
+    def __init__(
+        self,
+        sample_format: int,
+        sample_rate: int,
+        channels: int,
+        sequence: int,
+        end_of_utterance: bool,
+        samples: np.ndarray
+    ):
+        """A parsed frame; ``samples`` is mono float32 at the parser's target rate."""
+        self.sample_format = sample_format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sequence = sequence
+        self.end_of_utterance = end_of_utterance
+        self.samples = samples
+
+
+def encode_frame(
+    samples,
+    sample_rate: int = 16000,
+    sample_format: int = FORMAT_FLOAT32,
+    channels: int = 1,
+    sequence: int = 0,
+    end_of_utterance: bool = False
+) -> bytes:
+    """Build a frame from PCM samples or an Opus packet (used by clients and tests)."""
+    if sample_format in _PCM_DTYPES:
+        payload = np.ascontiguousarray(samples, dtype=_PCM_DTYPES[sample_format]).tobytes()
+    else:
+        payload = bytes(samples)
+    flags = FLAG_END_OF_UTTERANCE if end_of_utterance else 0
+    return HEADER.pack(MAGIC, VERSION, sample_format, flags, channels, 0, sample_rate, sequence) + payload
+
+
+class FrameParser:
+    def __init__(self, target_rate: int = 16000):
+        """Per-connection parser turning frames into mono float32 audio.
+
+        Float32 payloads are viewed in place through a memoryview, without
+        copying. int16 payloads are viewed the same way and then scaled into
+        float32 in one pass. Compressed payloads go through a per-connection
+        StreamingAudioDecoder that outputs ``target_rate`` directly. Sequence
+        gaps are counted.
+
+        Args:
+            target_rate: Sample rate of the audio handed to the models
+        """
+        self.target_rate = target_rate
+        self._decoder = None
+        self._decoder_key = None
+        self._expected_sequence: Optional[int] = None
+        self.frames = 0
+        self.bytes_in = 0
+        self.sequence_gaps = 0
+
+    def parse(self, data) -> AudioFrame:
+        """Parse one binary message.
+
+        Args:
+            data: bytes, bytearray or memoryview holding a complete frame
+
+        Returns:
+            AudioFrame with mono float32 samples at ``target_rate``
+        """
+        view = memoryview(data)
+        if len(view) < HEADER_SIZE:
+            raise FrameError(f"Frame shorter than the {HEADER_SIZE}-byte header")
+
+        magic, version, sample_format, flags, channels, _, sample_rate, sequence = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise FrameError("Missing frame magic")
+        if version != VERSION:
+            raise FrameError(f"Unsupported protocol version {version}")
+        if channels < 1 or sample_rate <= 0:
+            raise FrameError("Invalid channel count or sample rate")
+
+        self._check_sequence(sequence)
+        self.frames += 1
+        self.bytes_in += len(view)
+
+        payload = view[HEADER_SIZE:]
+        if sample_format in _PCM_DTYPES:
+            samples = self._decode_pcm(payload, _PCM_DTYPES[sample_format], channels, sample_rate)
+        elif sample_format in _CODECS:
+            samples = self._decode_compressed(payload, _CODECS[sample_format], channels)
+        else:
+            raise FrameError(f"Unsupported sample format {sample_format}")
+
+        return AudioFrame(
+            sample_format, sample_rate, channels, sequence,
+            bool(flags & FLAG_END_OF_UTTERANCE), samples
+        )
+
+    def _check_sequence(self, sequence: int):
+        if self._expected_sequence is not None and sequence != self._expected_sequence:
+            self.sequence_gaps += 1
+            logger.warning(f"Audio frame sequence gap: expected {self._expected_sequence}, got {sequence}")
+        self._expected_sequence = (sequence + 1) & 0xFFFFFFFF
+
+    def _decode_pcm(self, payload: memoryview, dtype: np.dtype, channels: int, sample_rate: int) -> np.ndarray:
+        if len(payload) % (dtype.itemsize * channels):
+            raise FrameError("Payload is not a whole number of samples")
+
+        # Read-only view onto the message buffer
+        samples = _to_mono_float32(np.frombuffer(payload, dtype=dtype), channels)
+        if sample_rate != self.target_rate:
+            samples = resample(samples, sample_rate, self.target_rate)
+        return samples
+
+    def _decode_compressed(self, payload: memoryview, codec: str, channels: int) -> np.ndarray:
+        if len(payload) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        if self._decoder is None or self._decoder_key != (codec, channels):
+            from .decoding import StreamingAudioDecoder
+            try:
+                self._decoder = StreamingAudioDecoder(codec, self.target_rate, channels)
+            except ValueError as e:
+                raise FrameError(str(e))
+            self._decoder_key = (codec, channels)
+        return self._decoder.feed(payload)
+
+    def get_metrics(self) -> Dict[str, int]:
+        metrics = {"frames": self.frames, "bytes_in": self.bytes_in, "sequence_gaps": self.sequence_gaps}
+        if self._decoder is not None:
+            metrics["decoder"] = self._decoder.get_metrics()
+        return metrics
+
+
+def _to_mono_float32(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Downmix interleaved samples and scale int16 to [-1, 1]; mono float32 stays a view."""
+    is_int16 = samples.dtype == np.int16
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    if is_int16:
+        return np.multiply(samples, 1.0 / 32768.0, dtype=np.float32)
+    return samples.astype(np.float32, copy=False)
+
+
+RESPONSE_ENCODINGS = ("json", "msgpack")
+
+def validate_encoding(encoding: str) -> str:
+    """Check a requested response encoding is known and available."""
+    if encoding not in RESPONSE_ENCODINGS:
+        raise ValueError(f"Unsupported response encoding '{encoding}'")
+    if encoding == "msgpack":
+        import msgpack  # noqa: F401  (fails early when the package is missing)
+    return encoding
+
+def pack_message(message: Dict[str, Any], encoding: str = "json") -> bytes:
+    """Serialize a response message."""
+    if encoding == "msgpack":
+        import msgpack
+        return msgpack.packb(message, use_bin_type=True, default=_to_builtin)
+    return json.dumps(message, default=_to_builtin).encode("utf-8")
+
+async def send_message(websocket, message: Dict[str, Any], encoding: str = "json"):
+    """Send a response message over a WebSocket in the negotiated encoding."""
+    if encoding == "msgpack":
+        await websocket.send_bytes(pack_message(message, encoding))
+    else:
+        await websocket.send_json(message)
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -0,0 +1,200 @@
+"""Audio front-end shared by every speech model.
+
+``prepare_audio`` turns whatever a caller holds (float32/int16 arrays or raw
+float32 bytes, at any sample rate) into an ``AudioChunk``: mono float32 at
+16 kHz, peak-normalized into [-1, 1], read-only, with Whisper-compatible
+log-mel features computed at most once per utterance (see features.py).
+Whisper, the wake word detector and the voice feature analyzer all accept
+the chunk, so the conversion work is not repeated per model.
+"""
+import functools
+from math import gcd
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from .features import audio_key, get_feature_cache
+
+SAMPLE_RATE = 16000
+
+# Whisper's STFT parameters (25 ms window, 10 ms hop at 16 kHz)
+N_FFT = 400
+HOP_LENGTH = 160
+
+class AudioChunk:
+    __slots__ = ("samples", "sample_rate", "peak", "_key")
+
+    def __init__(self, samples: np.ndarray, peak: float):
+        """Prepared audio; build it with ``prepare_audio``.
+
+        Args:
+            samples: Read-only mono float32 samples at 16 kHz
+            peak: Absolute peak of the audio before normalization
+        """
+        self.samples = samples
+        self.sample_rate = SAMPLE_RATE
+        self.peak = peak
+        self._key: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def key(self) -> str:
+        """Content hash of the samples, keying the shared feature cache."""
+        if self._key is None:
+            self._key = audio_key(self.samples)
+        return self._key
+
+    def feature(self, name: str, compute: Callable[[], Any]) -> Any:
+        """Look up a named feature of this audio in the shared cache, computing it on a miss."""
+        return get_feature_cache().get_or_compute(self.key, name, compute)
+
+    def log_mel(self, n_mels: int = 80) -> np.ndarray:
+        """Whisper log-mel spectrogram (n_mels x frames), computed once per utterance."""
+        return self.feature(f"log_mel:{n_mels}", functools.partial(_read_only_log_mel, self.samples, n_mels))
+
+    def mfcc(self, n_mfcc: int = 13, n_mels: int = 80) -> np.ndarray:
+        """MFCCs (n_mfcc x frames): orthonormal DCT-II of the cached log-mel spectrogram."""
+        return self.feature(
+            f"mfcc:{n_mfcc}:{n_mels}",
+            lambda: _read_only(_dct_matrix(n_mels, n_mfcc) @ self.log_mel(n_mels))
+        )
+
+
+def prepare_audio(audio, sample_rate: int = SAMPLE_RATE, normalize: bool = True) -> AudioChunk:
+    """Convert audio to the shared front-end representation.
+
+    At most one new array is allocated: int16 scaling, resampling and peak
+    normalization reuse the array made by the first of them that runs, and
+    float32 input that needs none of them is wrapped without copying.
+
+    Args:
+        audio: AudioChunk (returned as is), numpy array or raw float32 bytes
+        sample_rate: Sample rate of ``audio``
+        normalize: Scale audio whose peak exceeds 1.0 back into [-1, 1]
+
+    Returns:
+        AudioChunk at 16 kHz
+    """
+    if isinstance(audio, AudioChunk):
+        return audio
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = np.frombuffer(audio, dtype=np.float32)
+
+    samples = np.asarray(audio).reshape(-1)
+    owned = False
+    if samples.dtype == np.int16:
+        samples = np.multiply(samples, 1.0 / 32768.0, dtype=np.float32)
+        owned = True
+    elif samples.dtype != np.float32:
+        samples = samples.astype(np.float32)
+        owned = True
+
+    if sample_rate != SAMPLE_RATE:
+        samples = resample(samples, sample_rate, SAMPLE_RATE)
+        owned = True
+
+    # One pass each for max and min, without an np.abs temporary
+    peak = float(max(samples.max(), -samples.min())) if len(samples) else 0.0
+    if normalize and peak > 1.0:
+        if owned:
+            samples *= np.float32(1.0 / peak)
+        else:
+            samples = np.multiply(samples, 1.0 / peak, dtype=np.float32)
+
+    # A view, so marking it read-only never touches the caller's array
+    samples = samples.view()
+    samples.flags.writeable = False
+    return AudioChunk(samples, peak)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Polyphase resampling with a cached anti-aliasing filter per rate pair."""
+    from scipy.signal import resample_poly
+
+    divisor = gcd(source_rate, target_rate)
+    up, down = target_rate // divisor, source_rate // divisor
+    if up == down:
+        return np.array(samples, dtype=np.float32)
+    return resample_poly(samples.astype(np.float32, copy=False), up, down, window=_resampling_filter(up, down))
+
+@functools.lru_cache(maxsize=16)
+def _resampling_filter(up: int, down: int) -> np.ndarray:
+    # Same design as resample_poly's default, so results match it
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    taps.flags.writeable = False
+    return taps
+
+
+def log_mel_spectrogram(samples: np.ndarray, n_mels: int = 80) -> np.ndarray:
+    """NumPy equivalent of ``whisper.log_mel_spectrogram`` for 16 kHz audio."""
+    padded = np.pad(samples, N_FFT // 2, mode="reflect" if len(samples) > N_FFT // 2 else "constant")
+    # Whisper drops the last STFT frame
+    frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP_LENGTH][:len(samples) // HOP_LENGTH]
+    spectrum = np.fft.rfft(frames * _hann_window(), axis=1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+
+    mel = _mel_filters(n_mels) @ power.T.astype(np.float32)
+    log_spec = np.log10(np.maximum(mel, 1e-10))
+    if log_spec.size:
+        np.maximum(log_spec, log_spec.max() - 8.0, out=log_spec)
+    return ((log_spec + 4.0) / 4.0).astype(np.float32, copy=False)
+
+def _read_only_log_mel(samples: np.ndarray, n_mels: int) -> np.ndarray:
+    return _read_only(log_mel_spectrogram(samples, n_mels))
+
+def _read_only(features: np.ndarray) -> np.ndarray:
+    features.flags.writeable = False
+    return features
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix(n_mels: int, n_mfcc: int) -> np.ndarray:
+    n = np.arange(n_mels)
+    basis = np.cos(np.pi / n_mels * (n[None, :] + 0.5) * np.arange(n_mfcc)[:, None]) * np.sqrt(2.0 / n_mels)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+@functools.lru_cache(maxsize=None)
+def _hann_window() -> np.ndarray:
+    # Periodic Hann window, as torch.hann_window
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+
+@functools.lru_cache(maxsize=None)
+def _mel_filters(n_mels: int) -> np.ndarray:
+    """Slaney-normalized mel filterbank (librosa's default, which Whisper ships)."""
+    fft_freqs = np.linspace(0, SAMPLE_RATE / 2, 1 + N_FFT // 2)
+    mel_points = _mel_to_hz(np.linspace(_hz_to_mel(0.0), _hz_to_mel(SAMPLE_RATE / 2), n_mels + 2))
+
+    spacing = np.diff(mel_points)
+    ramps = mel_points[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / spacing[:-1, None]
+    upper = ramps[2:] / spacing[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_points[2:] - mel_points[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+# Slaney mel scale: linear below 1 kHz, logarithmic above
+_F_SP = 200.0 / 3
+_MIN_LOG_HZ = 1000.0
+_MIN_LOG_MEL = _MIN_LOG_HZ / _F_SP
+_LOG_STEP = np.log(6.4) / 27.0
+
+def _hz_to_mel(hz):
+    hz = np.asarray(hz, dtype=np.float64)
+    return np.where(
+        hz >= _MIN_LOG_HZ,
+        _MIN_LOG_MEL + np.log(np.maximum(hz, _MIN_LOG_HZ) / _MIN_LOG_HZ) / _LOG_STEP,
+        hz / _F_SP
+    )
+
+def _mel_to_hz(mel):
+    mel = np.asarray(mel, dtype=np.float64)
+    return np.where(mel >= _MIN_LOG_MEL, _MIN_LOG_HZ * np.exp(_LOG_STEP * (mel - _MIN_LOG_MEL)), _F_SP * mel)
@@ -0,0 +1,108 @@
+import numpy as np
+from typing import Dict, Optional
+
+class EnergyGate:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_duration: float = 0.03,
+        margin_db: float = 9.0,
+        max_zero_crossing_rate: float = 0.35,
+        floor_rise_rate: float = 0.05,
+        min_floor_db: float = -80.0,
+        initial_floor_db: float = -60.0,
+        shared_stats: Optional[Dict[str, int]] = None
+    ):
+        """Cheap first-stage speech gate based on frame energy and zero crossings.
+
+        Features for every frame of a chunk are computed in one vectorized pass.
+        A frame passes when its RMS level is ``margin_db`` above the session's
+        noise floor; frames that only barely clear the margin but cross zero very
+        often (hiss, fan noise) are rejected too. The noise floor follows the
+        quietest frames: it drops immediately and rises slowly. It starts from
+        ``initial_floor_db`` rather than from the first chunk, which may well be
+        speech; until quieter frames pull it down, the gate errs towards passing.
+
+        Args:
+            sample_rate: Sample rate of the audio
+            frame_duration: Frame length in seconds
+            margin_db: Level above the noise floor required to pass
+            max_zero_crossing_rate: Zero-crossing rate above which marginal frames count as noise
+            floor_rise_rate: Fraction of the gap the floor rises per second of audio
+            min_floor_db: Lowest noise floor, so digital silence does not make the gate hypersensitive
+            initial_floor_db: Noise floor of a new session
+            shared_stats: Counters aggregated across sessions (``frames`` and ``rejected``)
+        """
+        self.frame_samples = int(sample_rate * frame_duration)
+        self.frame_duration = frame_duration
+        self.margin_db = margin_db
+        self.max_zero_crossing_rate = max_zero_crossing_rate
+        self.floor_rise_rate = floor_rise_rate
+        self.min_floor_db = min_floor_db
+
+        self.noise_floor_db = initial_floor_db
+        self.frames_seen = 0
+        self.frames_rejected = 0
+        self.shared_stats = shared_stats
+
+    def frame_features(self, frames: np.ndarray):
+        """Return per-frame RMS level in dBFS and zero-crossing rate.
+
+        Args:
+            frames: 2-D array of frames (float in [-1, 1] or int16)
+        """
+        frames = np.asarray(frames)
+        if frames.dtype == np.int16:
+            frames = frames.astype(np.float32) / 32768.0
+
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        level_db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+        signs = np.signbit(frames)
+        zero_crossing_rate = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+        return level_db, zero_crossing_rate
+
+    def mask(self, frames: np.ndarray) -> np.ndarray:
+        """Return a boolean mask of the frames that may contain speech.
+
+        Args:
+            frames: 2-D array of frames (float in [-1, 1] or int16)
+        """
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+
+        level_db, zero_crossing_rate = self.frame_features(frames)
+        chunk_floor = max(float(np.percentile(level_db, 10)), self.min_floor_db)
+        if chunk_floor < self.noise_floor_db:
+            self.noise_floor_db = chunk_floor
+        else:
+            rise = 1.0 - (1.0 - self.floor_rise_rate) ** (len(frames) * self.frame_duration)
+            self.noise_floor_db += rise * (chunk_floor - self.noise_floor_db)
+
+        above = level_db - self.noise_floor_db
+        passed = (above > 2 * self.margin_db) | (
+            (above > self.margin_db) & (zero_crossing_rate < self.max_zero_crossing_rate)
+        )
+
+        rejected = int(len(passed) - np.count_nonzero(passed))
+        self.frames_seen += len(passed)
+        self.frames_rejected += rejected
+        if self.shared_stats is not None:
+            self.shared_stats["frames"] += len(passed)
+            self.shared_stats["rejected"] += rejected
+        return passed
+
+    def has_speech(self, audio_data: np.ndarray) -> bool:
+        """Whether any frame of a 1-D chunk passes the gate."""
+        usable = len(audio_data) - len(audio_data) % self.frame_samples
+        if usable == 0:
+            return False
+        return bool(self.mask(audio_data[:usable].reshape(-1, self.frame_samples)).any())
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Report how many frames the gate kept away from the models."""
+        return {
+            "frames": self.frames_seen,
+            "rejected": self.frames_rejected,
+            "rejection_rate": self.frames_rejected / self.frames_seen if self.frames_seen else 0.0,
+            "noise_floor_db": self.noise_floor_db
+        }
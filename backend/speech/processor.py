@@ -1,53 +1,97 @@
-import torch
-import whisper
-from typing import Optional, Dict
+from __future__ import annotations
+
+import functools
+from typing import Optional, Dict, List
 import numpy as np
 import logging
 from pathlib import Path
 
+from ..inference.executor import ExecutorSaturatedError, get_pool
+from ..inference.lazy import default_device, lazy_import
+from ..inference.quantization import quantize_model, validate_quantization
+from ..inference.registry import ModelRef, get_registry
+from .batching import MicroBatchScheduler
+from .frontend import AudioChunk, prepare_audio
+from .streaming import StreamingTranscriber
+
+# Imported on first model call so importing this module stays cheap
+torch = lazy_import("torch")
+whisper = lazy_import("whisper")
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SpeechProcessor:
-    def __init__(self, model_name: str = "base", device: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str = "base",
+        device: Optional[str] = None,
+        max_batch_size: int = 1,
+        max_batch_wait_ms: float = 20.0,
+        quantization: str = "none"
+    ):
         """Initialize the speech processor with Whisper model.
         
         Args:
             model_name: Whisper model size ("tiny", "base", "small", "medium", "large")
-            device: Device to run the model on ("cuda" or "cpu")
+            device: Device to run the model on ("cuda" or "cpu"); picked on first use if omitted
+            max_batch_size: Segments decoded together across sessions (1 disables batching)
+            max_batch_wait_ms: Longest time a segment waits for a batch to fill
+            quantization: Weight quantization ("none" or "int8", CPU only)
         """
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        logger.info(f"Loading Whisper model '{model_name}' on {self.device}")
-        
-        try:
-            self.model = whisper.load_model(model_name).to(self.device)
-            logger.info("Whisper model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load Whisper model: {e}")
-            raise
+        self._device = device
+        # Loaded on first use (or at warm-up) and shared with other processors
+        self._model_ref = acquire_whisper_model(model_name, device, quantization)
 
-    async def process_audio(self, audio_data: np.ndarray, sample_rate: int = 16000) -> Dict:
+        self.scheduler = None
+        if max_batch_size > 1:
+            self.scheduler = MicroBatchScheduler(
+                self._decode_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_batch_wait_ms,
+                runner=get_pool("whisper").run
+            )
+
+    @property
+    def device(self) -> str:
+        return self._device or default_device()
+
+    @property
+    def model(self):
+        return self._model_ref.get()
+
+    async def process_audio(self, audio_data, sample_rate: int = 16000) -> Dict:
         """Process audio data and return transcription.
         
         Args:
-            audio_data: Audio data as numpy array
-            sample_rate: Sample rate of the audio
+            audio_data: AudioChunk from the shared front-end, or audio as numpy array
+            sample_rate: Sample rate of a numpy array (resampled to 16 kHz)
         
         Returns:
             Dictionary containing transcription and metadata
         """
         try:
-            # Ensure audio data is in the correct format
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            
-            # Normalize audio
-            if np.abs(audio_data).max() > 1.0:
-                audio_data = audio_data / np.abs(audio_data).max()
-
-            # Process with Whisper
-            result = self.model.transcribe(
-                audio_data,
+            # Cast, resample and normalize once; a prepared chunk is used as is
+            chunk = prepare_audio(audio_data, sample_rate)
+
+            # Utterances that fit one Whisper window share batches across sessions
+            if self.scheduler and len(chunk) <= whisper.audio.N_SAMPLES:
+                decoded = await self.scheduler.submit(chunk)
+                return {
+                    "text": decoded.text,
+                    "segments": [{
+                        "start": 0.0,
+                        "end": chunk.duration,
+                        "text": decoded.text
+                    }],
+                    "language": decoded.language,
+                    "success": True
+                }
+
+            # Process with Whisper off the event loop
+            result = await get_pool("whisper").run(
+                self._transcribe,
+                chunk.samples,
                 language="en",
                 task="transcribe",
                 fp16=torch.cuda.is_available()
@@ -60,6 +104,14 @@ class SpeechProcessor:
                 "success": True
             }
 
+        except ExecutorSaturatedError as e:
+            logger.warning(f"Transcription rejected: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "overloaded": True
+            }
+
         except Exception as e:
             logger.error(f"Error processing audio: {e}")
             return {
@@ -67,6 +119,86 @@ class SpeechProcessor:
                 "error": str(e)
             }
 
+    def _decode_batch(self, chunks: List[AudioChunk]) -> List:
+        """Decode a batch of audio chunks in one padded forward pass."""
+        # Padded to Whisper's 30 s window before the log-mel, as whisper.transcribe does:
+        # padding the spectrogram with zeros instead gives silence frames the model never saw
+        n_mels = self.model.dims.n_mels
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.tensor(chunk.samples)), n_mels, device=self.device)
+            for chunk in chunks
+        ])
+
+        options = whisper.DecodingOptions(
+            language="en",
+            task="transcribe",
+            fp16=torch.cuda.is_available(),
+            without_timestamps=True
+        )
+        with torch.no_grad():
+            return whisper.decode(self.model, mels, options)
+
+    def _transcribe(self, audio: np.ndarray, **options) -> Dict:
+        # Runs on the pool, so a first (lazy) model load never blocks the event loop
+        if not audio.flags.writeable:
+            # Front-end audio is read-only; torch warns when wrapping such arrays
+            audio = audio.copy()
+        return self.model.transcribe(audio, **options)
+
+    def get_metrics(self) -> Dict:
+        """Report batching metrics for the shared Whisper model."""
+        return self.scheduler.get_metrics() if self.scheduler else {}
+
+    async def transcribe_window(self, audio_data: np.ndarray, initial_prompt: Optional[str] = None) -> Dict:
+        """Transcribe a bounded window of streaming audio with word timings.
+
+        Args:
+            audio_data: Uncommitted audio window as float32 numpy array
+            initial_prompt: Already committed text used as decoding context
+
+        Returns:
+            Dictionary containing the words with start/end times in seconds
+        """
+        try:
+            result = await get_pool("whisper").run(
+                self._transcribe,
+                audio_data,
+                language="en",
+                task="transcribe",
+                fp16=torch.cuda.is_available(),
+                word_timestamps=True,
+                initial_prompt=initial_prompt,
+                condition_on_previous_text=False
+            )
+
+            words = [
+                {"word": word["word"], "start": word["start"], "end": word["end"]}
+                for segment in result["segments"]
+                for word in segment.get("words", [])
+            ]
+            return {
+                "words": words,
+                "success": True
+            }
+
+        except Exception as e:
+            logger.error(f"Error transcribing audio window: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    def create_stream(self, **kwargs) -> StreamingTranscriber:
+        """Create an incremental transcriber for one session.
+
+        Args:
+            **kwargs: Options forwarded to StreamingTranscriber
+
+        Returns:
+            StreamingTranscriber bound to this processor's model
+        """
+        return StreamingTranscriber(self, **kwargs)
+
     async def process_stream(self, audio_stream: bytes) -> Dict:
         """Process audio stream in real-time.
         
@@ -77,9 +209,7 @@ class SpeechProcessor:
             Dictionary containing transcription and metadata
         """
         try:
-            # Convert audio stream to numpy array
-            audio_data = np.frombuffer(audio_stream, dtype=np.float32)
-            return await self.process_audio(audio_data)
+            return await self.process_audio(prepare_audio(audio_stream))
         
         except Exception as e:
             logger.error(f"Error processing audio stream: {e}")
@@ -90,11 +220,28 @@ class SpeechProcessor:
 
     def cleanup(self):
         """Cleanup resources."""
-        if hasattr(self, 'model'):
-            # Clear CUDA cache if using GPU
-            if self.device == "cuda":
-                torch.cuda.empty_cache()
-            
-            # Delete model
-            del self.model
-            logger.info("Speech processor cleaned up")
+        # Drop this processor's reference to the shared model
+        self._model_ref.release()
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        logger.info("Speech processor cleaned up")
+
+
+def acquire_whisper_model(model_name: str, device: Optional[str] = None, quantization: str = "none") -> ModelRef:
+    """Take a registry reference to a Whisper model, shared by every consumer of the same variant."""
+    quantization = validate_quantization(quantization)
+    key = f"whisper:{model_name}:{device or 'auto'}"
+    if quantization != "none":
+        key += f":{quantization}"
+    return get_registry().acquire(key, functools.partial(load_whisper_model, model_name, device, quantization))
+
+def load_whisper_model(model_name: str, device: Optional[str] = None, quantization: str = "none"):
+    """Load a Whisper model onto a device (the default device if omitted)."""
+    device = device or default_device()
+    try:
+        model = quantize_model(whisper.load_model(model_name).to(device), quantization, device)
+        logger.info(f"Whisper model '{model_name}' loaded on {device} (quantization: {quantization})")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load Whisper model: {e}")
+        raise
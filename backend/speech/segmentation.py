@@ -0,0 +1,150 @@
+import numpy as np
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from .gating import EnergyGate
+
+class SpeechSegmenter:
+    def __init__(
+        self,
+        is_speech: Callable[[bytes, int], bool],
+        sample_rate: int = 16000,
+        frame_duration: float = 0.03,
+        padding_duration: float = 0.3,
+        trigger_ratio: float = 0.9,
+        max_segment_duration: float = 30.0,
+        gate: Optional[EnergyGate] = None
+    ):
+        """Split a stream of float32 audio into utterances using a frame-level VAD.
+
+        Audio is converted to int16 and sliced into fixed frames, the only input
+        webrtcvad accepts. A sliding window of ``padding_duration`` smooths the
+        per-frame decisions: speech starts once ``trigger_ratio`` of the window is
+        voiced (the window is kept as lead-in padding) and ends once the same share
+        is unvoiced (the trailing silence acts as hangover).
+
+        Args:
+            is_speech: Frame classifier, e.g. ``webrtcvad.Vad.is_speech``
+            sample_rate: Sample rate of the audio (8, 16, 32 or 48 kHz)
+            frame_duration: Frame length in seconds (0.01, 0.02 or 0.03)
+            padding_duration: Length of the smoothing window in seconds
+            trigger_ratio: Share of frames in the window that flips the state
+            max_segment_duration: Utterances are cut after this many seconds
+            gate: Optional pre-VAD gate; frames it rejects skip ``is_speech``
+        """
+        if round(frame_duration * 1000) not in (10, 20, 30):
+            raise ValueError("frame_duration must be 10, 20 or 30 ms")
+
+        self.is_speech = is_speech
+        self.gate = gate
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_duration)
+        self.trigger_ratio = trigger_ratio
+        self.max_segment_frames = int(max_segment_duration / frame_duration)
+
+        self._window = deque(maxlen=max(1, int(padding_duration / frame_duration)))
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._segment: List[np.ndarray] = []
+        self._offset = 0
+        self._segment_start = 0
+        self.triggered = False
+
+    def feed(self, audio_data: np.ndarray) -> List[Dict]:
+        """Process a chunk of audio and return the utterance events it completes.
+
+        Events are ``speech_start`` (with the lead-in ``audio``), ``speech``
+        (``audio`` of each further frame run inside an utterance) and
+        ``speech_end`` (with the whole utterance as ``segment``).
+
+        Args:
+            audio_data: float32 samples in [-1, 1]
+
+        Returns:
+            List of event dictionaries in stream order
+        """
+        samples = np.concatenate((self._remainder, to_int16(audio_data)))
+        usable = len(samples) - len(samples) % self.frame_samples
+        self._remainder = samples[usable:]
+        frames = samples[:usable].reshape(-1, self.frame_samples)
+
+        # Frames the gate rejects are silence without asking the VAD
+        candidates = self.gate.mask(frames) if self.gate is not None else np.ones(len(frames), dtype=bool)
+
+        events: List[Dict] = []
+        voiced_run: List[np.ndarray] = []
+        for frame, candidate in zip(frames, candidates):
+            voiced = bool(candidate) and self.is_speech(frame.tobytes(), self.sample_rate)
+            self._offset += self.frame_samples
+
+            if not self.triggered:
+                self._window.append((frame, voiced))
+                if self._ratio(True) >= self.trigger_ratio:
+                    self.triggered = True
+                    lead_in = [buffered for buffered, _ in self._window]
+                    self._segment = list(lead_in)
+                    self._segment_start = self._offset - len(lead_in) * self.frame_samples
+                    self._window.clear()
+                    events.append({
+                        "type": "speech_start",
+                        "start": self._segment_start,
+                        "audio": to_float32(np.concatenate(lead_in))
+                    })
+                continue
+
+            self._segment.append(frame)
+            voiced_run.append(frame)
+            self._window.append((frame, voiced))
+            if self._ratio(False) >= self.trigger_ratio or len(self._segment) >= self.max_segment_frames:
+                events.extend(self._flush_run(voiced_run))
+                events.append(self._end())
+
+        events.extend(self._flush_run(voiced_run))
+        return events
+
+    def flush(self) -> List[Dict]:
+        """Close an utterance still open at the end of the stream."""
+        if not self.triggered:
+            return []
+        return [self._end()]
+
+    def reset(self):
+        """Drop any partial utterance and smoothing state."""
+        self._window.clear()
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._segment = []
+        self.triggered = False
+
+    def _ratio(self, voiced: bool) -> float:
+        if len(self._window) < self._window.maxlen:
+            return 0.0
+        return sum(1 for _, flag in self._window if flag == voiced) / len(self._window)
+
+    def _flush_run(self, run: List[np.ndarray]) -> List[Dict]:
+        if not run:
+            return []
+        audio = to_float32(np.concatenate(run))
+        run.clear()
+        return [{"type": "speech", "audio": audio}]
+
+    def _end(self) -> Dict:
+        event = {
+            "type": "speech_end",
+            "start": self._segment_start,
+            "end": self._offset,
+            "segment": to_float32(np.concatenate(self._segment))
+        }
+        self._segment = []
+        self._window.clear()
+        self.triggered = False
+        return event
+
+
+def to_int16(audio_data: np.ndarray) -> np.ndarray:
+    """Convert float32 samples in [-1, 1] to int16 PCM."""
+    if audio_data.dtype == np.int16:
+        return audio_data
+    return (np.clip(audio_data, -1.0, 1.0) * 32767).astype(np.int16)
+
+def to_float32(audio_data: np.ndarray) -> np.ndarray:
+    """Convert int16 PCM to float32 samples in [-1, 1]."""
+    return audio_data.astype(np.float32) / 32768.0
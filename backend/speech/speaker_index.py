@@ -0,0 +1,312 @@
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "speakers.json"
+
+class SpeakerIndex:
+    def __init__(self, dim: int, capacity: int = 1024):
+        """Gallery of speaker embeddings searched by cosine similarity.
+
+        Embeddings are L2-normalized once when added and kept as rows of one
+        contiguous float32 matrix, so an exact search is a single
+        matrix-vector product. ``build_ivf`` adds an optional inverted-file
+        index (spherical k-means) that scores only the rows in the clusters
+        nearest to the query, for galleries where even one matmul per query
+        is too much.
+
+        Args:
+            dim: Embedding dimension
+            capacity: Initial number of rows; the matrix doubles when full
+        """
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._mapped = False
+        self._version: Optional[str] = None
+        self._manifest_mtime: Optional[int] = None
+
+        # Inverted-file index: centroids and the cluster of every row
+        self._centroids: Optional[np.ndarray] = None
+        self._assignment = np.zeros(capacity, dtype=np.int32)
+        self._ivf_size = 0
+
+        self._searches = 0
+        self._search_seconds = 0.0
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Dict[str, np.ndarray]) -> "SpeakerIndex":
+        """Build an index from a speaker -> embedding mapping."""
+        ids = list(embeddings)
+        if not ids:
+            raise ValueError("No embeddings to index")
+        matrix = np.asarray([embeddings[speaker] for speaker in ids], dtype=np.float32)
+        index = cls(matrix.shape[1], capacity=max(len(ids), 1))
+        index.add_many(ids, matrix)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, speaker_id: str) -> bool:
+        return speaker_id in self._rows
+
+    @property
+    def speakers(self) -> List[str]:
+        return list(self._ids)
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the saved gallery this index was loaded from or last saved as."""
+        return self._version
+
+    @property
+    def ivf_size(self) -> int:
+        """Gallery size when the IVF index was built (0 without one)."""
+        return self._ivf_size if self._centroids is not None else 0
+
+    def add(self, speaker_id: str, embedding: np.ndarray):
+        """Add a speaker, or replace the embedding of an enrolled one."""
+        self.add_many([speaker_id], np.asarray(embedding, dtype=np.float32)[None, :])
+
+    def add_many(self, speaker_ids: List[str], embeddings: np.ndarray):
+        """Add or replace several speakers; ``embeddings`` is (len(speaker_ids), dim)."""
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(speaker_ids), self.dim))
+        with self._lock:
+            self._make_writable(len(self._ids) + len(speaker_ids))
+            for speaker_id, embedding in zip(speaker_ids, embeddings):
+                row = self._rows.get(speaker_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(speaker_id)
+                    self._rows[speaker_id] = row
+                self._matrix[row] = embedding
+                if self._centroids is not None:
+                    self._assignment[row] = int(np.argmax(self._centroids @ embedding))
+
+    def remove(self, speaker_id: str) -> bool:
+        """Remove a speaker; the last row moves into its slot so rows stay contiguous."""
+        with self._lock:
+            row = self._rows.pop(speaker_id, None)
+            if row is None:
+                return False
+            self._make_writable(len(self._ids))
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._assignment[row] = self._assignment[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            return True
+
+    def get(self, speaker_id: str) -> Optional[np.ndarray]:
+        """Normalized embedding of an enrolled speaker."""
+        row = self._rows.get(speaker_id)
+        return None if row is None else self._matrix[row].copy()
+
+    def search(self, query: np.ndarray, k: int = 1, n_probe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Most similar speakers to one embedding.
+
+        Args:
+            query: Embedding (any norm)
+            k: Number of matches returned
+            n_probe: Clusters searched when an IVF index is built (None: exact search)
+
+        Returns:
+            (speaker_id, cosine similarity) pairs, best first
+        """
+        return self.search_batch(np.asarray(query, dtype=np.float32)[None, :], k, n_probe)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 1, n_probe: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        """``search`` for a (n_queries, dim) matrix of embeddings in one product."""
+        started = time.perf_counter()
+        queries = _normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        with self._lock:
+            count = len(self._ids)
+            if count == 0:
+                return [[] for _ in queries]
+            matrix = self._matrix[:count]
+
+            if n_probe is not None and self._centroids is not None:
+                results = [self._search_ivf(query, matrix, k, n_probe) for query in queries]
+            else:
+                scores = queries @ matrix.T
+                results = [self._top_k(row_scores, np.arange(count), k) for row_scores in scores]
+
+        self._searches += len(queries)
+        self._search_seconds += time.perf_counter() - started
+        return results
+
+    def _search_ivf(self, query: np.ndarray, matrix: np.ndarray, k: int, n_probe: int) -> List[Tuple[str, float]]:
+        probes = np.argpartition(-(self._centroids @ query), min(n_probe, len(self._centroids)) - 1)[:n_probe]
+        candidates = np.flatnonzero(np.isin(self._assignment[:len(matrix)], probes))
+        return self._top_k(matrix[candidates] @ query, candidates, k)
+
+    def _top_k(self, scores: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [(self._ids[rows[i]], float(scores[i])) for i in best]
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Cluster the gallery for approximate search (``search(..., n_probe=...)``).
+
+        Args:
+            n_lists: Number of clusters (default: about sqrt of the gallery size)
+            iterations: Spherical k-means iterations
+            seed: Random seed for the initial centroids
+        """
+        with self._lock:
+            count = len(self._ids)
+            if count == 0:
+                return
+            n_lists = min(n_lists or max(1, int(np.sqrt(count))), count)
+            matrix = self._matrix[:count]
+
+            rng = np.random.default_rng(seed)
+            centroids = matrix[rng.choice(count, n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(matrix @ centroids.T, axis=1)
+                members = np.zeros((count, n_lists), dtype=np.float32)
+                members[np.arange(count), assignment] = 1.0
+                sums = members.T @ matrix
+                empty = ~sums.any(axis=1)
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+
+            self._centroids = centroids
+            self._make_writable(count)
+            self._assignment[:count] = np.argmax(matrix @ centroids.T, axis=1)
+            self._ivf_size = count
+
+    def _make_writable(self, rows: int):
+        """Grow the matrix to hold ``rows``; a memory-mapped matrix is copied on first write."""
+        capacity = len(self._matrix)
+        if not self._mapped and rows <= capacity:
+            return
+        while capacity < rows:
+            capacity = max(2 * capacity, 1)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        assignment = np.zeros(capacity, dtype=np.int32)
+        assignment[:len(self._ids)] = self._assignment[:len(self._ids)]
+        self._matrix, self._assignment, self._mapped = matrix, assignment, False
+
+    def save(self, directory: str, metadata: Optional[Dict] = None):
+        """Write the gallery so other processes can memory-map it.
+
+        The matrix (and the IVF index, if built) goes to new files and the
+        manifest naming them is replaced atomically, so readers never see a
+        half-written gallery.
+
+        Args:
+            directory: Gallery directory
+            metadata: JSON-serializable data stored alongside (see ``load``)
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            version = uuid.uuid4().hex
+            matrix_file = f"embeddings-{version}.npy"
+            np.save(os.path.join(directory, matrix_file), self._matrix[:len(self._ids)])
+            ivf_file = None
+            if self._centroids is not None:
+                ivf_file = f"ivf-{version}.npz"
+                np.savez(
+                    os.path.join(directory, ivf_file),
+                    centroids=self._centroids,
+                    assignment=self._assignment[:len(self._ids)]
+                )
+
+            manifest = {
+                "version": version,
+                "dim": self.dim,
+                "matrix": matrix_file,
+                "ivf": ivf_file,
+                "ivf_size": self._ivf_size,
+                "speakers": self._ids,
+                "metadata": metadata or {}
+            }
+            temporary = os.path.join(directory, MANIFEST + ".tmp")
+            with open(temporary, "w") as f:
+                json.dump(manifest, f)
+            os.replace(temporary, os.path.join(directory, MANIFEST))
+            self._version = version
+            self._manifest_mtime = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+
+        # Processes still mapping an older matrix keep it until they reload
+        for name in os.listdir(directory):
+            if name.startswith(("embeddings-", "ivf-")) and name not in (matrix_file, ivf_file):
+                os.remove(os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Tuple["SpeakerIndex", Dict]:
+        """Open a saved gallery; with ``mmap`` the matrix pages are shared between processes.
+
+        Returns:
+            The index and the metadata saved with it
+        """
+        path = os.path.join(directory, MANIFEST)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path) as f:
+            manifest = json.load(f)
+        matrix = np.load(os.path.join(directory, manifest["matrix"]), mmap_mode="r" if mmap else None)
+
+        index = cls(manifest["dim"], capacity=0)
+        index._matrix = matrix if mmap else np.array(matrix)
+        index._mapped = mmap
+        index._ids = list(manifest["speakers"])
+        index._rows = {speaker_id: row for row, speaker_id in enumerate(index._ids)}
+        index._assignment = np.zeros(len(index._ids), dtype=np.int32)
+        if manifest.get("ivf"):
+            with np.load(os.path.join(directory, manifest["ivf"])) as ivf:
+                index._centroids = ivf["centroids"]
+                index._assignment = ivf["assignment"].astype(np.int32)
+            index._ivf_size = manifest.get("ivf_size", len(index._ids))
+        index._version = manifest["version"]
+        index._manifest_mtime = mtime
+        return index, manifest.get("metadata", {})
+
+    def is_stale(self, directory: str) -> bool:
+        """Whether the saved gallery changed since this index was loaded or saved.
+
+        Only the manifest's modification time is checked unless it changed,
+        so this is cheap enough to call before every search.
+        """
+        path = os.path.join(directory, MANIFEST)
+        try:
+            if os.stat(path).st_mtime_ns == self._manifest_mtime:
+                return False
+            with open(path) as f:
+                return json.load(f)["version"] != self._version
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {
+            "speakers": len(self._ids),
+            "dim": self.dim,
+            "bytes": len(self._ids) * self.dim * 4,
+            "memory_mapped": self._mapped,
+            "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+            "searches": self._searches,
+            "avg_search_ms": round(1000 * self._search_seconds / self._searches, 3) if self._searches else 0.0
+        }
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,248 @@
+import numpy as np
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AudioRingBuffer:
+    def __init__(self, capacity_seconds: float = 30.0, sample_rate: int = 16000):
+        """Fixed-capacity float32 ring buffer holding the most recent audio of a session.
+
+        Positions are absolute sample offsets since the start of the stream, so
+        callers can keep referring to the same audio after the buffer wraps.
+
+        Args:
+            capacity_seconds: Amount of audio retained before the oldest samples are overwritten
+            sample_rate: Sample rate of the buffered audio
+        """
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+        self._total = 0
+        self._discarded = 0
+
+    @property
+    def end(self) -> int:
+        """Absolute offset one past the newest sample."""
+        return self._total
+
+    @property
+    def start(self) -> int:
+        """Absolute offset of the oldest sample still available."""
+        return max(self._discarded, self._total - self.capacity)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def write(self, samples: np.ndarray):
+        """Append samples, overwriting the oldest audio once the buffer is full."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(samples) > self.capacity:
+            # Only the newest samples can be retained
+            self._total += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+
+        pos = self._total % self.capacity
+        first = min(len(samples), self.capacity - pos)
+        self._buffer[pos:pos + first] = samples[:first]
+        self._buffer[:len(samples) - first] = samples[first:]
+        self._total += len(samples)
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Return a contiguous copy of the audio between two absolute offsets."""
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+
+        lo = start % self.capacity
+        hi = lo + (end - start)
+        if hi <= self.capacity:
+            return self._buffer[lo:hi].copy()
+        return np.concatenate((self._buffer[lo:], self._buffer[:hi - self.capacity]))
+
+    def view(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Like ``read`` but without copying unless the range wraps; valid until the next ``write``."""
+        start = self.start if start is None else max(start, self.start)
+        end = self.end if end is None else min(end, self.end)
+        lo = start % self.capacity
+        if end > start and lo + (end - start) <= self.capacity:
+            return self._buffer[lo:lo + (end - start)]
+        return self.read(start, end)
+
+    def discard_until(self, offset: int):
+        """Drop all audio before the given absolute offset."""
+        self._discarded = min(max(self._discarded, offset), self._total)
+
+    def clear(self):
+        """Drop all buffered audio while keeping the absolute position."""
+        self._discarded = self._total
+
+
+class StreamingTranscriber:
+    def __init__(
+        self,
+        speech_processor,
+        sample_rate: int = 16000,
+        step_seconds: float = 0.5,
+        max_window_seconds: float = 15.0,
+        buffer_seconds: float = 30.0,
+        prompt_chars: int = 200
+    ):
+        """Incremental transcription of one session's audio stream.
+
+        Only the uncommitted tail of the utterance is decoded on every step. Words
+        that two consecutive hypotheses agree on are committed and their audio is
+        dropped from the window, so each decode covers at most
+        ``max_window_seconds`` no matter how long the utterance runs.
+
+        Args:
+            speech_processor: Object exposing ``transcribe_window(audio, prompt)``
+            sample_rate: Sample rate of the incoming audio
+            step_seconds: Minimum amount of new audio between two decodes
+            max_window_seconds: Longest uncommitted window before words are force-committed
+            buffer_seconds: Capacity of the rolling audio buffer
+            prompt_chars: Characters of committed text passed as decoding context
+        """
+        self.speech_processor = speech_processor
+        self.sample_rate = sample_rate
+        self.step_samples = int(step_seconds * sample_rate)
+        self.max_window_samples = int(max_window_seconds * sample_rate)
+        self.prompt_chars = prompt_chars
+        self.buffer = AudioRingBuffer(buffer_seconds, sample_rate)
+
+        self.committed: List[str] = []
+        self._previous: List[Dict] = []
+        self._window_start = 0
+        self._last_decode = 0
+
+    @property
+    def committed_text(self) -> str:
+        return " ".join(self.committed)
+
+    @property
+    def active(self) -> bool:
+        """Whether audio of an unfinished utterance has been fed."""
+        return bool(self.committed) or self.buffer.end > self._window_start
+
+    async def feed(self, audio_data: np.ndarray) -> List[Dict]:
+        """Add audio to the stream and return any transcript events it produced.
+
+        Args:
+            audio_data: New audio samples as float32 numpy array
+
+        Returns:
+            List of partial transcript events (empty until enough audio arrived)
+        """
+        self.buffer.write(audio_data)
+        if self.buffer.end - self._last_decode < self.step_samples:
+            return []
+
+        words = await self._decode()
+        if words is None:
+            return []
+
+        agreed = self._agreed_prefix(self._previous, words)
+        self._previous = words
+        self._commit(agreed)
+        self._enforce_window()
+
+        return [self._event("partial")]
+
+    async def finish(self) -> Dict:
+        """Decode the remaining audio and close the current utterance.
+
+        Returns:
+            Final transcript event for the utterance
+        """
+        if self.buffer.end > self._window_start:
+            words = await self._decode()
+            if words is not None:
+                self._previous = words
+        self._commit(self._previous)
+
+        event = self._event("final")
+        self.reset()
+        return event
+
+    def reset(self):
+        """Forget the current utterance and start a new one."""
+        self.committed = []
+        self._previous = []
+        self.buffer.clear()
+        self._window_start = self.buffer.end
+        self._last_decode = self.buffer.end
+
+    async def _decode(self) -> Optional[List[Dict]]:
+        self._last_decode = self.buffer.end
+        audio = self.buffer.read(self._window_start)
+        if len(audio) == 0:
+            return []
+
+        prompt = self.committed_text[-self.prompt_chars:] or None
+        result = await self.speech_processor.transcribe_window(audio, prompt)
+        if not result["success"]:
+            logger.error(f"Streaming decode failed: {result.get('error')}")
+            return None
+
+        # Express word timings as absolute sample offsets
+        for word in result["words"]:
+            word["start"] = self._window_start + int(word["start"] * self.sample_rate)
+            word["end"] = self._window_start + int(word["end"] * self.sample_rate)
+        return result["words"]
+
+    @staticmethod
+    def _agreed_prefix(previous: List[Dict], current: List[Dict]) -> List[Dict]:
+        """Longest run of leading words both hypotheses agree on."""
+        agreed = []
+        for old, new in zip(previous, current):
+            if _normalize_word(old["word"]) != _normalize_word(new["word"]):
+                break
+            agreed.append(new)
+        return agreed
+
+    def _commit(self, words: List[Dict]):
+        if not words:
+            return
+
+        self.committed.extend(word["word"].strip() for word in words)
+        self._window_start = max(self._window_start, words[-1]["end"])
+        self.buffer.discard_until(self._window_start)
+
+        self._previous = [word for word in self._previous if word["start"] >= self._window_start]
+
+    def _enforce_window(self):
+        """Force-commit words when the uncommitted window grows past its limit."""
+        overflow = self.buffer.end - self._window_start - self.max_window_samples
+        if overflow <= 0:
+            return
+
+        cutoff = self._window_start + overflow
+        forced = [word for word in self._previous if word["end"] <= cutoff]
+        if forced:
+            self._commit(forced)
+
+        if self.buffer.end - self._window_start > self.max_window_samples:
+            # No word boundary available; drop the oldest audio to bound the cost
+            self._window_start = self.buffer.end - self.max_window_samples
+            self.buffer.discard_until(self._window_start)
+            self._previous = [word for word in self._previous if word["start"] >= self._window_start]
+
+    def _event(self, event_type: str) -> Dict:
+        pending = " ".join(word["word"].strip() for word in self._previous)
+        text = " ".join(part for part in (self.committed_text, pending) if part)
+        if event_type == "final":
+            text = self.committed_text
+            pending = ""
+
+        return {
+            "type": event_type,
+            "transcript": text,
+            "committed": self.committed_text,
+            "pending": pending,
+            "success": True
+        }
+
+
+def _normalize_word(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:\"'")
@@ -1,68 +1,121 @@
+from __future__ import annotations
+
 import numpy as np
 import webrtcvad
-import torch
-from transformers import pipeline
+import functools
 import logging
-from ..config.settings import get_settings
+from config.settings import get_settings
+from ..inference.executor import get_pool
+from ..inference.loaders import load_audio_classifier
+from ..inference.registry import get_registry
+from .frontend import prepare_audio
+from .gating import EnergyGate
+from .segmentation import SpeechSegmenter, to_int16
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 class VoiceDetector:
     def __init__(self):
-        """Initialize voice activity and wake word detection."""
+        """Initialize voice activity and wake word detection.
+
+        Only webrtcvad is set up here. The wake word model is acquired on
+        the first ``detect_wake_word`` call, so a detector used just for
+        segmentation never loads it (nor has warm-up load it).
+        """
         self.vad = webrtcvad.Vad(3)  # Aggressiveness level 3 (highest)
-        
-        if settings.WAKE_WORD_ENABLED:
-            # Initialize wake word detection model
-            try:
-                self.wake_word_detector = pipeline(
-                    "audio-classification",
-                    model="microsoft/wav2vec2-base-960h"
-                )
-                logger.info("Wake word detection initialized")
-            except Exception as e:
-                logger.error(f"Failed to initialize wake word detection: {e}")
-                self.wake_word_detector = None
-
-    def detect_voice_activity(self, audio_frame: bytes) -> bool:
+        self.gate_stats = {"frames": 0, "rejected": 0}
+        self.wake_word_detector = None
+
+    def detect_voice_activity(self, audio_frame) -> bool:
         """Detect if there is voice activity in the audio frame.
         
+        The audio is sliced into VAD_SAMPLE_DURATION frames; the chunk counts as
+        speech when more than VAD_THRESHOLD of its frames are voiced.
+        
         Args:
-            audio_frame: Raw audio frame bytes
+            audio_frame: float32 audio as numpy array or raw bytes
         
         Returns:
             True if voice activity detected, False otherwise
         """
         try:
-            return self.vad.is_speech(audio_frame, settings.SAMPLE_RATE)
+            if isinstance(audio_frame, (bytes, bytearray, memoryview)):
+                audio_frame = np.frombuffer(audio_frame, dtype=np.float32)
+
+            frame_samples = int(settings.SAMPLE_RATE * settings.VAD_SAMPLE_DURATION)
+            samples = to_int16(audio_frame)
+            frames = samples[:len(samples) - len(samples) % frame_samples].reshape(-1, frame_samples)
+            if len(frames) == 0:
+                return False
+
+            voiced = sum(self.vad.is_speech(frame.tobytes(), settings.SAMPLE_RATE) for frame in frames)
+            return voiced / len(frames) > settings.VAD_THRESHOLD
         except Exception as e:
             logger.error(f"Error detecting voice activity: {e}")
             return False
 
-    async def detect_wake_word(self, audio_data: np.ndarray) -> bool:
+    def create_segmenter(self) -> SpeechSegmenter:
+        """Create a streaming utterance segmenter for one session."""
+        return SpeechSegmenter(
+            self.vad.is_speech,
+            sample_rate=settings.SAMPLE_RATE,
+            frame_duration=settings.VAD_SAMPLE_DURATION,
+            padding_duration=settings.VAD_PADDING_DURATION,
+            trigger_ratio=settings.VAD_TRIGGER_RATIO,
+            max_segment_duration=settings.VAD_MAX_SEGMENT_DURATION,
+            gate=self.create_gate() if settings.PRE_VAD_ENABLED else None
+        )
+
+    def create_gate(self) -> EnergyGate:
+        """Create a per-session energy gate with its own noise floor."""
+        gate = EnergyGate(
+            sample_rate=settings.SAMPLE_RATE,
+            frame_duration=settings.VAD_SAMPLE_DURATION,
+            margin_db=settings.PRE_VAD_MARGIN_DB,
+            max_zero_crossing_rate=settings.PRE_VAD_MAX_ZCR,
+            shared_stats=self.gate_stats
+        )
+        return gate
+
+    def get_gate_metrics(self) -> dict:
+        """Report frames seen and rejected by all energy gates of this detector."""
+        frames, rejected = self.gate_stats["frames"], self.gate_stats["rejected"]
+        return {
+            "frames": frames,
+            "rejected": rejected,
+            "rejection_rate": rejected / frames if frames else 0.0
+        }
+
+    async def detect_wake_word(self, audio_data, sample_rate: int = 16000) -> bool:
         """Detect wake word in audio data.
         
         Args:
-            audio_data: Audio data as numpy array
+            audio_data: AudioChunk from the shared front-end, or audio as numpy array
+                (the speech events of the session's segmenter, whose energy gate
+                already kept silent frames away)
+            sample_rate: Sample rate of a numpy array (resampled to 16 kHz)
         
         Returns:
             True if wake word detected, False otherwise
         """
-        if not settings.WAKE_WORD_ENABLED or not self.wake_word_detector:
+        if not settings.WAKE_WORD_ENABLED:
             return True
 
-        try:
-            # Convert audio data to proper format
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
+        if self.wake_word_detector is None:
+            # Acquired on the event loop, so concurrent first calls share one reference;
+            # the weights themselves load on the pool
+            self.wake_word_detector = get_registry().acquire(
+                "audio-classification:microsoft/wav2vec2-base-960h",
+                functools.partial(load_audio_classifier, "microsoft/wav2vec2-base-960h")
+            )
+            logger.info("Wake word detection initialized")
 
-            # Normalize audio
-            if np.abs(audio_data).max() > 1.0:
-                audio_data = audio_data / np.abs(audio_data).max()
+        audio = prepare_audio(audio_data, sample_rate).samples
 
+        try:
             # Run wake word detection
-            result = self.wake_word_detector(audio_data)
+            result = await get_pool("voice_features").run(self._classify, audio)
             
             # Check if any of the predictions match our wake word
             for pred in result:
@@ -76,6 +129,10 @@ class VoiceDetector:
             logger.error(f"Error detecting wake word: {e}")
             return False
 
+    def _classify(self, audio: np.ndarray):
+        # Runs on the pool, so a first (lazy) model load never blocks the event loop
+        return self.wake_word_detector.get()(audio)
+
     def preprocess_audio(self, audio_data: bytes) -> np.ndarray:
         """Preprocess audio data for voice detection.
         
@@ -86,13 +143,14 @@ class VoiceDetector:
             Preprocessed audio data as numpy array
         """
         try:
-            # Convert bytes to numpy array
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-            # Convert to float32 and normalize
-            audio_float = audio_array.astype(np.float32) / 32768.0
-            
-            return audio_float
+            # int16 PCM scaled to float32 in one pass
+            return prepare_audio(np.frombuffer(audio_data, dtype=np.int16)).samples
         except Exception as e:
             logger.error(f"Error preprocessing audio: {e}")
             return np.array([])
+
+    def cleanup(self):
+        """Release the shared wake word model."""
+        if self.wake_word_detector is not None:
+            self.wake_word_detector.release()
+            self.wake_word_detector = None
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
+from typing import Optional
 from pathlib import Path
 
 class Settings(BaseSettings):
@@ -15,6 +16,86 @@ class Settings(BaseSettings):
     SAMPLE_RATE: int = 16000
     CHUNK_SIZE: int = 1024
     
+    # Streaming Transcription
+    STREAMING_TRANSCRIPTION: bool = True
+    STREAM_STEP_SECONDS: float = 0.5
+    STREAM_MAX_WINDOW_SECONDS: float = 15.0
+    STREAM_BUFFER_SECONDS: float = 30.0
+    
+    # Response Pipeline (overlapped ASR -> LLM -> sentence chunks for TTS)
+    PIPELINE_ENABLED: bool = True
+    PIPELINE_QUEUE_SIZE: int = 8
+    SPECULATIVE_PREFILL: bool = True  # Prefill the LLM on stable partial transcripts
+    SENTENCE_MIN_CHARS: int = 20
+    SENTENCE_MAX_CHARS: int = 200
+    
+    # Groq Upstream (pooled connections, concurrency limit, retries, hedging)
+    GROQ_BASE_URL: Optional[str] = None  # e.g. a local OpenAI-compatible server
+    GROQ_MAX_CONNECTIONS: int = 32
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0
+    GROQ_CONNECT_TIMEOUT: float = 2.0
+    GROQ_TIMEOUT: float = 10.0  # Deadline for the first chunk, retries included
+    GROQ_MAX_CONCURRENCY: int = 16
+    GROQ_MAX_RETRIES: int = 2
+    GROQ_HEDGE: bool = False  # Duplicate requests slower than the recent p95
+    GROQ_HEDGE_QUANTILE: float = 0.95
+    GROQ_HEDGE_MIN_DELAY: float = 0.05
+    
+    # Whisper Batching
+    WHISPER_MAX_BATCH_SIZE: int = 8
+    WHISPER_MAX_BATCH_WAIT_MS: float = 20.0
+    
+    # Inference Executors
+    WHISPER_WORKERS: int = 1
+    VOICE_FEATURE_WORKERS: int = 1
+    INFERENCE_QUEUE_SIZE: int = 32
+    INFERENCE_QUEUE_TIMEOUT: float = 0.5
+    
+    # Per-Utterance Feature Cache (log-mel, MFCC, encoder hidden states)
+    FEATURE_CACHE_MB: float = 256
+    
+    # Speaker Enrollment (gallery shared by workers through memory-mapped files)
+    SPEAKER_ENROLLMENT_ENABLED: bool = False
+    SPEAKER_STORE_PATH: str = "data/speakers"
+    SPEAKER_SEARCH_PROBES: Optional[int] = None  # IVF clusters searched (None: exact search)
+    
+    # Model Registry
+    MODEL_WARMUP: bool = True  # Load models at startup instead of on first use
+    MODEL_PRELOAD: bool = False  # Load at import so a pre-forking server shares the weights
+    WHISPER_QUANTIZATION: str = "none"  # "none" or "int8" (dynamic, CPU only)
+    LLM_QUANTIZATION: str = "none"  # "none" or "int8" (dynamic, CPU only)
+    
+    # LLM Continuous Batching
+    LLM_MAX_BATCH_SIZE: int = 8
+    LLM_MAX_NEW_TOKENS: int = 256  # Default response cap; admission reserves KV space for it
+    LLM_KV_CACHE_BUDGET_MB: Optional[float] = None  # None: room for a full batch
+    LLM_SESSION_CACHE_MB: float = 1024
+    LLM_SESSION_CACHE_TTL: float = 600.0
+    LLM_SESSION_CACHE_MAX_SESSIONS: int = 256
+    
+    # LLM Routing (local model and Groq, by latency and health)
+    LLM_ROUTER_ENABLED: bool = False
+    LLM_ROUTER_REMOTE_MAX_IN_FLIGHT: int = 16  # Groq requests outstanding before shedding to local
+    LLM_ROUTER_WINDOW: int = 100
+    LLM_ROUTER_MAX_ERROR_RATE: float = 0.5
+    LLM_ROUTER_COOLDOWN: float = 30.0
+    
+    # Response Cache (repeated queries answered without the LLM)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL: float = 3600.0
+    RESPONSE_CACHE_EMBEDDING_MODEL: Optional[str] = None  # e.g. "sentence-transformers/all-MiniLM-L6-v2"
+    RESPONSE_CACHE_SIMILARITY: float = 0.92
+    
+    # Conversation History
+    CONVERSATION_MAX_TOKENS: int = 1024
+    CONVERSATION_TRIM_TO: float = 0.5  # Fraction of the budget a trimmed history keeps
+    CONVERSATION_TTL: float = 3600.0
+    CONVERSATION_MAX_SESSIONS: int = 10000
+    CONVERSATION_MAX_TOTAL_TOKENS: int = 5_000_000
+    CONVERSATION_DB_PATH: Optional[str] = None
+    
     # WebSocket Settings
     WS_HEARTBEAT_INTERVAL: int = 30
     
@@ -30,6 +111,14 @@ class Settings(BaseSettings):
     VAD_ENABLED: bool = True
     VAD_THRESHOLD: float = 0.5
     VAD_SAMPLE_DURATION: float = 0.03
+    VAD_PADDING_DURATION: float = 0.3
+    VAD_TRIGGER_RATIO: float = 0.9
+    VAD_MAX_SEGMENT_DURATION: float = 30.0
+    
+    # Energy Pre-VAD Gate
+    PRE_VAD_ENABLED: bool = True
+    PRE_VAD_MARGIN_DB: float = 9.0
+    PRE_VAD_MAX_ZCR: float = 0.35
     
     # Wake Word Detection
     WAKE_WORD_ENABLED: bool = True
@@ -0,0 +1,18 @@
+import pytest
+
+@pytest.fixture
+def tiny_model():
+    """Randomly initialized two-layer Llama, small enough to decode on CPU."""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=100,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256
+    )
+    return transformers.LlamaForCausalLM(config).eval()
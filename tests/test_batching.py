@@ -0,0 +1,97 @@
+import asyncio
+import numpy as np
+import pytest
+from backend.speech.batching import MicroBatchScheduler
+from backend.speech.frontend import prepare_audio
+
+def test_scheduler_batches_concurrent_requests_and_routes_results():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        scheduler = MicroBatchScheduler(double, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(scheduler.submit(i) for i in range(6)))
+        metrics = scheduler.get_metrics()
+        await scheduler.close()
+        return results, metrics
+
+    results, metrics = asyncio.run(run())
+
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert [len(batch) for batch in calls] == [4, 2]
+    assert metrics["batches"] == 2
+    assert metrics["requests"] == 6
+    assert metrics["batch_occupancy"] == 0.75
+
+def test_scheduler_propagates_batch_errors_to_every_caller():
+    def fail(items):
+        raise RuntimeError("decode failed")
+
+    async def run():
+        scheduler = MicroBatchScheduler(fail, max_batch_size=2, max_wait_ms=10)
+        results = await asyncio.gather(
+            scheduler.submit(1), scheduler.submit(2), return_exceptions=True
+        )
+        await scheduler.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_scheduler_fails_requests_the_batch_function_dropped():
+    async def run():
+        scheduler = MicroBatchScheduler(lambda items: items[:1], max_batch_size=3, max_wait_ms=10)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(scheduler.submit(i) for i in range(3)), return_exceptions=True), 1.0
+        )
+        await scheduler.close()
+        return results
+
+    first, *dropped = asyncio.run(run())
+    assert first == 0
+    assert all(isinstance(result, RuntimeError) for result in dropped)
+
+def test_restarted_scheduler_keeps_queued_requests():
+    async def run():
+        scheduler = MicroBatchScheduler(lambda items: [item + 1 for item in items], max_batch_size=2, max_wait_ms=10)
+        scheduler._ensure_started()
+        scheduler._worker.cancel()
+        # Queued while the worker is gone; the restarted worker must still serve it
+        loop = asyncio.get_running_loop()
+        waiting = loop.create_future()
+        scheduler._queue.put_nowait((1, waiting, 0.0))
+        await asyncio.sleep(0)
+        result = await asyncio.wait_for(asyncio.gather(scheduler.submit(2), waiting), 1.0)
+        await scheduler.close()
+        return result
+
+    assert asyncio.run(run()) == [3, 2]
+
+def test_batched_whisper_decoding_matches_unbatched_for_short_clips(monkeypatch):
+    torch = pytest.importorskip("torch")
+    whisper = pytest.importorskip("whisper")
+    from backend.speech.processor import SpeechProcessor
+
+    # A randomly initialized tiny Whisper; only agreement between the two paths matters
+    torch.manual_seed(0)
+    dims = whisper.model.ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=16, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=16, n_text_state=16, n_text_head=2, n_text_layer=1
+    )
+    model = whisper.model.Whisper(dims).eval()
+    monkeypatch.setattr(whisper, "load_model", lambda name: model)
+    processor = SpeechProcessor("random-tiny", device="cpu")
+
+    rng = np.random.default_rng(0)
+    clips = [rng.standard_normal(seconds * 16000).astype(np.float32) * 0.1 for seconds in (1, 3)]
+    batched = processor._decode_batch([prepare_audio(clip) for clip in clips])
+
+    options = whisper.DecodingOptions(language="en", task="transcribe", fp16=False, without_timestamps=True)
+    for clip, result in zip(clips, batched):
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(prepare_audio(clip).samples.copy()))
+        with torch.no_grad():
+            assert result.tokens == whisper.decode(model, mel, options).tokens
+    processor.cleanup()
@@ -0,0 +1,67 @@
+import asyncio
+from backend.api.conversations import ConversationStore, SQLiteConversationBackend
+
+def tokenize(text):
+    return [len(word) for word in text.split()]
+
+def test_history_is_trimmed_by_whole_exchanges():
+    store = ConversationStore(tokenize, max_tokens_per_session=6)
+    asyncio.run(store.add_turn("a", "one two", "three four"))
+    asyncio.run(store.add_turn("a", "five six", "seven"))
+
+    assert asyncio.run(store.get("a")) == [
+        {"role": "user", "content": "five six"},
+        {"role": "assistant", "content": "seven"}
+    ]
+    assert store.get_metrics()["tokens"] == 3
+
+def test_least_recently_used_sessions_are_evicted_over_global_cap():
+    store = ConversationStore(tokenize, max_total_tokens=4)
+    asyncio.run(store.add_turn("a", "x y", "z"))
+    asyncio.run(store.add_turn("b", "x y", "z"))
+
+    assert asyncio.run(store.get("a")) == []
+    assert store.get_metrics() == {"sessions": 1, "tokens": 3, "evictions": 1}
+
+def test_sessions_survive_restart_with_sqlite_backend(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    store = ConversationStore(tokenize, backend=SQLiteConversationBackend(path))
+    asyncio.run(store.add_turn("a", "hello there", "hi"))
+    store.close()
+
+    restored = ConversationStore(tokenize, backend=SQLiteConversationBackend(path))
+    assert asyncio.run(restored.get("a")) == [
+        {"role": "user", "content": "hello there"},
+        {"role": "assistant", "content": "hi"}
+    ]
+    assert restored.get_metrics()["tokens"] == 3
+    restored.close()
+
+def test_reloaded_sessions_count_against_the_global_cap(tmp_path):
+    backend = SQLiteConversationBackend(str(tmp_path / "conversations.db"))
+    store = ConversationStore(tokenize, max_total_tokens=4, backend=backend)
+    asyncio.run(store.add_turn("a", "x y", "z"))
+    asyncio.run(store.add_turn("b", "x y", "z"))
+
+    # "a" comes back from disk and pushes "b" out of memory
+    assert asyncio.run(store.get("a")) == [{"role": "user", "content": "x y"}, {"role": "assistant", "content": "z"}]
+    assert store.get_metrics()["tokens"] == 3 and store.get_metrics()["sessions"] == 1
+    store.close()
+
+def test_concurrent_reloads_count_a_session_once(tmp_path):
+    async def count(text):
+        await asyncio.sleep(0)
+        return tokenize(text)
+
+    async def run():
+        backend = SQLiteConversationBackend(str(tmp_path / "conversations.db"))
+        await ConversationStore(count, backend=backend).add_turn("a", "x y", "z")
+        # A fresh store reloads "a" from disk for both lookups at once
+        store = ConversationStore(count, backend=backend)
+        histories = await asyncio.gather(store.get("a"), store.get("a"))
+        store.close()
+        return histories, store.get_metrics()
+
+    histories, metrics = asyncio.run(run())
+    assert histories[0] == histories[1] == [{"role": "user", "content": "x y"}, {"role": "assistant", "content": "z"}]
+    assert metrics["tokens"] == 3 and metrics["sessions"] == 1
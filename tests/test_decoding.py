@@ -0,0 +1,114 @@
+import struct
+import sys
+import types
+import numpy as np
+import pytest
+from backend.speech.decoding import (
+    OggOpusDemuxer,
+    StreamingAudioDecoder,
+    WebMOpusDemuxer,
+    get_decoder_metrics
+)
+
+def ogg_page(packets, sequence=0, continues=False):
+    """Build a page; with ``continues`` the last packet carries on into the next page."""
+    lacing, body = [], b""
+    for packet in packets:
+        lacing += [255] * (len(packet) // 255) + [len(packet) % 255]
+        body += packet
+    if continues:
+        lacing.pop()
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, 0, 0, 1, sequence, 0, len(lacing))
+    return header + bytes(lacing) + body
+
+def opus_head(channels=1):
+    return b"OpusHead" + bytes([1, channels]) + struct.pack("<HIhB", 312, 48000, 0, 0)
+
+def element(element_id: bytes, body: bytes) -> bytes:
+    return element_id + b"\x01" + len(body).to_bytes(7, "big") + body
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+def webm_stream(frames):
+    tracks = element(b"\x16\x54\xae\x6b", element(b"\xae", (
+        element(b"\xd7", b"\x01") + element(b"\x86", b"A_OPUS") + element(b"\xe1", element(b"\x9f", b"\x02"))
+    )))
+    blocks = b"".join(element(b"\xa3", b"\x81\x00\x00\x80" + frame) for frame in frames)
+    cluster = b"\x1f\x43\xb6\x75" + UNKNOWN_SIZE + element(b"\xe7", b"\x00") + blocks
+    header = element(b"\x1a\x45\xdf\xa3", element(b"\x42\x82", b"webm"))
+    return header + b"\x18\x53\x80\x67" + UNKNOWN_SIZE + element(b"\x15\x49\xa9\x66", b"\x00" * 300) + tracks + cluster
+
+def feed_in_pieces(demuxer, stream: bytes, size: int):
+    packets = []
+    for offset in range(0, len(stream), size):
+        packets += demuxer.feed(stream[offset:offset + size])
+    return packets
+
+def test_ogg_demuxer_reassembles_packets_across_pages():
+    long_packet = bytes(range(256)) * 2
+    stream = (
+        ogg_page([opus_head(2)]) + ogg_page([b"OpusTags" + b"\x00" * 8], 1)
+        + ogg_page([b"first", long_packet[:255]], 2, continues=True) + ogg_page([long_packet[255:], b"last"], 3)
+    )
+    demuxer = OggOpusDemuxer()
+
+    packets = feed_in_pieces(demuxer, stream, 7)
+
+    assert demuxer.channels == 2
+    assert packets == [b"first", long_packet, b"last"]
+
+def test_ogg_demuxer_resynchronises_after_garbage():
+    demuxer = OggOpusDemuxer()
+    assert demuxer.feed(b"junk" + ogg_page([b"audio"])) == [b"audio"]
+
+def test_webm_demuxer_extracts_opus_frames_from_live_stream():
+    frames = [b"frame-%d" % i for i in range(5)]
+    demuxer = WebMOpusDemuxer()
+
+    assert feed_in_pieces(demuxer, webm_stream(frames), 11) == frames
+    assert demuxer.channels == 2
+
+@pytest.fixture
+def fake_opuslib(monkeypatch):
+    """Decoder producing one sample per packet byte, so no libopus is needed."""
+    class Decoder:
+        def __init__(self, sample_rate, channels):
+            self.channels = channels
+
+        def decode_float(self, packet, frame_size):
+            return np.full(len(packet) * self.channels, len(packet), dtype=np.float32).tobytes()
+
+    monkeypatch.setitem(sys.modules, "opuslib", types.SimpleNamespace(Decoder=Decoder))
+
+def test_decoder_writes_into_preallocated_ring_and_counts_bytes(fake_opuslib):
+    decoder = StreamingAudioDecoder("webm", sample_rate=16000, buffer_seconds=1.0)
+    buffer = decoder.ring._buffer
+    before = get_decoder_metrics()
+
+    samples = decoder.feed(webm_stream([b"\x00" * 100, b"\x00" * 60]))
+
+    # Stereo is downmixed; the result is a copy, so later feeds cannot overwrite it
+    assert len(samples) == 160 and samples[0] == 100 and samples[-1] == 60
+    assert not np.shares_memory(samples, buffer)
+    assert decoder.ring._buffer is buffer
+    assert decoder.get_metrics()["packets"] == 2
+    assert decoder.get_metrics()["bytes_out"] == 160 * 4
+
+    after = get_decoder_metrics()
+    assert after["bytes_out"] - before["bytes_out"] == 160 * 4
+    assert after["bytes_in"] > before["bytes_in"]
+
+def test_decoded_audio_survives_later_feeds_and_oversized_chunks(fake_opuslib):
+    decoder = StreamingAudioDecoder("opus", sample_rate=100, buffer_seconds=1.0)
+    first = decoder.feed(b"\x00" * 60)
+    # Wraps the 100-sample ring, then decodes more than it holds at once
+    decoder.feed(b"\x00" * 70)
+    oversized = decoder.feed(b"\x00" * 250)
+
+    assert (first == 60).all() and len(first) == 60
+    assert len(oversized) == 250 and (oversized == 250).all()
+    assert decoder.ring.capacity >= 250
+
+def test_decoder_rejects_unknown_codecs(fake_opuslib):
+    with pytest.raises(ValueError):
+        StreamingAudioDecoder("mp3")
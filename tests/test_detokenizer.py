@@ -0,0 +1,23 @@
+from backend.llm.detokenizer import IncrementalDetokenizer
+
+class ByteTokenizer:
+    """Each token id is one UTF-8 byte, like byte-fallback tokens."""
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return bytes(token_ids).decode("utf-8", errors="replace")
+
+def test_detokenizer_holds_back_partial_utf8_sequences():
+    detokenizer = IncrementalDetokenizer(ByteTokenizer())
+    deltas = [detokenizer.add(byte) for byte in "hé!".encode("utf-8")]
+
+    # "é" is two bytes; nothing is emitted until the second one arrives
+    assert deltas == ["h", "", "é", "!"]
+    assert detokenizer.text == "hé!"
+
+def test_detokenizer_flush_returns_remaining_text():
+    detokenizer = IncrementalDetokenizer(ByteTokenizer())
+    detokenizer.add(ord("a"))
+    detokenizer.add("€".encode("utf-8")[0])
+
+    assert detokenizer.flush() == "�"
+    assert detokenizer.text == "a�"
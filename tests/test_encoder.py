@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from backend.speech.encoder import hidden_states
+from backend.speech.features import get_feature_cache
+from backend.speech.frontend import prepare_audio
+
+torch = pytest.importorskip("torch")
+
+# Frames per sample of the fake encoder (wav2vec2 uses 320)
+STRIDE = 4
+
+class Inputs(dict):
+    def to(self, device):
+        return self
+
+
+class FakeClassifier:
+    """Audio-classification pipeline whose encoder emits each frame's mean sample."""
+
+    def __init__(self):
+        self.batches = []
+        self.model = self
+        self.base_model = self
+        self.device = "cpu"
+
+    def feature_extractor(self, batch, sampling_rate, padding, return_tensors):
+        width = max(len(samples) for samples in batch)
+        self.batches.append([len(samples) for samples in batch])
+        padded = np.stack([np.pad(samples, (0, width - len(samples)), constant_values=-1.0) for samples in batch])
+        return Inputs(input_values=torch.tensor(padded))
+
+    def __call__(self, input_values):
+        frames = input_values.reshape(len(input_values), -1, STRIDE).mean(dim=-1, keepdim=True)
+        return type("Outputs", (), {"last_hidden_state": frames.repeat(1, 1, 2)})
+
+    def _get_feat_extract_output_lengths(self, lengths):
+        return lengths // STRIDE
+
+
+def utterance(n_samples):
+    # Distinct content per length, so every utterance has its own cache key
+    return prepare_audio(np.full(n_samples, n_samples / 10000, dtype=np.float32))
+
+def test_misses_are_encoded_in_length_sorted_batches_without_padding():
+    get_feature_cache().clear()
+    classifier = FakeClassifier()
+    chunks = [utterance(n) for n in (4000, 400, 3600, 800, 1200)]
+
+    states = hidden_states(classifier, chunks, "hidden:fake", max_batch_size=2)
+
+    assert classifier.batches == [[400, 800], [1200, 3600], [4000]]
+    for chunk, frames in zip(chunks, states):
+        # Padded frames are trimmed off, so only the utterance's own samples remain
+        assert frames.shape == (len(chunk) // STRIDE, 2)
+        np.testing.assert_allclose(frames, len(chunk) / 10000)
+        assert not frames.flags.writeable
+
+def test_cached_utterances_skip_the_encoder():
+    get_feature_cache().clear()
+    classifier = FakeClassifier()
+    first = hidden_states(classifier, [utterance(800), utterance(1600)], "hidden:fake")
+    again = hidden_states(classifier, [utterance(1600), utterance(2400), utterance(800)], "hidden:fake")
+
+    assert classifier.batches == [[800, 1600], [2400]]
+    assert again[0] is first[1] and again[2] is first[0]
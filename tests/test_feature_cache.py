@@ -0,0 +1,109 @@
+import threading
+import time
+import numpy as np
+import pytest
+from backend.speech.features import FeatureCache, audio_key
+from backend.speech.frontend import prepare_audio
+
+def features(kb: int) -> np.ndarray:
+    return np.zeros(kb * 256, dtype=np.float32)
+
+def test_features_are_computed_once_per_utterance():
+    cache = FeatureCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return features(1)
+
+    first = cache.get_or_compute("utterance", "mfcc", compute)
+    assert cache.get_or_compute("utterance", "mfcc", compute) is first
+    assert len(calls) == 1
+    assert cache.get_metrics()["hits"] == 1 and cache.get_metrics()["misses"] == 1
+
+def test_concurrent_requests_wait_for_the_first_computation():
+    cache = FeatureCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return features(1)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("utterance", "hidden", compute)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+def test_failed_computations_are_not_cached():
+    cache = FeatureCache()
+
+    def fail():
+        raise RuntimeError("model not loaded")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("utterance", "hidden", fail)
+    assert cache.get_or_compute("utterance", "hidden", lambda: features(1)).nbytes == 1024
+
+def test_least_recently_used_utterances_are_evicted_over_budget():
+    cache = FeatureCache(max_bytes=3 * 1024)
+    for key in ("a", "b", "c"):
+        cache.get_or_compute(key, "log_mel:80", lambda: features(1))
+    # Touch "a" so "b" is the oldest
+    cache.get_or_compute("a", "log_mel:80", lambda: features(1))
+    cache.get_or_compute("d", "log_mel:80", lambda: features(1))
+
+    metrics = cache.get_metrics()
+    assert metrics["utterances"] == 3 and metrics["bytes"] == 3 * 1024 and metrics["evictions"] == 1
+    recomputed = []
+    cache.get_or_compute("b", "log_mel:80", lambda: recomputed.append(1) or features(1))
+    assert recomputed
+
+def test_chunks_of_identical_audio_share_features():
+    audio = np.sin(np.linspace(0, 100, 16000)).astype(np.float32)
+    first, second = prepare_audio(audio), prepare_audio(audio.copy())
+
+    assert first.key == second.key == audio_key(audio)
+    assert second.log_mel(80) is first.log_mel(80)
+    assert first.mfcc(13).shape == (13, 100)
+    assert prepare_audio(audio[:-1]).key != first.key
+
+def test_overlapping_batches_compute_each_feature_once():
+    cache = FeatureCache()
+    computed = []
+
+    def compute(keys):
+        def run(missing):
+            computed.extend(keys[i] for i in missing)
+            time.sleep(0.05)
+            return [features(1) for _ in missing]
+        return run
+
+    batches = [["a", "b", "c"], ["b", "c", "d"], ["c", "d", "a"]]
+    results = {}
+    threads = [
+        threading.Thread(target=lambda keys=keys: results.update(zip(keys, cache.get_or_compute_many(keys, "hidden", compute(keys)))))
+        for keys in batches
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(computed) == ["a", "b", "c", "d"]
+    assert cache.get_or_compute_many(["d", "a"], "hidden", compute(["d", "a"])) == [results["d"], results["a"]]
+
+def test_features_a_batch_failed_to_produce_are_not_left_pending():
+    cache = FeatureCache()
+    with pytest.raises(RuntimeError, match="1 features computed for 2"):
+        cache.get_or_compute_many(["a", "b"], "hidden", lambda missing: [features(1)])
+    # The produced one is kept; the other is computed by the next caller
+    assert cache.get_or_compute_many(["a", "b"], "hidden", lambda missing: [features(2) for _ in missing])[1].nbytes == 2048
@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+import pytest
+from backend.speech.framing import (
+    FORMAT_INT16,
+    FORMAT_OPUS,
+    FrameError,
+    FrameParser,
+    encode_frame,
+    pack_message,
+    send_message
+)
+
+def ramp(samples=320):
+    return np.linspace(-0.5, 0.5, samples, dtype=np.float32)
+
+def test_float32_frames_are_parsed_without_copying():
+    frame_bytes = encode_frame(ramp(), sequence=7, end_of_utterance=True)
+    frame = FrameParser().parse(frame_bytes)
+
+    assert frame.sequence == 7 and frame.end_of_utterance
+    assert np.array_equal(frame.samples, ramp())
+    # The samples are a read-only view onto the message
+    assert not frame.samples.flags.writeable
+    assert np.shares_memory(frame.samples, np.frombuffer(frame_bytes, dtype=np.uint8))
+
+def test_int16_stereo_frames_are_downmixed_and_scaled():
+    stereo = np.stack([ramp(), ramp()], axis=1)
+    pcm = np.round(stereo * 32768).astype(np.int16)
+    frame = FrameParser().parse(encode_frame(pcm, sample_format=FORMAT_INT16, channels=2))
+
+    assert frame.samples.dtype == np.float32
+    assert np.allclose(frame.samples, ramp(), atol=1e-4)
+
+def test_other_sample_rates_are_resampled_to_the_target():
+    pytest.importorskip("scipy")
+    frame = FrameParser(target_rate=16000).parse(encode_frame(ramp(960), sample_rate=48000))
+    assert len(frame.samples) == 320
+
+def test_sequence_gaps_are_counted():
+    parser = FrameParser()
+    for sequence in (0, 1, 3, 4):
+        parser.parse(encode_frame(ramp(), sequence=sequence))
+    assert parser.get_metrics() == {"frames": 4, "bytes_in": 4 * (16 + 320 * 4), "sequence_gaps": 1}
+
+@pytest.mark.parametrize("data", [b"VA", b"XX" + bytes(14), encode_frame(ramp())[:-1]])
+def test_malformed_frames_are_rejected(data):
+    with pytest.raises(FrameError):
+        FrameParser().parse(data)
+
+def test_opus_frames_decode_when_libopus_is_available():
+    try:
+        import opuslib
+    except Exception:
+        pytest.skip("opuslib or libopus not installed")
+    encoder = opuslib.Encoder(16000, 1, opuslib.APPLICATION_VOIP)
+    pcm = np.round(ramp() * 32767).astype(np.int16).tobytes()
+    packet = encoder.encode(pcm, 320)
+
+    frame = FrameParser().parse(encode_frame(packet, sample_format=FORMAT_OPUS))
+    assert frame.samples.dtype == np.float32 and len(frame.samples) == 320
+
+def test_msgpack_replies_are_sent_as_binary():
+    msgpack = pytest.importorskip("msgpack")
+
+    class FakeWebSocket:
+        def __init__(self):
+            self.sent = []
+
+        async def send_bytes(self, data):
+            self.sent.append(data)
+
+    websocket = FakeWebSocket()
+    asyncio.run(send_message(websocket, {"transcript": "hi", "score": np.float32(0.5)}, "msgpack"))
+    assert msgpack.unpackb(websocket.sent[0]) == {"transcript": "hi", "score": 0.5}
+    assert len(pack_message({"transcript": "hi"}, "msgpack")) < len(pack_message({"transcript": "hi"}))
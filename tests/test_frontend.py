@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from backend.speech.frontend import (
+    log_mel_spectrogram,
+    prepare_audio,
+    resample,
+    _mel_filters
+)
+
+def tone(seconds=1.0, rate=16000, amplitude=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+def test_float32_input_is_wrapped_read_only_without_copying():
+    audio = tone()
+    chunk = prepare_audio(audio)
+
+    assert np.shares_memory(chunk.samples, audio)
+    assert not chunk.samples.flags.writeable
+    # The caller's array stays writable
+    assert audio.flags.writeable
+    assert prepare_audio(chunk) is chunk
+
+def test_loud_audio_is_normalized_once_without_touching_the_input():
+    audio = tone(amplitude=4.0)
+    chunk = prepare_audio(audio)
+
+    assert chunk.peak == pytest.approx(4.0, rel=1e-3)
+    assert np.abs(chunk.samples).max() == pytest.approx(1.0)
+    assert np.abs(audio).max() == pytest.approx(4.0, rel=1e-3)
+
+def test_int16_and_bytes_are_converted_to_float32():
+    pcm = np.round(tone() * 32767).astype(np.int16)
+
+    assert np.allclose(prepare_audio(pcm).samples, tone(), atol=1e-4)
+    assert np.array_equal(prepare_audio(tone().tobytes()).samples, tone())
+
+def test_other_rates_are_resampled_like_resample_poly():
+    from scipy.signal import resample_poly
+
+    audio = tone(rate=44100)
+    chunk = prepare_audio(audio, sample_rate=44100)
+
+    assert len(chunk) == 16000 and chunk.duration == pytest.approx(1.0)
+    assert chunk.samples.dtype == np.float32
+    assert np.allclose(chunk.samples, resample_poly(audio, 160, 441), atol=1e-5)
+    assert len(resample(tone(rate=8000), 8000, 16000)) == 16000
+
+def test_log_mel_matches_whisper_stft_and_is_cached():
+    torch = pytest.importorskip("torch")
+    audio = tone(seconds=2.0, amplitude=0.3)
+    chunk = prepare_audio(audio)
+
+    features = chunk.log_mel(80)
+    assert features.shape == (80, 200)
+    assert chunk.log_mel(80) is features and not features.flags.writeable
+
+    # Whisper's reference computation, with the same filterbank
+    stft = torch.stft(torch.from_numpy(audio), 400, 160, window=torch.hann_window(400), return_complex=True)
+    mel = torch.from_numpy(_mel_filters(80)) @ (stft[..., :-1].abs() ** 2)
+    reference = torch.clamp(mel, min=1e-10).log10()
+    reference = (torch.maximum(reference, reference.max() - 8.0) + 4.0) / 4.0
+    assert np.allclose(features, reference.numpy(), atol=1e-4)
+
+def test_mel_filters_are_slaney_normalized_triangles():
+    filters = _mel_filters(80)
+
+    assert filters.shape == (80, 201)
+    assert (filters >= 0).all()
+    # Every filter covers at least one FFT bin
+    assert all(np.count_nonzero(row) >= 1 for row in filters)
+    assert log_mel_spectrogram(np.zeros(100, dtype=np.float32)).shape == (80, 0)
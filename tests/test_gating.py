@@ -0,0 +1,39 @@
+import numpy as np
+from backend.speech.gating import EnergyGate
+
+def frames_of(audio, frame_samples=480):
+    usable = len(audio) - len(audio) % frame_samples
+    return audio[:usable].reshape(-1, frame_samples)
+
+def test_gate_rejects_background_noise_and_passes_louder_speech():
+    rng = np.random.default_rng(0)
+    stats = {"frames": 0, "rejected": 0}
+    gate = EnergyGate(shared_stats=stats)
+
+    noise = (0.001 * rng.standard_normal(16000)).astype(np.float32)
+    assert not gate.mask(frames_of(noise)).any()
+
+    t = np.arange(16000) / 16000
+    speech = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32) + noise
+    assert gate.mask(frames_of(speech)).all()
+
+    metrics = gate.get_metrics()
+    assert metrics["frames"] == 66
+    assert metrics["rejected"] == 33
+    assert stats == {"frames": 66, "rejected": 33}
+
+def test_gate_noise_floor_is_not_seeded_from_loud_first_audio():
+    gate = EnergyGate()
+    # A session that opens with speech still passes it, and the floor barely rises
+    assert gate.mask(frames_of(np.full(4800, 0.1, dtype=np.float32))).all()
+    assert gate.noise_floor_db < -55
+    assert gate.mask(frames_of(np.full(4800, 0.1, dtype=np.float32))).all()
+
+def test_gate_noise_floor_adapts_downwards_immediately():
+    gate = EnergyGate()
+    gate.mask(frames_of(np.full(4800, 0.0001, dtype=np.float32)))
+    assert gate.noise_floor_db == -80.0
+    assert gate.mask(frames_of(np.full(4800, 0.001, dtype=np.float32))).all()
+
+def test_has_speech_on_short_chunk():
+    assert not EnergyGate().has_speech(np.zeros(100, dtype=np.float32))
@@ -0,0 +1,22 @@
+import importlib
+import pytest
+
+# Modules that read application settings; a broken import path fails here
+# rather than when a worker boots
+MODULES = [
+    "backend.app.main",
+    "backend.api.main",
+    "backend.llm.groq_client",
+    "backend.speech.advanced_features",
+    "backend.speech.voice_detection",
+]
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_imports(module):
+    try:
+        importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        # Only an optional third-party package may be missing, never one of ours
+        if e.name.split(".")[0] in ("backend", "config"):
+            raise
+        pytest.skip(f"{e.name} is not installed")
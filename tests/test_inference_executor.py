@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import pytest
+from backend.inference.executor import ExecutorSaturatedError, InferencePool
+
+def test_pool_keeps_event_loop_responsive():
+    pool = InferencePool("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        call = asyncio.ensure_future(pool.run(release.wait, 5))
+        # The loop keeps serving other coroutines while the call blocks a worker
+        await asyncio.sleep(0.01)
+        assert not call.done()
+        release.set()
+        return await call
+
+    assert asyncio.run(run()) is True
+    assert pool.get_metrics()["completed"] == 1
+    pool.shutdown()
+
+def test_pool_rejects_when_queue_is_full():
+    pool = InferencePool("test", max_workers=1, max_queue=1, queue_timeout=0.01)
+    release = threading.Event()
+
+    async def run():
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorSaturatedError):
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(run())
+    assert pool.get_metrics()["rejected"] == 1
+    pool.shutdown()
+
+def test_cancelled_call_keeps_its_slot_until_the_worker_finishes():
+    pool = InferencePool("test", max_workers=1, max_queue=0, queue_timeout=0)
+    release = threading.Event()
+
+    async def run():
+        call = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        await asyncio.sleep(0.01)
+        # The worker is still busy, so a new call must not be admitted yet
+        assert pool.get_metrics()["in_flight"] == 1
+        with pytest.raises(ExecutorSaturatedError):
+            await pool.run(release.wait, 5)
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert pool.get_metrics()["in_flight"] == 0
+        return await pool.run(lambda: "done")
+
+    assert asyncio.run(run()) == "done"
+    pool.shutdown()
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from backend.inference.lazy import lazy_import
+
+def test_lazy_module_imports_on_first_attribute_access():
+    module = lazy_import("colorsys")
+    assert module._module is None
+
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert module.is_loaded
+
+def test_model_modules_do_not_import_torch():
+    code = (
+        "import sys\n"
+        "import backend.speech.processor, backend.llm.engine, backend.inference.loaders\n"
+        "from backend.llm.engine import LLMEngine\n"
+        "LLMEngine('unused-model-path')\n"
+        "print([name for name in ('torch', 'transformers', 'whisper') if name in sys.modules])\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert output.strip() == "[]"
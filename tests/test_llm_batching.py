@@ -0,0 +1,136 @@
+import threading
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from backend.llm.batching import ContinuousBatcher, SamplingParams
+
+def greedy_reference(model, prompt, max_new_tokens):
+    ids = torch.tensor([prompt])
+    generated = []
+    with torch.no_grad():
+        for _ in range(max_new_tokens):
+            next_id = int(model(ids).logits[0, -1].argmax())
+            generated.append(next_id)
+            ids = torch.cat([ids, torch.tensor([[next_id]])], dim=1)
+    return generated
+
+def test_sequences_joining_and_leaving_match_unbatched_decoding(tiny_model):
+    batcher = ContinuousBatcher(tiny_model, eos_token_id=-1, device="cpu", max_batch_size=4)
+    requests = [([1, 2, 3], 8), ([5, 6, 7, 8, 9, 10], 3), ([11], 10), ([20, 21, 22, 23], 6)]
+    outputs = [[] for _ in requests]
+    finished = [threading.Event() for _ in requests]
+
+    def collector(index):
+        def emit(item):
+            if item is None or isinstance(item, Exception):
+                finished[index].set()
+            else:
+                outputs[index].append(item)
+        return emit
+
+    for index, (prompt, max_new_tokens) in enumerate(requests):
+        params = SamplingParams(temperature=0, max_new_tokens=max_new_tokens)
+        batcher.submit(prompt, params, collector(index), threading.Event())
+
+    for event in finished:
+        assert event.wait(30)
+    batcher.shutdown()
+
+    for (prompt, max_new_tokens), output in zip(requests, outputs):
+        assert output == greedy_reference(tiny_model, prompt, max_new_tokens)
+
+def test_requests_beyond_kv_budget_are_rejected(tiny_model):
+    batcher = ContinuousBatcher(tiny_model, eos_token_id=-1, device="cpu", kv_cache_budget_mb=0.001)
+    result = []
+    done = threading.Event()
+
+    def emit(item):
+        result.append(item)
+        done.set()
+
+    batcher.submit([1, 2, 3], SamplingParams(max_new_tokens=100), emit, threading.Event())
+    assert done.wait(10)
+    batcher.shutdown()
+    assert isinstance(result[0], MemoryError)
+
+def test_prefill_from_cached_prefix_matches_full_prefill(tiny_model):
+    batcher = ContinuousBatcher(tiny_model, eos_token_id=-1, device="cpu")
+    first_turn = []
+    done = threading.Event()
+
+    def emit(item):
+        if item is None:
+            done.set()
+        else:
+            first_turn.append(item)
+
+    prompt = [1, 2, 3, 4]
+    params = SamplingParams(temperature=0, max_new_tokens=5)
+    sequence = batcher.submit(prompt, params, emit, threading.Event(), keep_cache=True)
+    assert done.wait(30)
+    assert sequence.final_past is not None
+
+    second_prompt = prompt + first_turn + [7, 8, 9]
+    second_turn = []
+    done.clear()
+
+    def emit_second(item):
+        if item is None:
+            done.set()
+        else:
+            second_turn.append(item)
+
+    batcher.submit(second_prompt, params, emit_second, threading.Event(), prefix_past=sequence.final_past)
+    assert done.wait(30)
+    batcher.shutdown()
+
+    assert second_turn == greedy_reference(tiny_model, second_prompt, 5)
+
+def test_prefill_only_requests_return_a_cache_that_survives_divergence(tiny_model):
+    batcher = ContinuousBatcher(tiny_model, eos_token_id=-1, device="cpu")
+    items = []
+    done = threading.Event()
+
+    def emit(item):
+        items.append(item)
+        if item is None:
+            done.set()
+
+    # Speculative prompt; the final prompt shares only its first three tokens
+    sequence = batcher.submit([1, 2, 3, 4, 5], SamplingParams(max_new_tokens=0), emit, threading.Event(), keep_cache=True)
+    assert done.wait(30)
+    assert items == [None] and sequence.final_past[0][0].shape[2] == 5
+
+    prefix = tuple((key[:, :, :3], value[:, :, :3]) for key, value in sequence.final_past)
+    items.clear()
+    done.clear()
+    params = SamplingParams(temperature=0, max_new_tokens=4)
+    batcher.submit([1, 2, 3, 9, 9], params, emit, threading.Event(), prefix_past=prefix)
+    assert done.wait(30)
+    batcher.shutdown()
+
+    assert items[:-1] == greedy_reference(tiny_model, [1, 2, 3, 9, 9], 4)
+
+def test_default_budget_admits_a_full_batch(tiny_model):
+    batcher = ContinuousBatcher(tiny_model, eos_token_id=-1, device="cpu", max_batch_size=4, sequence_tokens=20)
+    outputs = [[] for _ in range(4)]
+    finished = threading.Semaphore(0)
+
+    def emitter(index):
+        def emit(item):
+            outputs[index].append(item)
+            if item is None:
+                finished.release()
+        return emit
+
+    for index in range(4):
+        batcher.submit([1, 2, 3, 4], SamplingParams(temperature=0, max_new_tokens=16), emitter(index), threading.Event())
+    for _ in range(4):
+        assert finished.acquire(timeout=30)
+    metrics = batcher.get_metrics()
+    batcher.shutdown()
+
+    assert all(len(output) == 17 for output in outputs)
+    # The four requests were decoded together, not one after another
+    assert metrics["steps"] < 2 * 16
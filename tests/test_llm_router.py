@@ -0,0 +1,93 @@
+import asyncio
+from backend.llm.router import LLMRouter
+
+class FakeBackend:
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.prefixes = {}
+
+    async def generate_response(self, prompt, context=None, stream=True, client_id=None):
+        self.calls.append((prompt, context))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            yield {"success": False, "error": f"{self.name} is down"}
+            return
+        yield {"text": f"{self.name}: {prompt}", "finished": False, "success": True}
+        yield {"text": "", "finished": True, "success": True}
+
+    async def update_prefix(self, client_id, prefix, context=None, endpoint=False):
+        self.prefixes[client_id] = prefix
+        return {}
+
+    def discard_prefix(self, client_id):
+        self.prefixes.pop(client_id, None)
+
+
+async def reply(router, prompt, context=None, client_id=None):
+    chunks = [chunk async for chunk in router.generate_response(prompt, context=context, client_id=client_id)]
+    return "".join(chunk.get("text", "") for chunk in chunks), chunks[-1]
+
+def test_routes_to_the_fastest_backend():
+    local, remote = FakeBackend("local", delay=0.03), FakeBackend("groq", delay=0.001)
+    router = LLMRouter({"local": local, "groq": remote})
+
+    async def run():
+        # Both get measured, then the faster one takes over
+        return [await reply(router, f"q{i}") for i in range(4)]
+
+    replies = asyncio.run(run())
+    assert [text for text, _ in replies] == ["local: q0", "groq: q1", "groq: q2", "groq: q3"]
+    assert replies[-1][1]["backend"] == "groq"
+    assert router.route() == ["groq", "local"]
+
+def test_fails_over_with_the_conversation_and_benches_failing_backends():
+    local, remote = FakeBackend("local"), FakeBackend("groq", fail=True)
+    router = LLMRouter({"groq": remote, "local": local}, min_samples=2, cooldown_seconds=60)
+    context = [{"role": "user", "content": "my name is Sam"}, {"role": "assistant", "content": "Hi Sam"}]
+
+    async def run():
+        return [await reply(router, "what is my name", context, "c1") for _ in range(3)]
+
+    replies = asyncio.run(run())
+    assert all(text == "local: what is my name" for text, _ in replies)
+    assert local.calls[0] == ("what is my name", context)
+    # Out of rotation after two failures; the third turn goes straight to the local model
+    assert len(remote.calls) == 2
+    metrics = router.get_metrics()
+    assert metrics["failovers"] == 2 and metrics["route"] == ["local", "groq"]
+    assert not metrics["backends"]["groq"]["healthy"]
+
+def test_reports_an_error_when_every_backend_fails():
+    router = LLMRouter({"a": FakeBackend("a", fail=True), "b": FakeBackend("b", fail=True)})
+    text, last = asyncio.run(reply(router, "hello"))
+    assert text == "" and not last["success"]
+    assert last["error"] == "a: a is down; b: b is down"
+
+def test_sheds_load_to_the_local_model_when_the_remote_queue_is_full():
+    local, remote = FakeBackend("local", delay=0.05), FakeBackend("groq", delay=0.05)
+    router = LLMRouter({"groq": remote, "local": local}, max_in_flight={"groq": 2})
+
+    async def run():
+        return await asyncio.gather(*(reply(router, f"q{i}") for i in range(5)))
+
+    backends = [last["backend"] for _, last in asyncio.run(run())]
+    assert backends.count("groq") == 2 and backends.count("local") == 3
+    assert router.get_metrics()["backends"]["groq"]["in_flight"] == 0
+
+def test_speculation_follows_the_serving_backend():
+    local, remote = FakeBackend("local"), FakeBackend("groq", fail=True)
+    router = LLMRouter({"groq": remote, "local": local}, min_samples=1)
+
+    async def run():
+        await router.update_prefix("c1", "turn on")
+        assert remote.prefixes == {"c1": "turn on"}
+        await reply(router, "turn on the light", client_id="c1")
+        # groq is benched now, so the next turn speculates locally
+        await router.update_prefix("c1", "turn off")
+        router.discard_prefix("c1")
+
+    asyncio.run(run())
+    assert remote.prefixes == {} and local.prefixes == {}
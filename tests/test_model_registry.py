@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+import pytest
+from backend.inference.registry import ModelRegistry
+
+def test_model_loads_once_and_is_shared():
+    registry = ModelRegistry()
+    loads = []
+    loader = lambda: loads.append(1) or object()
+
+    first = registry.acquire("whisper:base:cpu", loader)
+    second = registry.acquire("whisper:base:cpu", loader)
+    assert loads == []
+
+    assert first.get() is second.get()
+    assert loads == [1]
+    metrics = registry.get_metrics()["whisper:base:cpu"]
+    assert metrics["loaded"] and metrics["refs"] == 2
+    assert metrics["load_seconds"] is not None
+
+def test_concurrent_first_use_loads_once():
+    registry = ModelRegistry()
+    loads = []
+    started = threading.Event()
+
+    def slow_loader():
+        loads.append(1)
+        started.wait(0.1)
+        return object()
+
+    refs = [registry.acquire("model", slow_loader) for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda ref=ref: results.append(ref.get())) for ref in refs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == [1]
+    assert len({id(model) for model in results}) == 1
+
+def test_release_unloads_after_last_reference():
+    registry = ModelRegistry()
+    first = registry.acquire("model", object)
+    second = registry.acquire("model", object)
+    registry.warm_up()
+
+    first.release()
+    first.release()
+    assert registry.get_metrics()["model"]["refs"] == 1
+
+    second.release()
+    assert registry.get_metrics() == {}
+    with pytest.raises(RuntimeError):
+        second.get()
+
+def test_model_bytes_reported_for_torch_modules():
+    torch = pytest.importorskip("torch")
+    registry = ModelRegistry()
+    ref = registry.acquire("linear", lambda: torch.nn.Linear(4, 2))
+    ref.get()
+    assert registry.get_metrics()["linear"]["model_bytes"] == (4 * 2 + 2) * 4
+
+def test_async_first_load_does_not_block_the_event_loop():
+    registry = ModelRegistry()
+    ref = registry.acquire("model", lambda: time.sleep(0.2) or "weights")
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        model = await ref.get_async()
+        ticker.cancel()
+        return model, ticks
+
+    model, ticks = asyncio.run(run())
+    assert model == "weights" and ticks >= 5
+    assert ref.loaded
@@ -0,0 +1,195 @@
+import asyncio
+import numpy as np
+from backend.api.pipeline import PipelineMetrics, SentenceChunker, VoicePipeline
+
+def test_chunker_cuts_at_sentence_boundaries():
+    chunker = SentenceChunker(min_chars=10, max_chars=60)
+    chunks = []
+    for delta in ["Hi. Sure, the", " weather is 3.5 degrees", " today! Anything ", "else?"]:
+        chunks += chunker.feed(delta)
+
+    assert chunks == ["Hi. Sure, the weather is 3.5 degrees today!"]
+    assert chunker.flush() == "Anything else?"
+
+def test_chunker_splits_run_on_sentences_at_clause_breaks():
+    chunker = SentenceChunker(min_chars=10, max_chars=30)
+    chunks = chunker.feed("one two three, four five six seven eight nine ten")
+
+    assert chunks == ["one two three,", "four five six seven eight"]
+    assert chunker.flush() == "nine ten"
+
+class FakeSession:
+    """Transcribes every audio chunk as one word, committed on the next chunk; the LLM echoes slowly."""
+
+    def __init__(self):
+        self.words = []
+        self.updates = []
+        self.discarded = 0
+        self.log = []
+
+    async def transcribe(self, audio):
+        if audio is None:
+            # The final decode takes a while; the endpoint update overlaps it
+            await asyncio.sleep(0.02)
+            yield {"type": "final", "transcript": " ".join(self.words), "success": True}
+            self.words = []
+            return
+        self.words.append(f"w{int(audio[0])}")
+        self.log.append(f"asr {self.words[-1]}")
+        yield {
+            "type": "partial",
+            "transcript": " ".join(self.words),
+            "committed": " ".join(self.words[:-1]),
+            "success": True
+        }
+
+    async def respond(self, text):
+        for word in ["Sure.", " Here", " it", " is:", f" {text}."]:
+            await asyncio.sleep(0.01)
+            self.log.append("llm")
+            yield {"text": word, "finished": False, "success": True}
+        yield {"text": "", "finished": True, "success": True}
+
+    async def update_prefix(self, text, endpoint):
+        await asyncio.sleep(0.001)
+        self.updates.append((text, endpoint))
+
+    def discard_prefix(self):
+        self.discarded += 1
+
+async def run_session(session, metrics):
+    pipeline = VoicePipeline(
+        session.transcribe,
+        session.respond,
+        session.update_prefix,
+        session.discard_prefix,
+        queue_size=2,
+        metrics=metrics,
+        chunker_options={"min_chars": 5}
+    )
+    events = []
+
+    async def consume():
+        async for event in pipeline.events():
+            events.append(event)
+            if event.get("finished"):
+                return
+
+    consumer = asyncio.create_task(consume())
+    for i in range(3):
+        await pipeline.feed(np.full(160, i, dtype=np.float32))
+    await pipeline.end()
+    # The next utterance is transcribed while the response is generated
+    while "llm" not in session.log:
+        await asyncio.sleep(0.001)
+    await pipeline.feed(np.full(160, 7, dtype=np.float32))
+
+    await asyncio.wait_for(consumer, 5)
+    await pipeline.close()
+    return events
+
+def test_pipeline_overlaps_stages_and_chunks_the_response():
+    session = FakeSession()
+    metrics = PipelineMetrics()
+    events = asyncio.run(run_session(session, metrics))
+
+    # Committed prefixes are prefilled, then the full hypothesis once speech ends
+    assert session.updates[0] == ("w0", False)
+    assert ("w0 w1 w2", True) in session.updates
+    assert [event["transcript"] for event in events if event.get("type") == "final"] == ["w0 w1 w2"]
+    assert [event["text"] for event in events if event.get("type") == "sentence"] == [
+        "Sure.", "Here it is: w0 w1 w2."
+    ]
+    assert "asr w7" in session.log[session.log.index("llm"):-1]
+
+    stats = metrics.get_metrics()
+    assert stats["asr"]["count"] == stats["first_sentence"]["count"] == stats["response"]["count"] == 1
+    assert stats["first_sentence"]["p95_ms"] <= stats["response"]["p95_ms"]
+    assert stats["prefix_updates"] >= 1 and stats["endpoint_updates"] == 1
+
+def test_pipeline_discards_speculation_for_empty_utterances():
+    session = FakeSession()
+
+    async def transcribe(audio):
+        if audio is None:
+            yield {"type": "final", "transcript": "", "success": True}
+        else:
+            yield {"type": "partial", "transcript": "uh", "committed": "uh", "success": True}
+
+    async def run():
+        pipeline = VoicePipeline(transcribe, session.respond, session.update_prefix, session.discard_prefix)
+        await pipeline.feed(np.zeros(160, dtype=np.float32))
+        await pipeline.end()
+        for _ in range(50):
+            if session.discarded:
+                break
+            await asyncio.sleep(0.01)
+        await pipeline.close()
+
+    asyncio.run(run())
+    assert session.discarded == 1 and "llm" not in session.log
+
+def test_partials_during_a_long_response_do_not_block_transcription():
+    session = FakeSession()
+
+    async def slow_respond(text):
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            session.log.append("llm")
+            yield {"text": "la ", "finished": False, "success": True}
+        yield {"text": "", "finished": True, "success": True}
+
+    async def run():
+        pipeline = VoicePipeline(
+            session.transcribe, slow_respond, session.update_prefix, session.discard_prefix, queue_size=2
+        )
+
+        async def consume():
+            async for _ in pipeline.events():
+                pass
+
+        consumer = asyncio.create_task(consume())
+        await pipeline.feed(np.full(160, 1, dtype=np.float32))
+        await pipeline.end()
+        while "llm" not in session.log:
+            await asyncio.sleep(0.001)
+        # Many more partials than the queues hold, all while the response is generated
+        for i in range(20):
+            await asyncio.wait_for(pipeline.feed(np.full(160, 10 + i, dtype=np.float32)), 0.1)
+        while "asr w29" not in session.log:
+            await asyncio.sleep(0.001)
+        answering = session.log.count("llm") < 10
+        while not session.updates[-1][0].endswith("w28"):
+            await asyncio.sleep(0.001)
+        await pipeline.close()
+        consumer.cancel()
+        return answering
+
+    assert asyncio.run(run())
+    # Coalesced: the LLM got the latest prefix, not every one of the twenty
+    assert len(session.updates) < 10
+
+def test_cancel_unblocks_a_feed_waiting_on_a_stalled_pipeline():
+    session = FakeSession()
+
+    async def run():
+        # Nobody reads the events, so the stages back up until feed() blocks
+        pipeline = VoicePipeline(session.transcribe, session.respond, queue_size=1)
+        feeding = asyncio.create_task(pipeline.feed(np.zeros(160, dtype=np.float32)))
+        for i in range(10):
+            await asyncio.wait([feeding], timeout=0.02)
+            if not feeding.done():
+                break
+            feeding = asyncio.create_task(pipeline.feed(np.full(160, i, dtype=np.float32)))
+        assert not feeding.done()
+
+        pipeline.cancel()
+        await asyncio.wait_for(feeding, 1)
+        try:
+            await pipeline.feed(np.zeros(160, dtype=np.float32))
+        except RuntimeError:
+            return True
+        finally:
+            await pipeline.close()
+
+    assert asyncio.run(run())
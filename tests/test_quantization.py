@@ -0,0 +1,50 @@
+import threading
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from torch import nn
+from backend.inference.quantization import quantize_model, serialized_size, validate_quantization
+from backend.llm.batching import ContinuousBatcher, SamplingParams
+
+class CastingLinear(nn.Linear):
+    """Linear subclass like Whisper's, which dynamic quantization skips by type."""
+    def forward(self, x):
+        return nn.functional.linear(x, self.weight.to(x.dtype), self.bias)
+
+def test_int8_quantizes_linear_subclasses_and_shrinks_weights():
+    torch.manual_seed(0)
+    model = nn.Sequential(CastingLinear(256, 256), nn.ReLU(), nn.Linear(256, 16)).eval()
+    inputs = torch.randn(4, 256)
+    expected = model(inputs)
+    float_size = serialized_size(model)
+
+    quantized = quantize_model(model, "int8", "cpu")
+
+    assert not any(type(module) in (nn.Linear, CastingLinear) for module in quantized.modules())
+    assert torch.allclose(quantized(inputs), expected, atol=0.05)
+    assert serialized_size(quantized) < float_size / 2
+
+def test_quantization_is_skipped_off_cpu_and_validated():
+    model = nn.Linear(4, 4)
+    assert quantize_model(model, "int8", "cuda") is model
+    assert quantize_model(model, "none", "cpu") is model
+    with pytest.raises(ValueError):
+        validate_quantization("int4")
+
+def test_quantized_llm_decodes_through_the_batcher(tiny_model):
+    model = quantize_model(tiny_model, "int8", "cpu")
+    batcher = ContinuousBatcher(model, eos_token_id=-1, device="cpu")
+    tokens = []
+    done = threading.Event()
+
+    def emit(item):
+        if item is None or isinstance(item, Exception):
+            done.set()
+        else:
+            tokens.append(item)
+
+    batcher.submit([1, 2, 3], SamplingParams(temperature=0, max_new_tokens=5), emit, threading.Event())
+    assert done.wait(30)
+    batcher.shutdown()
+    assert len(tokens) == 5
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import numpy as np
+from backend.llm.response_cache import ResponseCache, depends_on_context, normalize_query
+
+class Backend:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.closed = 0
+        self.fail = fail
+
+    async def generate(self, prompt):
+        self.calls += 1
+        try:
+            if self.fail:
+                yield {"success": False, "error": "upstream timeout"}
+                return
+            await asyncio.sleep(0.01)
+            yield {"text": f"Answer to {prompt}", "finished": False, "success": True}
+            yield {"text": ".", "finished": True, "success": True}
+        finally:
+            self.closed += 1
+
+def ask(cache, backend, prompt, context=None):
+    async def run():
+        return [chunk async for chunk in cache.respond(prompt, context, lambda: backend.generate(prompt))]
+    return asyncio.run(run())
+
+def test_repeated_queries_are_served_from_the_cache():
+    cache, backend = ResponseCache(), Backend()
+    first = ask(cache, backend, "What time is it?")
+    second = ask(cache, backend, "what time is it")
+
+    assert backend.calls == 1
+    assert second == [{"text": "Answer to What time is it?.", "finished": True, "success": True, "cached": True}]
+    assert "".join(chunk["text"] for chunk in first) == second[0]["text"]
+
+    metrics = cache.get_metrics()
+    assert metrics["exact_hits"] == 1 and metrics["misses"] == 1 and metrics["saved_seconds"] > 0
+
+def test_failed_and_context_dependent_turns_are_not_cached():
+    cache, failing = ResponseCache(), Backend(fail=True)
+    ask(cache, failing, "hello")
+    ask(cache, failing, "hello")
+    assert failing.calls == 2 and len(cache) == 0
+
+    backend = Backend()
+    context = [{"role": "user", "content": "Who wrote Hamlet?"}]
+    ask(cache, backend, "tell me more about him", context)
+    ask(cache, backend, "tell me more about him", context)
+    assert backend.calls == 2 and cache.get_metrics()["bypassed"] == 2
+    # Standalone questions are answered from the cache even in a conversation
+    assert not depends_on_context("what can you do", context)
+    assert depends_on_context("why?", context)
+
+def test_answers_generated_with_history_are_not_shared():
+    cache, backend = ResponseCache(), Backend()
+    context = [{"role": "user", "content": "My name is Bob"}, {"role": "assistant", "content": "Hi Bob"}]
+    ask(cache, backend, "what is the capital of France", context)
+    assert len(cache) == 0
+
+    # A context-free answer is stored and then served inside conversations too
+    ask(cache, backend, "what is the capital of France")
+    ask(cache, backend, "what is the capital of France", context)
+    assert backend.calls == 2 and cache.get_metrics()["exact_hits"] == 1
+
+def test_entries_expire_and_are_evicted_least_recently_used():
+    cache, backend = ResponseCache(max_entries=2, ttl_seconds=0.05), Backend()
+    for prompt in ("a b c", "d e f", "a b c", "g h i"):
+        ask(cache, backend, prompt)
+    assert normalize_query("D e f!") not in cache._entries and len(cache) == 2
+
+    time.sleep(0.06)
+    ask(cache, backend, "a b c")
+    assert backend.calls == 4 and cache.get_metrics()["expirations"] == 1
+
+def test_similar_queries_hit_with_an_embedding_function():
+    vectors = {"hello": [1.0, 0.0], "hello there": [0.99, 0.1], "goodbye": [0.0, 1.0]}
+    cache = ResponseCache(embed=lambda texts: np.array([vectors[text] for text in texts]))
+    backend = Backend()
+
+    ask(cache, backend, "Hello!")
+    cached = ask(cache, backend, "Hello there.")
+    ask(cache, backend, "Goodbye")
+
+    assert cached[0]["cached"] and cached[0]["text"] == "Answer to Hello!."
+    assert backend.calls == 2 and cache.get_metrics()["semantic_hits"] == 1
+
+def test_abandoned_responses_close_the_backend_and_are_not_cached():
+    cache, backend = ResponseCache(), Backend()
+
+    async def run():
+        responses = cache.respond("hi", None, lambda: backend.generate("hi"))
+        await responses.__anext__()
+        await responses.aclose()
+
+    asyncio.run(run())
+    assert backend.closed == 1 and len(cache) == 0
+
+def test_embedding_failures_fall_through_to_the_backend():
+    def embed(texts):
+        raise RuntimeError("CUDA out of memory")
+
+    cache, backend = ResponseCache(embed=embed), Backend()
+    first = ask(cache, backend, "Hello!")
+    second = ask(cache, backend, "hello")
+
+    assert "".join(chunk["text"] for chunk in first) == "Answer to Hello!."
+    # Still stored under the exact transcript, without an embedding
+    assert backend.calls == 1 and second[0]["cached"]
+    metrics = cache.get_metrics()
+    assert metrics["misses"] == 1 and metrics["exact_hits"] == 1
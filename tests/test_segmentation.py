@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from backend.speech.segmentation import SpeechSegmenter
+
+def energy_vad(frame, sample_rate):
+    return np.abs(np.frombuffer(frame, dtype=np.int16)).mean() > 1000
+
+def tone(seconds, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+def silence(seconds, sample_rate=16000):
+    return np.zeros(int(seconds * sample_rate), dtype=np.float32)
+
+def test_segmenter_emits_one_utterance_with_padding():
+    segmenter = SpeechSegmenter(energy_vad, padding_duration=0.3)
+    audio = np.concatenate([silence(1.0), tone(1.0), silence(1.0)])
+
+    # Odd chunk sizes exercise the frame remainder handling
+    events = []
+    for start in range(0, len(audio), 1234):
+        events.extend(segmenter.feed(audio[start:start + 1234]))
+
+    types = [event["type"] for event in events]
+    assert types[0] == "speech_start"
+    assert types.count("speech_end") == 1
+
+    segment = events[types.index("speech_end")]["segment"]
+    assert 1.0 <= len(segment) / 16000 <= 1.7
+    assert not segmenter.triggered
+
+def test_segmenter_ignores_pure_silence():
+    segmenter = SpeechSegmenter(energy_vad)
+    assert segmenter.feed(silence(2.0)) == []
+
+def test_segmenter_flush_closes_open_utterance():
+    segmenter = SpeechSegmenter(energy_vad)
+    segmenter.feed(tone(1.0))
+
+    assert segmenter.triggered
+    assert [event["type"] for event in segmenter.flush()] == ["speech_end"]
+
+def test_segmenter_rejects_unsupported_frame_sizes():
+    with pytest.raises(ValueError):
+        SpeechSegmenter(energy_vad, frame_duration=0.025)
@@ -0,0 +1,31 @@
+import time
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from backend.llm.session_cache import SessionCacheEntry, SessionKVCache
+
+def make_entry(tokens):
+    past = ((torch.zeros(1, 1, tokens, 4), torch.zeros(1, 1, tokens, 4)),)
+    return SessionCacheEntry(list(range(tokens)), past, [])
+
+def test_cache_evicts_least_recently_used_over_budget():
+    entry_bytes = make_entry(8).nbytes
+    cache = SessionKVCache(max_bytes=2 * entry_bytes)
+
+    cache.put("a", make_entry(8))
+    cache.put("b", make_entry(8))
+    assert cache.get("a") is not None
+    cache.put("c", make_entry(8))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get_metrics()["evictions"] == 1
+
+def test_cache_expires_idle_sessions():
+    cache = SessionKVCache(ttl_seconds=0.01)
+    cache.put("a", make_entry(4))
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.get_metrics()["sessions"] == 0
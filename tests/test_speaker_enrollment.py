@@ -0,0 +1,84 @@
+import os
+import numpy as np
+from backend.speech.enrollment import MIN_JOURNAL_ENTRIES, SpeakerEnrollmentStore
+
+def utterances(count, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def unit_mean(embeddings):
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    mean = unit.mean(axis=0)
+    return mean / np.linalg.norm(mean)
+
+def test_incremental_enrollment_matches_enrolling_all_utterances_at_once(tmp_path):
+    embeddings = utterances(6)
+    incremental = SpeakerEnrollmentStore(str(tmp_path / "incremental"))
+    for embedding in embeddings:
+        incremental.enroll("alice", embedding)
+
+    assert incremental.speakers() == {"alice": {"utterances": 6}}
+    assert np.allclose(incremental._index.get("alice"), unit_mean(embeddings), atol=1e-5)
+
+    incremental.enroll("alice", embeddings[:2], replace=True)
+    assert incremental.speakers() == {"alice": {"utterances": 2}}
+    assert np.allclose(incremental._index.get("alice"), unit_mean(embeddings[:2]), atol=1e-5)
+
+def test_identification_and_deletion(tmp_path):
+    store = SpeakerEnrollmentStore(str(tmp_path))
+    voices = utterances(2, seed=1)
+    alice = voices[0] + 0.1 * utterances(3, seed=2)
+    bob = voices[1] + 0.1 * utterances(3, seed=3)
+    store.enroll("alice", alice)
+    store.enroll("bob", bob)
+
+    assert store.search(voices[0])[0][0] == "alice"
+    assert store.delete("alice") and not store.delete("alice")
+    assert [speaker for speaker, _ in store.search(alice[0], k=5)] == ["bob"]
+
+def test_other_workers_see_enrollments(tmp_path):
+    writer = SpeakerEnrollmentStore(str(tmp_path))
+    reader = SpeakerEnrollmentStore(str(tmp_path))
+    assert len(reader) == 0 and reader.search(np.ones(8)) == []
+
+    writer.enroll("alice", utterances(2))
+    assert len(reader) == 1 and reader.search(utterances(1)[0])[0][0] == "alice"
+
+    # The second worker's enrollment builds on the first one's
+    reader.enroll("alice", utterances(2, seed=3))
+    writer.enroll("carol", utterances(1, seed=4))
+    assert SpeakerEnrollmentStore(str(tmp_path)).speakers() == {
+        "alice": {"utterances": 4},
+        "carol": {"utterances": 1}
+    }
+
+def test_updates_are_journaled_instead_of_rewriting_the_gallery(tmp_path):
+    writer = SpeakerEnrollmentStore(str(tmp_path))
+    reader = SpeakerEnrollmentStore(str(tmp_path))
+    writer.enroll("alice", utterances(1))
+    snapshot = sorted(name for name in os.listdir(tmp_path) if name.startswith("embeddings-"))
+
+    writer.enroll("bob", utterances(1, seed=1))
+    writer.enroll("alice", utterances(1, seed=2))
+    assert not writer.delete("nobody")
+    assert writer.delete("bob")
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("embeddings-")) == snapshot
+    assert reader.speakers() == {"alice": {"utterances": 2}}
+    assert np.allclose(reader._index.get("alice"), writer._index.get("alice"))
+
+    # A long journal is folded into a new snapshot
+    for i in range(MIN_JOURNAL_ENTRIES):
+        writer.enroll(f"speaker-{i}", utterances(1, seed=10 + i))
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("embeddings-")) != snapshot
+    assert len(reader) == len(SpeakerEnrollmentStore(str(tmp_path))) == MIN_JOURNAL_ENTRIES + 1
+
+def test_probed_galleries_build_and_share_an_ivf_index(tmp_path):
+    voices = utterances(40, dim=16, seed=5)
+    writer = SpeakerEnrollmentStore(str(tmp_path), n_probe=2)
+    for i, voice in enumerate(voices):
+        writer.enroll(f"speaker-{i}", voice)
+
+    # Rebuilt as the gallery doubles, and saved for the other workers
+    assert writer._index.ivf_size == 31
+    reader = SpeakerEnrollmentStore(str(tmp_path), n_probe=2)
+    assert reader.get_metrics()["ivf_lists"] == writer.get_metrics()["ivf_lists"] > 1
+    assert reader.search(voices[35])[0][0] == "speaker-35"
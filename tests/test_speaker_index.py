@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from backend.speech.speaker_index import SpeakerIndex
+
+def gallery(count=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"speaker-{i}": rng.standard_normal(dim).astype(np.float32) for i in range(count)}
+
+def brute_force(embeddings, query, k):
+    scores = {
+        speaker: float(np.dot(vector, query) / (np.linalg.norm(vector) * np.linalg.norm(query)))
+        for speaker, vector in embeddings.items()
+    }
+    return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+def test_exact_search_matches_brute_force():
+    embeddings = gallery()
+    index = SpeakerIndex.from_embeddings(embeddings)
+    query = embeddings["speaker-7"] + 0.1
+
+    matches = index.search(query, k=5)
+
+    expected = brute_force(embeddings, query, 5)
+    assert [speaker for speaker, _ in matches] == [speaker for speaker, _ in expected]
+    assert np.allclose([score for _, score in matches], [score for _, score in expected], atol=1e-5)
+
+def test_add_replace_and_remove_keep_rows_contiguous():
+    embeddings = gallery(count=5)
+    index = SpeakerIndex(dim=16, capacity=2)
+    for speaker, vector in embeddings.items():
+        index.add(speaker, vector)
+
+    assert len(index) == 5
+    assert index.remove("speaker-1") and not index.remove("speaker-1")
+    assert "speaker-1" not in index and len(index) == 4
+    # The moved row is still found
+    assert index.search(embeddings["speaker-4"])[0][0] == "speaker-4"
+
+    index.add("speaker-0", embeddings["speaker-3"])
+    assert len(index) == 4
+    assert {speaker for speaker, _ in index.search(embeddings["speaker-3"], k=2)} == {"speaker-0", "speaker-3"}
+
+def test_batch_search_answers_every_query():
+    embeddings = gallery(count=50)
+    index = SpeakerIndex.from_embeddings(embeddings)
+    queries = np.stack([embeddings["speaker-1"], embeddings["speaker-2"]])
+
+    assert [matches[0][0] for matches in index.search_batch(queries)] == ["speaker-1", "speaker-2"]
+
+def test_ivf_search_finds_the_nearest_speaker_in_clustered_galleries():
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((20, 32))
+    embeddings = {
+        f"speaker-{i}": (centers[i % 20] + 0.2 * rng.standard_normal(32)).astype(np.float32) for i in range(2000)
+    }
+    index = SpeakerIndex.from_embeddings(embeddings)
+    index.build_ivf(n_lists=20)
+
+    queries = [f"speaker-{i}" for i in range(0, 2000, 97)]
+    found = sum(index.search(embeddings[speaker], n_probe=2)[0][0] == speaker for speaker in queries)
+    assert found / len(queries) >= 0.95
+    assert index.get_metrics()["ivf_lists"] == 20
+
+    # Speakers added after clustering are assigned to a cluster
+    index.add("late", embeddings["speaker-3"] + 0.01)
+    assert index.search(embeddings["speaker-3"] + 0.01, n_probe=2)[0][0] == "late"
+
+def test_saved_gallery_is_memory_mapped_and_copied_on_write(tmp_path):
+    embeddings = gallery(count=20)
+    SpeakerIndex.from_embeddings(embeddings).save(str(tmp_path))
+
+    index, _ = SpeakerIndex.load(str(tmp_path))
+    assert isinstance(index._matrix, np.memmap)
+    assert index.get_metrics()["memory_mapped"]
+    assert index.search(embeddings["speaker-5"])[0][0] == "speaker-5"
+    assert not index.is_stale(str(tmp_path))
+
+    writer, _ = SpeakerIndex.load(str(tmp_path))
+    writer.add("new", np.ones(16, dtype=np.float32))
+    writer.save(str(tmp_path), metadata={"new": {"utterances": 1}})
+
+    assert not writer.get_metrics()["memory_mapped"]
+    assert index.is_stale(str(tmp_path))
+    # The old mapping stays readable after the file it maps is replaced
+    assert index.search(embeddings["speaker-5"])[0][0] == "speaker-5"
+    reloaded, metadata = SpeakerIndex.load(str(tmp_path))
+    assert "new" in reloaded and metadata == {"new": {"utterances": 1}}
+
+def test_saved_gallery_keeps_its_ivf_index(tmp_path):
+    embeddings = gallery(count=100)
+    index = SpeakerIndex.from_embeddings(embeddings)
+    index.build_ivf(n_lists=8)
+    index.save(str(tmp_path))
+
+    loaded, _ = SpeakerIndex.load(str(tmp_path))
+    assert loaded.get_metrics()["ivf_lists"] == 8 and loaded.ivf_size == 100
+    np.testing.assert_array_equal(loaded._assignment[:100], index._assignment[:100])
+    assert loaded.search(embeddings["speaker-7"], n_probe=2) == index.search(embeddings["speaker-7"], n_probe=2)
+
+def test_empty_galleries_return_no_matches():
+    assert SpeakerIndex(dim=4).search(np.ones(4)) == []
+    with pytest.raises(ValueError):
+        SpeakerIndex.from_embeddings({})
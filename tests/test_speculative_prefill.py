@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+
+from backend.api.conversations import ConversationStore
+from backend.llm.engine import LLMEngine
+from backend.llm.batching import SamplingParams
+
+class CharTokenizer:
+    eos_token_id = -1
+
+    def __call__(self, text, add_special_tokens=True):
+        return {"input_ids": [ord(char) % 100 for char in text]}
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(chr(ord("a") + token_id % 26) for token_id in token_ids)
+
+
+class LoadedModel:
+    def __init__(self, tokenizer, model):
+        self.loaded = (tokenizer, model)
+
+    def get(self):
+        return self.loaded
+
+    async def get_async(self):
+        return self.loaded
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def engine(request, tiny_model):
+    engine = LLMEngine("tiny", device="cpu", session_cache_mb=getattr(request, "param", 0))
+    engine._model_ref = LoadedModel(CharTokenizer(), tiny_model)
+    yield engine
+    engine.cleanup()
+
+async def reply(engine, prompt, client_id, context=None):
+    params = SamplingParams(temperature=0, max_new_tokens=6)
+    responses = engine.generate_response(prompt, context=context, params=params, client_id=client_id)
+    chunks = [chunk async for chunk in responses]
+    return "".join(chunk["text"] for chunk in chunks)
+
+def test_prefix_updates_only_prefill_new_tokens_and_match_the_plain_response(engine):
+    async def run():
+        expected = await reply(engine, "what time is it", None)
+
+        first = await engine.update_prefix("alice", "what time")
+        second = await engine.update_prefix("alice", "what time is")
+        again = await engine.update_prefix("alice", "what time is")
+        return expected, first, second, again, await reply(engine, "what time is it", "alice")
+
+    expected, first, second, again, speculative = asyncio.run(run())
+
+    assert first["reused"] == 0
+    # Everything before the revised "\nAssistant:" tail is kept
+    assert second["reused"] == len("User: what time")
+    assert again == {"reused": len("User: what time is\nAssistant:"), "prefilled": 0}
+    assert speculative == expected
+
+    metrics = engine.get_metrics()["speculation"]
+    assert metrics["hits"] == 1 and metrics["reused_tokens"] == len("User: what time is")
+
+def test_mismatched_prefix_is_rolled_back(engine):
+    async def run():
+        await engine.update_prefix("bob", "turn on the light")
+        return await reply(engine, "turn off the radio", "bob"), await reply(engine, "turn off the radio", None)
+
+    speculative, expected = asyncio.run(run())
+
+    assert speculative == expected
+    metrics = engine.get_metrics()["speculation"]
+    assert metrics["rolled_back_tokens"] == len("User: turn on the light\nAssistant:") - len("User: turn o")
+
+@pytest.mark.parametrize("engine", [64], indirect=True)
+def test_session_cache_only_serves_the_exact_history(engine):
+    first = asyncio.run(reply(engine, "hi", "carol"))
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": first}]
+
+    _, cached, _ = engine._prepare_input_ids("and now", history, "carol")
+    # A history the conversation store trimmed is rebuilt, not served from the longer cache
+    _, trimmed, _ = engine._prepare_input_ids("and now", history[1:], "carol")
+    engine.release_session("carol")
+    _, released, _ = engine._prepare_input_ids("and now", history, "carol")
+
+    assert cached is not None
+    assert trimmed is None and released is None
+
+@pytest.mark.parametrize("engine", [64], indirect=True)
+def test_session_cache_is_rebuilt_once_per_trim_and_reused_after_it(engine):
+    async def run():
+        # Every exchange is 4 + 6 tokens: the store trims after the 4th and then keeps one exchange
+        store = ConversationStore(engine.tokenize, max_tokens_per_session=30, trim_to=0.5)
+        served = []
+        for prompt in ["abcd", "efgh", "ijkl", "mnop", "qrst", "uvwx", "yzab"]:
+            context = await store.get("dave")
+            served.append(engine._prepare_input_ids(prompt, context, "dave")[1] is not None)
+            await store.add_turn("dave", prompt, await reply(engine, prompt, "dave", context))
+        return served
+
+    assert asyncio.run(run()) == [False, True, True, True, False, True, True]
+
+def test_prompts_at_the_length_limit_fail_and_replies_are_clamped_to_it(engine):
+    async def run():
+        return [chunk async for chunk in engine.generate_response("hi", stream=False)]
+
+    engine.max_length = len("User: hi\nAssistant:")
+    assert asyncio.run(run()) == [{"success": False, "error": "Context too long: the prompt takes 19 of 19 tokens"}]
+
+    engine.max_length += 2
+    reply = asyncio.run(run())
+    assert reply[0]["success"] and len(reply[0]["text"]) == 2
@@ -0,0 +1,57 @@
+import asyncio
+import numpy as np
+from backend.speech.streaming import AudioRingBuffer, StreamingTranscriber
+
+class FakeProcessor:
+    """Returns one word per second of audio in the window."""
+
+    def __init__(self):
+        self.window_lengths = []
+
+    async def transcribe_window(self, audio_data, initial_prompt=None):
+        self.window_lengths.append(len(audio_data))
+        seconds = len(audio_data) // 16000
+        words = [
+            {"word": f" w{i}", "start": float(i), "end": float(i) + 0.9}
+            for i in range(seconds)
+        ]
+        return {"words": words, "success": True}
+
+def test_ring_buffer_wraps_and_keeps_absolute_offsets():
+    buffer = AudioRingBuffer(capacity_seconds=1.0, sample_rate=10)
+    buffer.write(np.arange(7, dtype=np.float32))
+    buffer.write(np.arange(7, 14, dtype=np.float32))
+
+    assert buffer.start == 4
+    assert buffer.end == 14
+    np.testing.assert_array_equal(buffer.read(), np.arange(4, 14, dtype=np.float32))
+    np.testing.assert_array_equal(buffer.read(10, 12), np.array([10, 11], dtype=np.float32))
+
+    buffer.discard_until(12)
+    assert len(buffer) == 2
+
+def test_ring_buffer_oversized_write_keeps_newest_samples():
+    buffer = AudioRingBuffer(capacity_seconds=1.0, sample_rate=4)
+    buffer.write(np.arange(10, dtype=np.float32))
+
+    assert buffer.end == 10
+    np.testing.assert_array_equal(buffer.read(), np.arange(6, 10, dtype=np.float32))
+
+def test_streaming_transcriber_commits_agreed_words_and_bounds_window():
+    processor = FakeProcessor()
+    stream = StreamingTranscriber(processor, step_seconds=1.0, max_window_seconds=3.0)
+    chunk = np.zeros(16000, dtype=np.float32)
+    assert not stream.active
+
+    events = []
+    for _ in range(10):
+        events.extend(asyncio.run(stream.feed(chunk)))
+
+    assert events[0]["type"] == "partial"
+    assert stream.committed
+    assert max(processor.window_lengths) <= 3 * 16000 + 16000
+
+    final = asyncio.run(stream.finish())
+    assert final["type"] == "final"
+    assert final["transcript"].startswith("w0")
+    assert stream.committed == [] and not stream.active
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+
+from backend.llm.upstream import UpstreamPolicy, UpstreamTimeoutError, make_http_client
+
+groq = pytest.importorskip("groq")
+
+class FakeCompletionServer:
+    """OpenAI-compatible chat completions over SSE, with scripted slow or failing requests."""
+
+    def __init__(self, script=None, words=("Hello", " there", "!")):
+        # script(n) -> (status, seconds before the first chunk) for the n-th request
+        self.script = script or (lambda n: (200, 0.0))
+        self.words = words
+        self.requests = 0
+        self.connections = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(
+                    (int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")),
+                    0
+                )
+                body = json.loads(await reader.readexactly(length))
+                status, delay = self.script(self.requests)
+                self.requests += 1
+                await asyncio.sleep(delay)
+                if status != 200:
+                    error = json.dumps({"error": {"message": "unavailable"}}).encode()
+                    writer.write(
+                        f"HTTP/1.1 {status} Error\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(error)}\r\n\r\n".encode() + error
+                    )
+                    await writer.drain()
+                    continue
+
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+                for word in self.words:
+                    event = {
+                        "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                        "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]
+                    }
+                    self._chunk(writer, f"data: {json.dumps(event)}\n\n".encode())
+                    await writer.drain()
+                self._chunk(writer, b"data: [DONE]\n\n")
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _chunk(writer, data):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def client_for(server):
+    return groq.AsyncGroq(api_key="test", base_url=server.base_url, max_retries=0, http_client=make_http_client())
+
+async def complete(client, policy):
+    async def start():
+        return await client.chat.completions.create(
+            messages=[{"role": "user", "content": "hi"}], model="fake", stream=True
+        )
+
+    return "".join([
+        chunk.choices[0].delta.content or "" async for chunk in policy.stream(start)
+    ])
+
+def test_streams_reuse_pooled_connections_and_release_slots():
+    async def run():
+        async with FakeCompletionServer() as server:
+            client = client_for(server)
+            policy = UpstreamPolicy(max_concurrency=4)
+            texts = await asyncio.gather(*(complete(client, policy) for _ in range(12)))
+            texts += [await complete(client, policy) for _ in range(4)]
+            await client.close()
+            return texts, server.connections, policy.get_metrics()
+
+    texts, connections, metrics = asyncio.run(run())
+
+    assert texts == ["Hello there!"] * 16
+    # At most one connection per slot, kept alive for the sequential requests
+    assert connections <= 4
+    assert metrics["in_flight"] == 0 and metrics["attempts"] == 16
+
+def test_server_errors_are_retried_within_the_deadline():
+    async def run():
+        async with FakeCompletionServer(lambda n: (503, 0.0) if n < 2 else (200, 0.0)) as server:
+            client = client_for(server)
+            policy = UpstreamPolicy(max_retries=2, backoff_base=0.01)
+            text = await complete(client, policy)
+
+            server.script = lambda n: (200, 0.5)
+            with pytest.raises(UpstreamTimeoutError):
+                await complete(client, UpstreamPolicy(timeout=0.1))
+            await client.close()
+            return text, policy.get_metrics()
+
+    text, metrics = asyncio.run(run())
+    assert text == "Hello there!"
+    assert metrics["retries"] == 2 and metrics["failures"] == 0
+
+def test_hedging_cuts_the_tail_latency():
+    # Every 10th request stalls before its first chunk
+    def script(n):
+        return (200, 0.4 if n % 10 == 9 else 0.01)
+
+    async def measure(hedge):
+        async with FakeCompletionServer(script) as server:
+            client = client_for(server)
+            policy = UpstreamPolicy(hedge=hedge, hedge_min_delay=0.02, hedge_min_samples=5)
+            latencies = []
+            for _ in range(40):
+                started = time.perf_counter()
+                assert await complete(client, policy) == "Hello there!"
+                latencies.append(time.perf_counter() - started)
+            await client.close()
+            return np.percentile(latencies, 95), policy.get_metrics()
+
+    plain_p95, _ = asyncio.run(measure(hedge=False))
+    hedged_p95, metrics = asyncio.run(measure(hedge=True))
+
+    assert plain_p95 > 0.3
+    assert hedged_p95 < 0.2
+    assert metrics["hedge_wins"] >= 3 and metrics["in_flight"] == 0
@@ -68,6 +68,20 @@ async def test_speaker_identification(feature_analyzer):
     assert result["success"] is True
     assert "embedding" in result
 
+@pytest.mark.asyncio
+async def test_combined_voice_analysis(feature_analyzer):
+    # Two utterances of different lengths analyzed in one batch
+    sample_rate = 16000
+    utterances = [
+        np.sin(2 * np.pi * 440 * np.linspace(0, duration, int(sample_rate * duration))).astype(np.float32)
+        for duration in (1.0, 1.5)
+    ]
+    
+    result = await feature_analyzer.analyze(utterances)
+    assert result["success"] is True
+    assert len(result["results"]) == 2
+    assert all("emotions" in r and "embedding" in r for r in result["results"])
+
 @pytest.mark.asyncio
 async def test_groq_client(groq_client):
     # Test simple prompt